@@ -0,0 +1,212 @@
+"""
+Equivalence check of FieldParser against the old per-field row scans, with both timings.
+The two run at about the same speed (around 20 us per page text, next to seconds of OCR).
+
+Usage (from the repo root):
+    python -m benchmarks.bench_field_parser [path/to/texts] [--count 5000] [--seed 1] [--json out.json]
+
+The corpus is every *.txt under the given directory (default: the OCR cache), topped up with
+seeded synthetic variants to --count texts. Every text must give the same fields from both
+parsers, or make both raise ValidationError; the script exits with status 1 otherwise.
+"""
+import argparse, json, logging, random, re, sys, time
+from pathlib import Path
+
+from src.data_classes import ValidationError
+from src.field_parser import FieldParser, DEFAULT_FIELD_SPECS
+from utils.file_utils import get_cache_dir
+
+
+# --- Reference: the parser as it was before FieldParser, kept verbatim ---
+
+def build_address_block(rows: list[str]) -> str:
+    """
+    Build a text block containing "Aadress" line and (optionally) the next line if it looks like part of the address.
+    """
+
+    for i, row in enumerate(rows):
+        if "aadress" in row.lower():
+            address_block = row.strip()
+
+            # Check next row for possible continuation
+            if i + 1 < len(rows):
+                next_row = rows[i + 1].strip()
+                if re.search(r"\d", next_row) and "reg. kood" not in next_row:
+                    address_block += " " + next_row
+            return address_block
+    raise ValidationError("Keyword 'aadress' not found in rows")
+
+
+def _extract_apartment_from_address(address_block: str) -> tuple[str, str]:
+    APARTMENT_RE = re.compile(r"\b(\d{1,3})-(\d+)\b")
+
+    # Find apartment matches like '113-64' in that block
+    matches = list(APARTMENT_RE.finditer(address_block))
+
+    if matches:
+        last_match = matches[-1]
+        house_number, apt_number = last_match.groups()
+        apartment = apt_number
+
+        # Everything before the apartment number is the address
+        before_apt = address_block[: last_match.start()].strip()
+        address = f"{before_apt} {house_number}".strip()
+    else:
+        # No apartment match found, fallback to last part after splitting
+        apartment = ""
+        address = address_block
+        logging.info(
+            f"No apartment match found. Extracted address='{address}', apartment='{apartment}'"
+        )
+    return apartment, address
+
+
+def extract_address_period_apartment(text):
+    rows = text.splitlines()
+
+    # --- Address & apartment ---
+    address_block = build_address_block(rows)
+
+    # Strip "Aadress" prefix
+    after_label = re.split(r"aadress\s*[:\- ]\s*", address_block, flags=re.IGNORECASE)[
+        -1
+    ].strip()
+
+    # Extract apartment number
+    apartment, address = _extract_apartment_from_address(after_label)
+
+    # Period
+    period_parts = extract_parts(rows, "periood")
+    period = period_parts[1] if len(period_parts) > 1 else ""
+
+    # Year
+    year_parts = extract_parts(rows, "kuupäev", pattern=r"[:\-\. ]+")
+    year = year_parts[-1] if len(year_parts) > 1 else ""
+
+    return {"address": address, "apartment": apartment, "period": period, "year": year}
+
+
+# Find row keyword, split it, return list of stripped parts
+def extract_parts(rows, keyword, pattern=r"[:\- ]+"):
+    for i, row in enumerate(rows):
+        if keyword in row.lower():
+            parts = [part.strip().lower() for part in re.split(pattern, row) if part]
+
+            if keyword == "aadress" and i + 1 < len(rows):
+                next_row = rows[i + 1].strip().lower()
+                if re.search(r"\d", next_row):
+                    extra_parts = [
+                        part.strip().lower()
+                        for part in re.split(pattern, next_row)
+                        if part
+                    ]
+                    parts.extend(extra_parts)
+            return parts
+    raise ValidationError(f"Keyword '{keyword}' not found in rows")
+
+
+# --- Corpus ---
+
+STREETS = ("Tamme tn", "Kase tänav", "Pärna pst", "Narva mnt", "Vana-Kalamaja")
+MONTHS = ("jaanuar", "veebruar", "märts", "aprill", "mai", "juuni", "juuli", "august", "september", "oktoober", "november", "detsember")
+COST_ROWS = ("Vesi {} m3 2,10 {}", "Soojus {} MWh 68,20 {}", "Remondifond {} m2 0,45 {}", "Prügivedu {} in 3,10 {}")
+NOISE = ("KORTERIÜHISTU ARVE", "Maksja: Mari Maasikas", "Reg. kood 80012345", "Viitenumber 12345678", "Summa: 42,17 EUR", "")
+
+
+def _label(rng: random.Random, label: str) -> str:
+    label = rng.choice((label.capitalize(), label.upper(), label))
+    return label + rng.choice((": ", ":", " - ", " ", ":  "))
+
+
+def synthetic_text(rng: random.Random) -> str:
+    rows = [rng.choice(NOISE) for _ in range(rng.randint(0, 8))]
+    address = f"{rng.choice(STREETS)} {rng.randint(1, 200)}"
+    if rng.random() < 0.85:
+        address += f"-{rng.randint(1, 120)}"
+    if rng.random() < 0.3:  # address wrapped onto the next line
+        street, number = address.rsplit(" ", 1)
+        rows.append(_label(rng, "aadress") + street)
+        rows.append(rng.choice((number, f"{number}, Tallinn", "Reg. kood 80012345")))
+    elif rng.random() < 0.97:
+        rows.append(_label(rng, "aadress") + address)
+    rows += [rng.choice(NOISE) for _ in range(rng.randint(0, 3))]
+    if rng.random() < 0.97:
+        rows.append(_label(rng, "periood") + rng.choice(MONTHS))
+    if rng.random() < 0.97:
+        rows.append(_label(rng, "kuupäev") + f"{rng.randint(1, 28):02d}{rng.choice('.-')}{rng.randint(1, 12):02d}.{rng.randint(2020, 2026)}")
+    # The cost table below the header, as on a real invoice page
+    rows += [rng.choice(COST_ROWS).format(rng.randint(1, 90), f"{rng.uniform(1, 200):.2f}") for _ in range(rng.randint(10, 60))]
+    rows += [rng.choice(NOISE) for _ in range(rng.randint(0, 6))]
+    return "\n".join(rows)
+
+
+def load_corpus(directory: Path | None, count: int, seed: int) -> tuple[list[str], int]:
+    """Returns (texts, number of texts read from disk)."""
+    texts = []
+    if directory is not None and directory.is_dir():
+        for path in sorted(directory.rglob("*.txt")):
+            try:
+                texts.append(path.read_text(encoding="utf-8"))
+            except (OSError, UnicodeDecodeError):
+                continue
+    stored = len(texts)
+    rng = random.Random(seed)
+    while len(texts) < count:
+        texts.append(synthetic_text(rng))
+    return texts, stored
+
+
+# --- Run ---
+
+def _run(parse, texts: list[str]) -> tuple[list, float]:
+    results = []
+    start = time.perf_counter()
+    for text in texts:
+        try:
+            results.append(parse(text))
+        except ValidationError:
+            results.append(ValidationError)
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("texts", nargs="?", type=Path, default=get_cache_dir())
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)  # the "no apartment match" line would dominate the timing
+    texts, stored = load_corpus(args.texts, args.count, args.seed)
+    field_parser = FieldParser(DEFAULT_FIELD_SPECS)
+
+    old_times, new_times = [], []
+    for _ in range(args.repeat):
+        old_results, old_sec = _run(extract_address_period_apartment, texts)
+        new_results, new_sec = _run(field_parser.parse, texts)
+        old_times.append(old_sec)
+        new_times.append(new_sec)
+
+    mismatches = [i for i, (old, new) in enumerate(zip(old_results, new_results)) if old != new]
+    result = {
+        "texts": len(texts),
+        "stored_texts": stored,
+        "seed": args.seed,
+        "old_us_per_text": 1e6 * min(old_times) / len(texts),
+        "new_us_per_text": 1e6 * min(new_times) / len(texts),
+        "time_ratio": min(old_times) / min(new_times),
+        "mismatches": len(mismatches),
+    }
+    print(f"{len(texts)} texts ({stored} stored): old {result['old_us_per_text']:.1f} us/text, "
+          f"new {result['new_us_per_text']:.1f} us/text, old/new time {result['time_ratio']:.2f}")
+    for i in mismatches[:5]:
+        print(f"MISMATCH #{i}: old={old_results[i]!r} new={new_results[i]!r}\n{texts[i]}\n")
+    if args.json:
+        args.json.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Throughput benchmark of the kommunaal pipeline: separate_invoices, then save_each_invoice_as_file,
+on synthetic invoice PDFs (see benchmarks.corpus).
+
+Usage (from the repo root):
+    python -m benchmarks.bench_pipeline [--scenarios text-20,image-10] [--seed 1] [--json results.json]
+
+Each scenario runs in a fresh subprocess so the reported peak RSS is its own. Reported per scenario:
+pages/sec, wall time of both calls, per-stage latency (classify, text layer, text parse, OCR)
+and how many pages parsed to the expected fields. OCR and writer settings come from config.cfg,
+with the OCR cache off unless --cache is given. Scenarios with image-only pages are skipped
+when Tesseract is not installed.
+"""
+import argparse, json, os, platform, shutil, statistics, subprocess, sys, tempfile, time
+from collections import defaultdict
+from dataclasses import asdict, replace
+from pathlib import Path
+
+from benchmarks.bench_render import _peak_rss_mb
+from benchmarks.corpus import SCENARIOS, KIND_TEXT, make_invoice_pdf
+
+# Functions of src.pdf_extractor timed as pipeline stages
+STAGES = {
+    "classify": "_classify_pages",
+    "text_layer": "extract_text_layer",
+    "text_parse": "_parse_text_layer_page",
+    "ocr": "_ocr_and_parse_pages",
+}
+
+
+def _timed(timings: list, fn):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings.append(time.perf_counter() - start)
+    return wrapper
+
+
+def _stage_stats(timings: list[float]) -> dict:
+    ordered = sorted(timings)
+    return {
+        "calls": len(ordered),
+        "total_sec": sum(ordered),
+        "p50_ms": 1000 * statistics.median(ordered),
+        "p95_ms": 1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+def run_child(pdf_path: str, expected_path: str, cache: bool) -> dict:
+    from src import pdf_extractor
+    from utils.file_utils import read_config, load_ocr_settings, load_output_settings
+
+    config = read_config()
+    settings = replace(load_ocr_settings(config), cache_enabled=cache)
+    output_settings = load_output_settings(config)
+
+    timings = defaultdict(list)
+    for stage, name in STAGES.items():
+        setattr(pdf_extractor, name, _timed(timings[stage], getattr(pdf_extractor, name)))
+
+    start = time.perf_counter()
+    invoices = pdf_extractor.separate_invoices(pdf_path, settings=settings)
+    separate_sec = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as out_dir:
+        start = time.perf_counter()
+        pdf_extractor.save_each_invoice_as_file(invoices, Path(out_dir), output_settings)
+        save_sec = time.perf_counter() - start
+
+    expected = json.loads(Path(expected_path).read_text(encoding="utf-8"))
+    parsed = [
+        {"address": i.address, "apartment": i.apartment, "period": i.period, "year": i.year} for i in invoices
+    ]
+    return {
+        "pages": len(expected),
+        "invoices": len(invoices),
+        "correct": sum(1 for fields in parsed if fields in expected),
+        "separate_sec": separate_sec,
+        "save_sec": save_sec,
+        "pages_per_sec": len(expected) / (separate_sec + save_sec),
+        "stages": {stage: _stage_stats(values) for stage, values in timings.items() if values},
+        "peak_rss_mb": _peak_rss_mb(),
+        "settings": {"ocr": asdict(settings), "output": asdict(output_settings)},
+    }
+
+
+def _tesseract_available() -> bool:
+    from pytesseract import pytesseract as tesseract_api
+    return shutil.which(tesseract_api.tesseract_cmd) is not None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", help="comma-separated scenario names, default all: "
+                        + ", ".join(scenario.name for scenario in SCENARIOS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--cache", action="store_true", help="keep the OCR cache on")
+    parser.add_argument("--json", type=Path, default=Path("bench_pipeline.json"))
+    parser.add_argument("--child", nargs=2, metavar=("PDF", "EXPECTED"), help=argparse.SUPPRESS)  # internal
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(*args.child, args.cache)))
+        return
+
+    names = args.scenarios.split(",") if args.scenarios else [scenario.name for scenario in SCENARIOS]
+    unknown = set(names) - {scenario.name for scenario in SCENARIOS}
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    tesseract = _tesseract_available()
+
+    results = {
+        "seed": args.seed,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scenarios": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for index, scenario in enumerate(SCENARIOS):
+            if scenario.name not in names:
+                continue
+            entry = {"scenario": asdict(scenario), "seed": args.seed + index}
+            if scenario.kind != KIND_TEXT and not tesseract:
+                entry["skipped"] = "Tesseract not installed"
+                print(f"{scenario.name:>16}: skipped, Tesseract not installed")
+                results["scenarios"].append(entry)
+                continue
+
+            pdf_path = os.path.join(tmp, f"{scenario.name}.pdf")
+            expected_path = os.path.join(tmp, f"{scenario.name}.json")
+            expected = make_invoice_pdf(pdf_path, scenario, entry["seed"])
+            Path(expected_path).write_text(json.dumps(expected), encoding="utf-8")
+
+            command = [sys.executable, "-m", "benchmarks.bench_pipeline", "--child", pdf_path, expected_path]
+            if args.cache:
+                command.append("--cache")
+            out = subprocess.run(command, check=True, capture_output=True, text=True)
+            entry.update(json.loads(out.stdout.strip().splitlines()[-1]))
+            results["scenarios"].append(entry)
+
+            rss = "n/a" if entry["peak_rss_mb"] is None else f"{entry['peak_rss_mb']:.0f} MB"
+            stages = ", ".join(f"{stage} p50 {stats['p50_ms']:.1f} ms" for stage, stats in entry["stages"].items())
+            print(
+                f"{scenario.name:>16}: {entry['pages_per_sec']:7.1f} pages/s, "
+                f"separate {entry['separate_sec']:.2f}s, save {entry['save_sec']:.2f}s, "
+                f"{entry['correct']}/{entry['pages']} correct, peak RSS {rss} ({stages})"
+            )
+
+    args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark: page rasterisation via PNG round trip vs. zero-copy grayscale pixmap.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_render [path/to/invoices.pdf] [--dpi 300] [--pages 20]
+
+Each mode runs in a fresh subprocess so the reported peak RSS is not shared between modes.
+Without a PDF argument a synthetic text PDF is generated.
+"""
+import argparse, json, os, subprocess, sys, tempfile, time
+
+import fitz
+
+MODES = ("png", "zero_copy")
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _make_sample_pdf(path: str, pages: int):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Aadress: Tamme tn 113-{i + 1}\nPeriood: september\nKuupäev: 30.09.2025")
+    doc.save(path)
+    doc.close()
+
+
+def run_mode(mode: str, pdf_path: str, dpi: int, pages: int) -> dict:
+    from utils.ocr_helper import render_page_to_image, render_page_to_image_png, preprocess_for_ocr
+
+    render = render_page_to_image_png if mode == "png" else render_page_to_image
+    matrix = fitz.Matrix(dpi / 72, dpi / 72)
+    timings = []
+    with fitz.open(pdf_path) as doc:
+        for page_idx in range(min(pages, doc.page_count)):
+            start = time.perf_counter()
+            img = render(doc.load_page(page_idx), matrix)
+            img = preprocess_for_ocr(img)  # includes the "L" conversion both paths need
+            timings.append(time.perf_counter() - start)
+            img.close()
+    return {
+        "mode": mode,
+        "pages": len(timings),
+        "ms_per_page": 1000 * sum(timings) / len(timings),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?")
+    parser.add_argument("--dpi", type=int, default=300)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)  # internal: child process
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.pdf, args.dpi, args.pages)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = args.pdf
+        if pdf_path is None:
+            pdf_path = os.path.join(tmp, "sample.pdf")
+            _make_sample_pdf(pdf_path, args.pages)
+
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_render", pdf_path,
+                 "--dpi", str(args.dpi), "--pages", str(args.pages), "--mode", mode],
+                check=True, capture_output=True, text=True,
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            rss = "n/a" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f} MB"
+            print(f"{mode:>10}: {result['ms_per_page']:7.1f} ms/page, peak RSS {rss} ({result['pages']} pages @ {args.dpi} dpi)")
+
+
+if __name__ == "__main__":
+    main()
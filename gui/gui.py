@@ -21,6 +21,7 @@ from utils.file_utils import (
     load_app_name,
 )
 from utils.ocr_helper import get_tesseract_cmd, check_ocr_environment
+from utils.excel_session import close_excel_session
 from utils.gui_helpers import (
     select_file,
     center_window,
@@ -514,4 +515,8 @@ def main():
     root.lift()
     root.focus_force()
 
-    root.mainloop()
+    try:
+        root.mainloop()
+    finally:
+        # Excel kept open between kyte jobs
+        close_excel_session()
@@ -1,5 +1,9 @@
 # run_app.py
+import multiprocessing
+
 from gui.gui import main
 
 if __name__ == "__main__":
+    # Needed for the OCR worker pool in the frozen (PyInstaller) exe
+    multiprocessing.freeze_support()
     main()
@@ -26,6 +26,11 @@ class InvoiceItem:
     year: str
     pdf_page: Optional[object] = None # Placeholder for PDF page object
     excel_sheet_name: Optional[str] = None # Placeholder for Excel sheet object
+    source: Optional[str] = None # Extraction path that produced this invoice ("text", "ocr", "outline" or "page_labels")
+    ocr_dpi: Optional[int] = None # DPI the page finally parsed at (OCR only)
+    output_path: Optional[Path] = None # Set once the invoice's own PDF has been written
+    ocr_confidence: Optional[float] = None # Confidence (0-100) of the weakest header field, confidence OCR mode only
+    fields: Optional[dict] = None # Extra fields configured in [invoice_fields], e.g. {"viitenumber": "1234"}
 
     def __repr__(self):
         return f"Invoice(address={self.address}, period={self.period}, apartment={self.apartment})"
@@ -43,6 +48,8 @@ class InvoiceBatch:
     subject: str
     body: str
     cancel_event: threading.Event
+    manifest: Optional[object] = None # JobManifest of the job, None = no resume
+    forbidden_labels: tuple[str, ...] = () # See InvoiceType.forbidden_labels
 
 
 def create_invoice_batch(
@@ -56,6 +63,8 @@ def create_invoice_batch(
     subject: str,
     body: str,
     cancel_event: threading.Event,
+    manifest: object = None,
+    forbidden_labels: tuple[str, ...] = (),
 ) -> InvoiceBatch:
     return InvoiceBatch(
         parent=parent,
@@ -67,6 +76,8 @@ def create_invoice_batch(
         subject=subject,
         body=body,
         cancel_event=cancel_event,
+        manifest=manifest,
+        forbidden_labels=forbidden_labels,
     )
 
 
@@ -76,6 +87,75 @@ class InvoiceType:
     label: str
     subject: str
     body: str
+    forbidden_labels: tuple[str, ...] = () # Column A labels of trailing sheet rows left out of the PDFs (kyte)
+
+
+@dataclass(frozen=True)
+class SheetNormalisation:
+    delete_rows: tuple[int, int] | None # First and last trailing row to delete, None = keep all
+    print_area: str # Print area after the delete, e.g. "$A$1:$H$40"
+
+
+@dataclass(frozen=True)
+class OcrSettings:
+    lang: str = "est"
+    dpi: int = 300
+    psm: int = 6
+    oem: int = 1
+    timeout_sec: int = 120
+    workers: int = 1 # 0 = one worker per spare CPU core
+    use_text_layer: bool = True # Parse embedded PDF text before falling back to OCR
+    ocr_mode: str = "full" # "full" = whole page, "roi" = header regions only, "confidence" = whole page with word confidences
+    header_crop: str = "" # "x0,y0,x1,y1" page fractions for roi mode, empty = learn from first page
+    cache_enabled: bool = True # Reuse OCR results of identical pages from the on-disk cache
+    cache_max_mb: int = 200
+    cache_dir: str = "" # Empty = per-user default, see get_cache_dir
+    preprocess: str = "pil" # Image preprocessing engine: "pil" or "numpy"
+    threshold: str = "180" # Binarization level 0-255 or "otsu"
+    engine: str = "pytesseract" # "pytesseract" (subprocess per page) or "tesserocr" (in-process)
+    dpi_ladder: tuple[int, ...] = () # e.g. (150, 200, 300): escalate only pages that fail to parse, empty = dpi only
+    dpi_ladder_sequence: bool = True # Below the last DPI, accept a read only if its apartment fits the pages around it (pages sorted by apartment)
+    job_deadline_sec: int = 0 # Time budget for all OCR of one PDF, split over the remaining pages, 0 = none
+    min_confidence: int = 70 # Confidence mode: re-OCR header tokens below this, flag pages that stay below
+    blank_pages: str = "process" # Policy for blank pages: skip, process or error
+    duplicate_pages: str = "process" # Policy for repeated pages: skip, process or error
+    non_invoice_pages: str = "error" # Policy for OCR'd pages without an "Aadress" label: skip or error
+    blank_ink_ratio: float = 0.001 # Pages with less ink than this share of pixels are blank
+    duplicate_distance: int = 10 # Max differing hash bits (of 256) for a repeat of a non-invoice page
+    multi_page_invoices: bool = False # Attach pages without an "Aadress" header to the invoice before them
+    use_outline: bool = True # Split by bookmarks / page labels naming the apartments when they cover every page
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    name: str # Key in the parsed result
+    label: str # Lower-case text that marks the field's row (the first row containing it is used)
+    split: str = r"[:\- ]+" # Pattern splitting the row into parts
+    part: int = 1 # Index of the value among the parts
+    min_parts: int = 2 # With fewer parts the value is empty
+    block: bool = False # Value is the rest of the row after the label instead of one part
+    continuation: str = "" # Block fields: append the next row if it matches this pattern
+    continuation_exclude: str = "" # ...and does not contain this text
+    post: str = "" # Post-processor name (see field_parser.POST_PROCESSORS)
+    required: bool = True # Missing row raises ValidationError, otherwise the value is empty
+
+
+@dataclass(frozen=True)
+class OutputSettings:
+    writers: int = 1 # Processes writing apartment PDFs concurrently, 1 = write in the calling thread
+    optimize: bool = False # Drop unused objects and compress streams in each output PDF
+    subset_fonts: bool = False # Keep only the used glyphs of embedded fonts
+
+
+@dataclass(frozen=True)
+class ExcelSettings:
+    one_pdf_export: bool = False # Export all apartment sheets as one PDF in one call, then split it by pages
+
+
+@dataclass(frozen=True)
+class TraceSettings:
+    enabled: bool = False # Record per-stage spans of each job and export them when it ends
+    directory: str = "" # Where trace files go, empty = next to error.log
 
 
 
@@ -1,27 +1,36 @@
-import os, re, time
-import pythoncom
-import win32com.client as win32
-from datetime import datetime
+import os
 from pathlib import Path
 
-from utils.logging_helper import log_exception
-from utils.excel_app_helpers import excel_open_workbook, close_workbook, quit_excel
-from utils.excel_sheet_helpers import set_printarea_to_last_content, make_output_dir, safe_filename, col_letter
-from utils.excel_constants import (XL_FORMULAS, XL_PART, XL_BY_ROWS, XL_BY_COLUMNS, XL_PREVIOUS, XL_NEXT, XL_VALUES,
-                                   PDF_TYPE, PDF_QUALITY_STANDARD)
-from src.data_classes import InvoiceItem, Cancelled
-from utils.file_utils import create_invoice_dir
-
-ESTONIAN_MONTHS = {
-    1: "jaanuar", 2: "veebruar", 3: "märts", 4: "aprill",
-    5: "mai", 6: "juuni", 7: "juuli", 8: "august",
-    9: "september", 10: "oktoober", 11: "november", 12: "detsember",
-}
-
-def save_excel_invoices_as_pdfs(invoice_batch: "InvoiceBatch", on_progress=None, cancel_event=None) -> Path:
+from utils.logging_helper import log_exception, log_line
+from utils.excel_session import get_excel_session
+from utils.excel_sheet_helpers import sheet_page_count, safe_filename, col_letter
+from utils.excel_constants import PDF_TYPE, PDF_QUALITY_STANDARD
+from src.data_classes import InvoiceItem, Cancelled, ExcelSettings, OutputSettings
+from utils.file_utils import read_config, load_excel_settings, load_output_settings
+from utils.pdf_page_map import build_page_map, split_pdf_by_page_map
+from utils.sheet_normalisation import normalise_sheet
+from utils.tracing import span
+from src.kyte_invoice_reader import read_address_text
+
+# Job manifest unit of an exported sheet: "sheet:<sheet name>"
+SHEET_UNIT_PREFIX = "sheet:"
+
+# All sheets exported in one call go to this temporary file in the destination folder before splitting
+COMBINED_PDF_NAME = ".koik_lehed.pdf"
+
+
+def save_excel_invoices_as_pdfs(
+    invoice_batch: "InvoiceBatch", on_progress=None, cancel_event=None,
+    excel_settings: ExcelSettings = None, output_settings: OutputSettings = None,
+) -> Path:
     parent = invoice_batch.parent
     cancel_event = invoice_batch.cancel_event
+    manifest = invoice_batch.manifest
     invoices = invoice_batch.invoices
+    if excel_settings is None or output_settings is None:
+        config = read_config()
+        excel_settings = excel_settings or load_excel_settings(config)
+        output_settings = output_settings or load_output_settings(config)
 
     total = len(invoices)
     fname = os.path.basename(invoice_batch.invoice_path)
@@ -29,39 +38,125 @@ def save_excel_invoices_as_pdfs(invoice_batch: "InvoiceBatch", on_progress=None,
     if on_progress:
         on_progress(0, total, f"Alustan töötlemist...")
 
-    def export_all(_excel, workbook):
-        for index, invoice in enumerate(invoices, start=1):
-            if cancel_event.is_set():
-                close_workbook(workbook)
-                quit_excel(_excel)
-                raise Cancelled
+    # Sheets exported by an earlier run of the same job are not exported again
+    pending = []
+    for index, invoice in enumerate(invoices, start=1):
+        done = manifest.done(SHEET_UNIT_PREFIX + invoice.excel_sheet_name) if manifest is not None else None
+        if done is None:
+            pending.append((index, invoice))
+        else:
+            invoice.output_path = Path(done["output"])
+    if not pending:
+        if on_progress:
+            on_progress(total, total, f"Exceli lehed on juba salvestatud - {fname}")
+        return invoice_batch.dest_dir
+
+    def check_cancel(_excel, workbook):
+        if cancel_event.is_set():
+            raise Cancelled  # the session kills Excel
 
+    def export_all(_excel, workbook):
+        for index, invoice in pending:
+            check_cancel(_excel, workbook)
+            worksheet = workbook.Sheets(invoice.excel_sheet_name)
+            # The normalisation is idempotent, so a workbook kept open from an earlier run can be exported again
+            normalise_sheet(worksheet, invoice_batch.forbidden_labels, label_col=1)
+
+        if excel_settings.one_pdf_export and len(pending) > 1:
+            try:
+                _export_sheets_as_one_pdf(_excel, workbook, invoice_batch, pending, output_settings)
+                if all(invoice.output_path is not None for _index, invoice in pending):
+                    if on_progress:
+                        on_progress(total, total, f"Salvestan Exceli lehti {total}/{total} - {fname}")
+                    return
+            except Cancelled:
+                raise
+            except Exception as e:
+                log_exception(e)
+                log_line("Exporting all sheets as one PDF failed, exporting them one by one")
+
+        for index, invoice in pending:
+            if invoice.output_path is not None:
+                continue  # already split out of the combined PDF
+            check_cancel(_excel, workbook)
             sheet_name = invoice.excel_sheet_name
             worksheet = workbook.Sheets(sheet_name)
+            pdf_path = invoice_batch.dest_dir / f"{invoice.apartment}.pdf"
 
-            set_printarea_to_last_content(worksheet)
-
-            remove_forbidden_trailing_rows(
-                worksheet,
-                forbidden_labels=["Radiaator 13", "Radiaator 14"],
-                column_index=1,
-            )
+            with span("excel_export", sheet=sheet_name):
+                worksheet.ExportAsFixedFormat(
+                    Type=PDF_TYPE,  # PDF
+                    Filename=str(pdf_path),
+                    Quality=PDF_QUALITY_STANDARD,  # Standard
+                    IncludeDocProperties=True,
+                    IgnorePrintAreas=False,
+                    OpenAfterPublish=False,
+                )
+            invoice.output_path = pdf_path
+            if manifest is not None:
+                manifest.record(SHEET_UNIT_PREFIX + sheet_name, [invoice], output=pdf_path)
+            on_progress(index, total, f"Salvestan Exceli lehti {index}/{total} - {fname}")
 
-            set_printarea_to_last_content(worksheet)
+    # Same Excel and open workbook as the sheet reading, if that needed Excel
+    get_excel_session().run(invoice_batch.invoice_path, export_all, cancel_event=cancel_event)
+    return invoice_batch.dest_dir
 
-            pdf_path = invoice_batch.dest_dir / f"{invoice.apartment}.pdf"
 
-            worksheet.ExportAsFixedFormat(
-                Type=PDF_TYPE,  # PDF
-                Filename=str(pdf_path),
-                Quality=PDF_QUALITY_STANDARD,  # Standard
+def _export_sheets_as_one_pdf(excel, workbook, invoice_batch: "InvoiceBatch", pending: list, output_settings: OutputSettings):
+    """
+    Select the pending sheets and export them with one ExportAsFixedFormat call, then split the
+    PDF into apartment files by each sheet's page count (see utils.pdf_page_map), checking that
+    each file's first page shows the sheet's address.
+    Sheets whose page count Excel does not report, or without an address to check by, are left
+    for the one-by-one export. Raises if the PDF does not match; nothing is recorded as exported then.
+    """
+    manifest = invoice_batch.manifest
+    # Excel prints grouped sheets in tab order, whatever order they were selected in
+    sheets = []
+    for _index, invoice in pending:
+        sheet = workbook.Sheets(invoice.excel_sheet_name)
+        page_count, address = sheet_page_count(sheet), read_address_text(sheet)
+        if page_count is None or not address:
+            reason = "Excel does not report its page count" if page_count is None else "it has no Aadress to check its pages by"
+            log_line(f"Exporting sheet '{invoice.excel_sheet_name}' on its own: {reason}")
+            continue
+        sheets.append((sheet, invoice, page_count, address))
+    if len(sheets) < 2:
+        return
+    sheets.sort(key=lambda item: int(item[0].Index))
+
+    page_map = build_page_map([(sheet.Name, page_count) for sheet, _invoice, page_count, _address in sheets])
+    addresses = {sheet.Name: address for sheet, _invoice, _page_count, address in sheets}
+    invoices_by_path = {invoice_batch.dest_dir / f"{invoice.apartment}.pdf": invoice for _sheet, invoice, *_ in sheets}
+    out_paths = {invoice.excel_sheet_name: path for path, invoice in invoices_by_path.items()}
+
+    def on_written(pdf_path):
+        invoice = invoices_by_path[pdf_path]
+        invoice.output_path = pdf_path
+        if manifest is not None:
+            manifest.record(SHEET_UNIT_PREFIX + invoice.excel_sheet_name, [invoice], output=pdf_path)
+
+    combined_path = invoice_batch.dest_dir / COMBINED_PDF_NAME
+    try:
+        with span("excel_export", sheets=len(sheets)):
+            workbook.Worksheets(tuple(sheet.Name for sheet, *_ in sheets)).Select()
+            excel.ActiveSheet.ExportAsFixedFormat(
+                Type=PDF_TYPE,
+                Filename=str(combined_path),
+                Quality=PDF_QUALITY_STANDARD,
                 IncludeDocProperties=True,
                 IgnorePrintAreas=False,
                 OpenAfterPublish=False,
             )
-            on_progress(index, total, f"Salvestan Exceli lehti {index}/{total} - {fname}")
-
-    return excel_open_workbook(invoice_batch.invoice_path, export_all, cancel_event=cancel_event)
+        split_pdf_by_page_map(
+            combined_path, page_map, out_paths, output_settings, on_written=on_written, first_page_texts=addresses
+        )
+    finally:
+        try:
+            sheets[0][0].Select()  # ungroup
+        except Exception:
+            pass
+        combined_path.unlink(missing_ok=True)
 
 
 def create_excel_invoices(sheets: list, meta: dict) -> list[InvoiceItem]:
@@ -81,14 +176,8 @@ def create_excel_invoices(sheets: list, meta: dict) -> list[InvoiceItem]:
 
 # --- Sheet selection and export ---
 
-def get_korter_sheet_names(wb) -> list[str]:
-    """ Return list of sheets named "Korter X" where X is a number. """
-    pattern = re.compile(r"^Korter\s+\d+$", re.IGNORECASE)
-    return [ws.Name for ws in wb.Sheets if pattern.match(str(ws.Name))]
-
-
 def _export_sheet_to_pdf(sheet, output_dir: str):
-    pdf_path = os.path.join(output_dir, f"{_safe_filename(sheet.Name)}.pdf")
+    pdf_path = os.path.join(output_dir, f"{safe_filename(sheet.Name)}.pdf")
     sheet.ExportAsFixedFormat(
         Type=PDF_TYPE,  # PDF
         Filename=pdf_path,
@@ -99,107 +188,6 @@ def _export_sheet_to_pdf(sheet, output_dir: str):
     )
 
 
-# --- Metadata extraction ---
-def read_invoice_meta_col_a(sheet, max_rows=50):
-    """ Read invoice metadata from given sheet. """
-    period_text = _find_right_cell_value(sheet, "Periood", max_rows)
-    address_text = _find_right_cell_value(sheet, "Aadress", max_rows)
-    print(f'Address text: "{address_text}"')
-    print(f'Period text: "{period_text}"')
-    return {
-        "period": _extract_period(period_text),
-        "address": _extract_address(address_text),
-        "year": _extract_year(period_text),
-    }
-
-def _extract_address(text: str) -> str:
-    """ Extract address from text by removing apartment number if present. """
-    return text.split(",")[0].strip()
-
-
-def extract_apartment(text: str) -> str:
-    """ Extract apartment number from text, if present. """
-    return text.split(" ")[-1].strip()
-
-
-def _extract_year(text: str) -> str:
-    """ Extract year from text. """
-    return text.split(".")[-1].strip()
-
-
-def _extract_period(text: str) -> str:
-    """ Extract period from text. """
-    match = re.search(r"(\d{1,2}\.\d{1,2}\.\d{4})\s*$", text.strip())
-    if not match:
-        return ""
-    parsed_date = datetime.strptime(match.group(1), "%d.%m.%Y")
-    return ESTONIAN_MONTHS[parsed_date.month]
-
-
-def _find_right_cell_value(sheet, label: str, max_rows=50) -> str:
-    """ Find cell with given label and return value of the cell to its right. """
-    target_label = normalize_label(label)
-
-    for row_idx in range(1, max_rows + 1):
-        cell = sheet.Cells(row_idx, 1)  # Column A
-        cell_text = normalize_label(get_cell_text(cell))
-        if cell_text != target_label:
-            continue
-
-        value_cell = sheet.Cells(row_idx, 2)  # Column B
-        return get_cell_text(value_cell).strip()
-    return ""
-
-
-def remove_forbidden_trailing_rows(worksheet, forbidden_labels: list[str], column_index: int = 1):
-    forbidden_norm = {normalize_label(label) for label in forbidden_labels}
-
-    last_row = get_last_used_row(worksheet)
-    while last_row >= 1:
-        cell_text = get_cell_text(worksheet.Cells(last_row, column_index))
-        normalized = normalize_label(cell_text)
-
-        if normalized in forbidden_norm:
-            print(f"Removing row {last_row} because it contains a forbidden label.")
-            worksheet.Rows(last_row).Delete()
-            last_row -= 1
-            continue
-        break # No more forbidden rows at the end
-
-
-def get_last_used_row(worksheet) -> int:
-    used_range = worksheet.UsedRange
-    start_row = used_range.Row
-    row_count = used_range.Rows.Count
-    return int(start_row + row_count - 1)
-
-
-def get_cell_text(cell) -> str:
-    """ Safely get cell text, handling merged cells. """
-    try:
-        displayed_text = cell.Text
-        if displayed_text is not None and str(displayed_text).strip():
-            return str(displayed_text)
-    except Exception as e:
-        log_exception(e)
-        pass
-
-    try:
-        raw_value = cell.Value
-        return "" if raw_value is None else str(raw_value)
-    except Exception as e:
-        log_exception(e)
-        return ""
-
-
-def normalize_label(label: str) -> str:
-    """ Normalize label for comparison: lowercase, strip whitespace and trailing colon. """
-    norm = "" if label is None else str(label).strip().lower()
-    norm = norm.replace("\xa0", " ") # non-breaking space
-    norm = norm[:1].strip() if norm.endswith(":") else norm
-    return " ".join(norm.split())
-
-
 def debug_print_range(ws, nrows=40, ncols=8, start_row=1, start_col=1):
     """
     Prints a rectangular block from the worksheet.
@@ -0,0 +1,119 @@
+import re, logging
+
+from src.data_classes import FieldSpec, ValidationError
+from utils.file_utils import read_config, load_field_specs
+
+# Apartment in the address, e.g. '113-64' (house 113, apartment 64)
+APARTMENT_RE = re.compile(r"\b(\d{1,3})-(\d+)\b")
+
+
+def _address_apartment(value: str) -> dict[str, str]:
+    """Split 'Tamme tn 113-64' into address 'Tamme tn 113' and apartment '64' (the last match wins)."""
+    matches = list(APARTMENT_RE.finditer(value))
+    if not matches:
+        logging.info(f"No apartment match found. Extracted address='{value}', apartment=''")
+        return {"address": value, "apartment": ""}
+
+    last_match = matches[-1]
+    house_number, apartment = last_match.groups()
+    before_apt = value[: last_match.start()].strip()
+    return {"address": f"{before_apt} {house_number}".strip(), "apartment": apartment}
+
+
+# Post-processors turn a field's raw value into one or more result fields
+POST_PROCESSORS = {
+    "address_apartment": _address_apartment,
+}
+
+# The fields every invoice needs
+DEFAULT_FIELD_SPECS = (
+    # "Aadress: Tamme tn 113-64", possibly continued on the next line
+    FieldSpec("address", "aadress", block=True, continuation=r"\d", continuation_exclude="reg. kood", post="address_apartment"),
+    # "Periood: september"
+    FieldSpec("period", "periood", split=r"[:\- ]+", part=1),
+    # "Kuupäev: 30.09.2025" -> year
+    FieldSpec("year", "kuupäev", split=r"[:\-\. ]+", part=-1),
+)
+
+
+class _CompiledField:
+    __slots__ = ("spec", "label", "split", "label_re", "continuation", "post")
+
+    def __init__(self, spec: FieldSpec):
+        if spec.post and spec.post not in POST_PROCESSORS:
+            raise ValidationError(f"Tundmatu järeltöötlus '{spec.post}' väljal '{spec.name}'")
+        self.spec = spec
+        self.label = spec.label
+        try:
+            self.split = re.compile(spec.split)
+            self.continuation = re.compile(spec.continuation) if spec.continuation else None
+        except re.error as e:
+            raise ValidationError(f"Vigane muster väljal '{spec.name}': {e}")
+        self.label_re = re.compile(re.escape(spec.label) + r"\s*[:\- ]\s*", re.IGNORECASE)
+        self.post = POST_PROCESSORS.get(spec.post)
+
+    def value(self, row: str, next_row: str | None) -> dict[str, str]:
+        spec = self.spec
+        if spec.block:
+            block = row.strip()
+            if self.continuation is not None and next_row is not None:
+                next_row = next_row.strip()
+                if self.continuation.search(next_row) and not (spec.continuation_exclude and spec.continuation_exclude in next_row):
+                    block += " " + next_row
+            # Text after the (last) label
+            value = self.label_re.split(block)[-1].strip()
+        else:
+            parts = [part.strip() for part in self.split.split(row) if part]
+            value = parts[spec.part].lower() if len(parts) >= spec.min_parts else ""
+        return self.post(value) if self.post else {spec.name: value}
+
+
+class FieldParser:
+    """
+    Field specs compiled once (patterns, post-processors) and matched in one walk over the rows,
+    which stops as soon as every field is found. The point is the spec table, fields can be added
+    from config.cfg: the walk is not measurably faster than the per-field scans it replaced
+    (benchmarks/bench_field_parser.py), parsing takes microseconds next to a page's OCR.
+    """
+
+    def __init__(self, specs):
+        self.fields = [_CompiledField(spec) for spec in specs]
+
+    def parse(self, text: str) -> dict[str, str]:
+        rows = text.splitlines()
+        pending = list(self.fields)
+        found = []  # (field, row index of the first row with its label)
+        for row_idx, row in enumerate(rows):
+            lowered = row.lower()
+            for field in pending:
+                if field.label in lowered:
+                    break
+            else:
+                continue  # the common case: no label on this row
+            for field in [field for field in pending if field.label in lowered]:
+                pending.remove(field)
+                found.append((field, row_idx))
+            if not pending:
+                break
+
+        for field in pending:
+            if field.spec.required:
+                raise ValidationError(f"Keyword '{field.label}' not found in rows")
+
+        result = {field.spec.name: "" for field in pending}
+        last_row = len(rows) - 1
+        for field, row_idx in found:
+            next_row = rows[row_idx + 1] if row_idx < last_row else None
+            result.update(field.value(rows[row_idx], next_row))
+        return result
+
+
+_parser = None
+
+
+def get_field_parser() -> FieldParser:
+    """The invoice field parser: DEFAULT_FIELD_SPECS plus the fields from config.cfg [invoice_fields]."""
+    global _parser
+    if _parser is None:
+        _parser = FieldParser(DEFAULT_FIELD_SPECS + tuple(load_field_specs(read_config())))
+    return _parser
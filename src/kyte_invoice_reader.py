@@ -0,0 +1,101 @@
+"""
+Kyte (heating) invoice workbooks: which sheets are invoices and the metadata they share.
+Works on any workbook object with the Excel COM shape (wb.Sheets, sheet.Name, sheet.Range(address).Value),
+so the same code reads through Excel or through utils.native_workbook.
+"""
+
+import re, logging
+from datetime import datetime
+
+from utils.sheet_snapshot import SheetSnapshot
+from src.data_classes import InvoiceItem, Cancelled, ValidationError
+
+ESTONIAN_MONTHS = {
+    1: "jaanuar", 2: "veebruar", 3: "märts", 4: "aprill",
+    5: "mai", 6: "juuni", 7: "juuli", 8: "august",
+    9: "september", 10: "oktoober", 11: "november", 12: "detsember",
+}
+
+
+def read_kyte_invoices(workbook, cancel_flag=None, on_progress=None) -> list[InvoiceItem]:
+    """One InvoiceItem per "Korter X" sheet, with address, period and year from the first one."""
+    sheet_names = get_korter_sheet_names(workbook)
+    if not sheet_names:
+        raise ValidationError("Excelis pole lehti nimega 'Korter ...'")
+
+    total = len(sheet_names)
+    if on_progress:
+        on_progress(0, total)
+
+    first_sheet = workbook.Sheets(sheet_names[0])
+    meta = read_invoice_meta_col_a(first_sheet)
+
+    invoices = []
+    for index, sheet_name in enumerate(sheet_names, start=1):
+        if cancel_flag is not None and cancel_flag.is_set():
+            raise Cancelled
+
+        invoices.append(
+            InvoiceItem(
+                apartment=extract_apartment(sheet_name),
+                excel_sheet_name=sheet_name,
+                address=meta.get("address"),
+                period=meta.get("period"),
+                year=meta.get("year"),
+            )
+        )
+        if on_progress:
+            on_progress(index, total)
+    return invoices
+
+
+def get_korter_sheet_names(wb) -> list[str]:
+    """ Return list of sheets named "Korter X" where X is a number. """
+    pattern = re.compile(r"^Korter\s+\d+$", re.IGNORECASE)
+    return [ws.Name for ws in wb.Sheets if pattern.match(str(ws.Name))]
+
+
+# --- Metadata extraction ---
+# Labels and values are looked up in A1:B{META_ROWS}
+META_ROWS = 50
+
+
+def read_address_text(sheet, max_rows=META_ROWS) -> str:
+    """ The sheet's full "Aadress" value (one read of A1:B{max_rows}), empty if it has none. """
+    return SheetSnapshot.read(sheet, max_rows, 2).right_of("Aadress")
+
+
+def read_invoice_meta_col_a(sheet, max_rows=META_ROWS):
+    """ Read invoice metadata from given sheet (one read of A1:B{max_rows}). """
+    snapshot = SheetSnapshot.read(sheet, max_rows, 2)
+    period_text = snapshot.right_of("Periood")
+    address_text = snapshot.right_of("Aadress")
+    logging.debug(f"Sheet '{sheet.Name}': address text '{address_text}', period text '{period_text}'")
+    return {
+        "period": _extract_period(period_text),
+        "address": _extract_address(address_text),
+        "year": _extract_year(period_text),
+    }
+
+def _extract_address(text: str) -> str:
+    """ Extract address from text by removing apartment number if present. """
+    return text.split(",")[0].strip()
+
+
+def extract_apartment(text: str) -> str:
+    """ Extract apartment number from text, if present. """
+    return text.split(" ")[-1].strip()
+
+
+def _extract_year(text: str) -> str:
+    """ Extract year from text. """
+    return text.split(".")[-1].strip()
+
+
+def _extract_period(text: str) -> str:
+    """ Extract period from text. """
+    match = re.search(r"(\d{1,2}\.\d{1,2}\.\d{4})\s*$", text.strip())
+    if not match:
+        return ""
+    parsed_date = datetime.strptime(match.group(1), "%d.%m.%Y")
+    return ESTONIAN_MONTHS[parsed_date.month]
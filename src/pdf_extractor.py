@@ -1,4 +1,4 @@
-from pypdf import PdfReader, PdfWriter
+from pypdf import PdfWriter
 import pandas as pd
 from pathlib import Path
 import re
@@ -6,17 +6,84 @@ import io, gc, fitz, logging, sys, os
 from PIL import Image, ImageOps, ImageFilter
 import pytesseract
 import traceback
+from dataclasses import replace
+from contextlib import contextmanager
 
-from src.data_classes import ValidationError
+from src.data_classes import ValidationError, Cancelled
 from utils.logging_helper import log_line
 from utils.ocr_helper import (
     check_tesseract_lang,
     render_page_to_image,
     preprocess_for_ocr,
     run_ocr_on_image,
+    get_preprocessor,
+)
+from src.data_classes import InvoiceItem, OcrSettings, OutputSettings
+from src.field_parser import get_field_parser
+from utils.file_utils import (
+    create_invoice_dir, read_config, load_ocr_settings, load_output_settings, get_cache_dir,
+    check_ocr_mode, OCR_MODE_ROI, OCR_MODE_CONFIDENCE,
+)
+from utils.ocr_cache import configure_ocr_cache
+from utils.ocr_engines import configure_ocr_engine
+from utils.ocr_pool import ocr_pages_parallel, resolve_worker_count, shared_ocr_pool
+from utils.ocr_runner import OcrDeadline, configure_ocr_cancel
+from utils.pdf_document import SourceDocument, SourcePage
+from utils.pdf_writer import InvoicePdfWriter
+from utils.job_manifest import JobManifest
+from utils.tracing import traced
+from utils.invoice_boundaries import InvoiceBoundaryDetector
+from utils.page_classifier import (
+    PageClassifier,
+    check_page_policy,
+    PAGE_INVOICE,
+    PAGE_BLANK,
+    PAGE_DUPLICATE,
+    PAGE_NON_INVOICE,
+    PAGE_CONTINUATION,
+    POLICY_SKIP,
+    POLICY_ERROR,
+    POLICY_PROCESS,
+)
+from utils.ocr_regions import (
+    HeaderRegions,
+    regions_from_config,
+    learn_header_regions,
+    ocr_page_with_boxes,
+    ocr_page_roi,
+    ocr_page_with_confidence,
+    regions_pixel_share,
+)
+
+
+# Pages with less embedded text than this are treated as scanned images
+TEXT_LAYER_MIN_CHARS = 20
+
+# InvoiceItem.source values: which extraction path produced the invoice
+SOURCE_TEXT_LAYER = "text"
+SOURCE_OCR = "ocr"
+
+# Job manifest unit of the invoice starting at a page: "page:<first page>"
+PAGE_UNIT_PREFIX = "page:"
+
+# Keys every parse result has; anything else comes from [invoice_fields]
+CORE_FIELDS = ("address", "apartment", "period", "year")
+
+# Split strategies that read the PDF's own structure, also used as InvoiceItem.source
+SPLIT_OUTLINE = "outline"
+SPLIT_PAGE_LABELS = "page_labels"
+
+# Apartment named in a bookmark title or page label: "Korter 64", "krt. 64", "Tamme 113-64"
+STRUCTURE_APARTMENT_RES = (
+    re.compile(r"\b(?:korter|krt|kt)\b\.?\s*(?:nr\.?\s*)?(\d+)", re.IGNORECASE),
+    re.compile(r"\b\d{1,3}-(\d+)\b"),
 )
-from src.data_classes import InvoiceItem
-from utils.file_utils import create_invoice_dir
+
+# Streaming window per OCR worker: two pages each keeps the pool busy between windows
+STREAM_PAGES_PER_WORKER = 2
+# Streaming window without a pool: small so the first invoice comes early, but not a single page,
+# so the DPI ladder still runs tier by tier over several pages
+STREAM_PAGES_SEQUENTIAL = 4
 
 
 logging.basicConfig(
@@ -45,10 +112,27 @@ def _parse_invoice_page(page, text: str, page_number: int, pdf_path: str) -> dic
         period=client_data["period"],
         apartment=client_data["apartment"],
         year=client_data["year"],
+        fields=_extra_fields(client_data),
     )
 
 
-def _ocr_single_page(page, page_idx, doc, pdf_path, lang, ocr_config, matrix, timeout_sec, on_progress, cancel_flag):
+def _extra_fields(client_data: dict) -> dict | None:
+    """The [invoice_fields] values of a parse result, None if none are configured."""
+    extra = {key: value for key, value in client_data.items() if key not in CORE_FIELDS}
+    return extra or None
+
+
+@contextmanager
+def _open_document(pdf_path: str, document: SourceDocument = None):
+    """Use the caller's already open document, or open (and close) one for this call."""
+    if document is not None:
+        yield document
+        return
+    with SourceDocument(pdf_path) as opened:
+        yield opened
+
+
+def _ocr_single_page(page, page_idx, position, total_pages, pdf_path, lang, ocr_config, matrix, timeout_sec, on_progress, cancel_flag, preprocess=preprocess_for_ocr):
     """OCR a single page and return the extracted text."""
     if cancel_flag and cancel_flag.is_set():
         logging.info("OCR process cancelled by user.")
@@ -56,19 +140,22 @@ def _ocr_single_page(page, page_idx, doc, pdf_path, lang, ocr_config, matrix, ti
 
     if on_progress:
         try:
-            on_progress(page_idx, doc.page_count)
+            on_progress(position, total_pages)
         except Exception:
             logging.debug(
                 "on_progress callback raised an exception:", exc_info=True
             )
 
-    logging.info(f"OCR processing page {page_idx}/{doc.page_count} of '{pdf_path}'")
+    logging.info(f"OCR processing page {page_idx} ({position}/{total_pages}) of '{pdf_path}'")
     img = None
     try:
         img = render_page_to_image(page, matrix)
-        img = preprocess_for_ocr(img)
+        img = preprocess(img)
         text = run_ocr_on_image(img, lang, ocr_config, page_idx, pdf_path, timeout_sec)
         return text
+    except Cancelled:
+        logging.info(f"OCR of page {page_idx} aborted, cancelled by user.")
+        return None
     finally:
         if img is not None:
             try:
@@ -86,10 +173,16 @@ def ocr_pdf_all_pages(
     timeout_sec: int = 120,
     on_progress=None,  # callback: on_progress(page_number: int, total_pages: int)
     cancel_flag=None,  # optional threading.Event to signal cancellation
+    workers: int = 1,  # >1 (or 0 = auto) fans pages out to a process pool
+    page_numbers: list[int] = None,  # 1-based pages to OCR, None = all pages
+    preprocess=preprocess_for_ocr,  # image preprocessing function, see get_preprocessor
+    document: SourceDocument = None,  # already open source PDF, avoids parsing it again
 ) -> list[str]:
     """
     OCR all pages from a PDF file using PyMuPDF and Tesseract.
     Returns a list of extracted text strings, one per page (may be empty).
+    With page_numbers only those pages are OCR'd and the texts follow that order.
+    With workers != 1 pages are OCR'd in parallel processes, results stay in page order.
     """
 
     log_line(f"Using tesseract_cmd={pytesseract.pytesseract.tesseract_cmd}")
@@ -104,14 +197,31 @@ def ocr_pdf_all_pages(
 
     ocr_config = f"--oem {oem} --psm {psm}"
 
-    with fitz.open(pdf_path) as doc:
-        total_pages = doc.page_count
+    with _open_document(pdf_path, document) as doc:
+        if page_numbers is None:
+            page_numbers = list(range(1, doc.page_count + 1))
+        total_pages = len(page_numbers)
+
+        if total_pages > 1 and resolve_worker_count(workers, total_pages) > 1:
+            return ocr_pages_parallel(
+                pdf_path,
+                page_numbers,
+                lang,
+                ocr_config,
+                dpi,
+                timeout_sec,
+                workers,
+                on_progress=on_progress,
+                cancel_flag=cancel_flag,
+                preprocess=preprocess,
+            )
 
-        for i, page in enumerate(doc, start=1):
+        for position, page_idx in enumerate(page_numbers, start=1):
             text = _ocr_single_page(
-                page,
-                i,
-                doc,
+                doc.load_page(page_idx),
+                page_idx,
+                position,
+                total_pages,
                 pdf_path,
                 lang,
                 ocr_config,
@@ -119,6 +229,7 @@ def ocr_pdf_all_pages(
                 timeout_sec,
                 on_progress,
                 cancel_flag,
+                preprocess,
             )
             if text is not None:
                 texts.append(text)
@@ -130,123 +241,795 @@ def ocr_pdf_all_pages(
     return texts
 
 
-# Only splity the files here, extract information in another function
-def separate_invoices(pdf_path, on_progress=None, cancel_flag=None):
+def require_invoice_fields(text: str) -> dict:
+    """Parse invoice fields and raise ValidationError unless address and apartment were found."""
+    client_data = extract_address_period_apartment(text)
+    if not client_data["address"] or not client_data["apartment"]:
+        raise ValidationError("Address or apartment missing from page text")
+    return client_data
+
+
+def ocr_pdf_header_regions(
+    pdf_path: str,
+    page_numbers: list[int],
+    settings: OcrSettings,
+    on_progress=None,
+    cancel_flag=None,
+    document: SourceDocument = None,
+    header_regions: HeaderRegions = None,
+) -> list[str]:
     """
-    Separate a multi-invoice PDF into individual invoices by OCRing each page and extracting relevant data.
-    Returns a list of Invoice objects.
+    OCR only the invoice header fields of the given pages (1-based).
+    The regions come from settings.header_crop, or are learned from the word boxes of the
+    first page that parses. Pages whose crop does not parse are OCR'd in full.
+    Pass the job's header_regions so regions learned by one call are used by the next ones.
+    Returns texts in page order, like ocr_pdf_all_pages.
     """
-    if on_progress:
-        page_texts = ocr_pdf_all_pages(
-            pdf_path, "est", dpi=300, on_progress=on_progress, cancel_flag=cancel_flag
+    log_line(f"Using tesseract_cmd={pytesseract.pytesseract.tesseract_cmd}")
+    check_tesseract_lang(settings.lang)
+
+    full_config = f"--oem {settings.oem} --psm {settings.psm}"
+    scale = settings.dpi / 72
+    matrix = fitz.Matrix(scale, scale)
+    if header_regions is None:
+        header_regions = HeaderRegions(regions_from_config(settings.header_crop))
+    regions = header_regions.regions
+    preprocess = get_preprocessor(settings.preprocess, settings.threshold)
+    total_pages = len(page_numbers)
+    texts: list[str] = []
+
+    with _open_document(pdf_path, document) as doc:
+        for position, page_idx in enumerate(page_numbers, start=1):
+            remaining = page_numbers[position - 1:]
+            if regions is not None and len(remaining) > 1 and resolve_worker_count(settings.workers, len(remaining)) > 1:
+                break  # regions known, hand the rest to the pool
+
+            if cancel_flag and cancel_flag.is_set():
+                logging.info("OCR process cancelled by user.")
+                return texts
+
+            if on_progress:
+                try:
+                    on_progress(position, total_pages)
+                except Exception:
+                    logging.debug("on_progress callback raised an exception:", exc_info=True)
+
+            img = None
+            try:
+                img = preprocess(render_page_to_image(doc.load_page(page_idx), matrix))
+                if regions is not None:
+                    text = ocr_page_roi(
+                        img, regions, require_invoice_fields, settings.lang, settings.oem,
+                        settings.psm, page_idx, pdf_path, settings.timeout_sec,
+                    )
+                else:
+                    text, regions = _ocr_page_and_learn_regions(img, page_idx, pdf_path, settings, full_config)
+                    header_regions.regions = regions
+            except Cancelled:
+                logging.info(f"OCR of page {page_idx} aborted, cancelled by user.")
+                return texts
+            finally:
+                if img is not None:
+                    img.close()
+            texts.append(text)
+        else:
+            return texts
+
+    # Remaining pages in parallel, progress continues from where the sequential part stopped
+    done_before = len(texts)
+
+    def pool_progress(done, _total):
+        if on_progress:
+            on_progress(done_before + done, total_pages)
+
+    texts.extend(
+        ocr_pages_parallel(
+            pdf_path,
+            page_numbers[done_before:],
+            settings.lang,
+            full_config,
+            settings.dpi,
+            settings.timeout_sec,
+            settings.workers,
+            on_progress=pool_progress,
+            cancel_flag=cancel_flag,
+            roi=(regions, require_invoice_fields, settings.oem, settings.psm),
+            preprocess=preprocess,
+        )
+    )
+    return texts
+
+
+def ocr_pdf_with_confidence(
+    pdf_path: str,
+    page_numbers: list[int],
+    settings: OcrSettings,
+    on_progress=None,
+    cancel_flag=None,
+    document: SourceDocument = None,
+) -> list[tuple[str, float | None]]:
+    """
+    OCR the given pages (1-based) with word confidences; weak address, apartment and period
+    tokens are re-read on a tight crop (see ocr_page_with_confidence).
+    Returns (text, confidence) pairs in page order.
+    """
+    log_line(f"Using tesseract_cmd={pytesseract.pytesseract.tesseract_cmd}")
+    check_tesseract_lang(settings.lang)
+
+    preprocess = get_preprocessor(settings.preprocess, settings.threshold)
+    total_pages = len(page_numbers)
+    if total_pages > 1 and resolve_worker_count(settings.workers, total_pages) > 1:
+        return ocr_pages_parallel(
+            pdf_path,
+            page_numbers,
+            settings.lang,
+            f"--oem {settings.oem} --psm {settings.psm}",
+            settings.dpi,
+            settings.timeout_sec,
+            settings.workers,
+            on_progress=on_progress,
+            cancel_flag=cancel_flag,
+            preprocess=preprocess,
+            confidence=(settings.oem, settings.psm, settings.min_confidence),
+        )
+
+    scale = settings.dpi / 72
+    matrix = fitz.Matrix(scale, scale)
+    results = []
+    with _open_document(pdf_path, document) as doc:
+        for position, page_idx in enumerate(page_numbers, start=1):
+            if cancel_flag and cancel_flag.is_set():
+                logging.info("OCR process cancelled by user.")
+                break
+
+            if on_progress:
+                try:
+                    on_progress(position, total_pages)
+                except Exception:
+                    logging.debug("on_progress callback raised an exception:", exc_info=True)
+
+            img = None
+            try:
+                img = preprocess(render_page_to_image(doc.load_page(page_idx), matrix))
+                results.append(
+                    ocr_page_with_confidence(
+                        img, settings.lang, settings.oem, settings.psm, settings.min_confidence,
+                        page_idx, pdf_path, settings.timeout_sec,
+                    )
+                )
+            except Cancelled:
+                logging.info(f"OCR of page {page_idx} aborted, cancelled by user.")
+                break
+            finally:
+                if img is not None:
+                    img.close()
+    return results
+
+
+def _ocr_page_and_learn_regions(img, page_idx, pdf_path, settings: OcrSettings, full_config: str):
+    """Full-page OCR with word boxes; returns (text, regions or None if they could not be learned)."""
+    try:
+        text, data = ocr_page_with_boxes(img, settings.lang, full_config, settings.timeout_sec)
+    except Cancelled:
+        raise
+    except Exception as e:
+        logging.error(f"OCR with word boxes failed on page {page_idx} of '{pdf_path}': {e}")
+        return run_ocr_on_image(img, settings.lang, full_config, page_idx, pdf_path, settings.timeout_sec), None
+
+    try:
+        require_invoice_fields(text)
+    except ValidationError:
+        return text, None
+
+    regions = learn_header_regions(data, *img.size)
+    if regions is not None:
+        log_line(
+            f"Learned header regions from page {page_idx}: "
+            f"{regions_pixel_share(regions):.0%} of the page is sent to Tesseract"
+        )
+    return text, regions
+
+
+@traced("text_layer")
+def extract_text_layer(pdf_path: str, page_numbers: list[int] = None, document: SourceDocument = None) -> list[str]:
+    """
+    Return the embedded (native) text of every page (or of page_numbers, 1-based),
+    empty string for image-only pages.
+    """
+    with _open_document(pdf_path, document) as doc:
+        if page_numbers is None:
+            page_numbers = range(1, doc.page_count + 1)
+        return [doc.page_text(page_idx) for page_idx in page_numbers]
+
+
+def _parse_text_layer_page(page, text: str, page_number: int):
+    """
+    Try to build an invoice from a page's embedded text.
+    Returns None if the text is missing or does not parse, so the page goes through OCR instead.
+    """
+    if len(text.strip()) < TEXT_LAYER_MIN_CHARS:
+        return None
+    try:
+        client_data = require_invoice_fields(text)
+    except ValidationError as e:
+        logging.info(f"Text layer of page {page_number} not usable ({e}), falling back to OCR")
+        return None
+
+    return InvoiceItem(
+        pdf_page=page,
+        address=client_data["address"],
+        period=client_data["period"],
+        apartment=client_data["apartment"],
+        year=client_data["year"],
+        fields=_extra_fields(client_data),
+        source=SOURCE_TEXT_LAYER,
+    )
+
+
+def _ocr_pages(
+    document: SourceDocument, page_numbers, settings: OcrSettings, on_progress, cancel_flag, header_regions: HeaderRegions = None
+) -> list[tuple[str, float | None]]:
+    """
+    OCR the given pages with the engine selected by settings.ocr_mode.
+    Returns (text, confidence) pairs; confidence is only measured in confidence mode.
+    """
+    pdf_path = document.path
+    if settings.ocr_mode == OCR_MODE_CONFIDENCE:
+        return ocr_pdf_with_confidence(
+            pdf_path, page_numbers, settings, on_progress=on_progress, cancel_flag=cancel_flag, document=document
         )
-    else:
-        page_texts = ocr_pdf_all_pages(
-            pdf_path, "est", dpi=300, cancel_flag=cancel_flag
+    if settings.ocr_mode == OCR_MODE_ROI:
+        texts = ocr_pdf_header_regions(
+            pdf_path, page_numbers, settings, on_progress=on_progress, cancel_flag=cancel_flag, document=document,
+            header_regions=header_regions,
         )
-    reader = PdfReader(pdf_path)
+        return [(text, None) for text in texts]
+    texts = ocr_pdf_all_pages(
+        pdf_path,
+        settings.lang,
+        dpi=settings.dpi,
+        psm=settings.psm,
+        oem=settings.oem,
+        timeout_sec=settings.timeout_sec,
+        on_progress=on_progress,
+        cancel_flag=cancel_flag,
+        workers=settings.workers,
+        page_numbers=page_numbers,
+        preprocess=get_preprocessor(settings.preprocess, settings.threshold),
+        document=document,
+    )
+    return [(text, None) for text in texts]
+
+
+def _apartments_in_sequence(candidates: dict[int, str], known: dict[int, str]) -> set[int]:
+    """
+    Pages of candidates whose apartment fits the nearest other read before and after it (known
+    or candidate): apartments rise by at least one and by at most one per page. A page needs at
+    least one such neighbour and none that contradicts it, so a digit misread at low DPI (and
+    the neighbour it then contradicts) goes on to the next tier instead of naming the wrong flat.
+    """
+    numbers = {}
+    for page, apartment in {**known, **candidates}.items():
+        if apartment and apartment.isdigit():
+            numbers[page] = int(apartment)
+    pages = sorted(numbers)
+    in_sequence = set()
+    for i, page in enumerate(pages):
+        if page not in candidates:
+            continue
+        pairs = []
+        if i > 0:
+            pairs.append((pages[i - 1], page))
+        if i + 1 < len(pages):
+            pairs.append((page, pages[i + 1]))
+        if pairs and all(0 < numbers[after] - numbers[before] <= after - before for before, after in pairs):
+            in_sequence.add(page)
+    return in_sequence
+
+
+def _ocr_and_parse_pages(
+    document: SourceDocument,
+    page_numbers,
+    settings: OcrSettings,
+    on_progress,
+    cancel_flag,
+    header_regions: HeaderRegions = None,
+    known_apartments: dict[int, str] = None,
+):
+    """
+    OCR and parse the given pages, walking up the DPI ladder.
+    Each tier only re-renders the pages whose text did not parse at the previous, cheaper DPI.
+    Below the last tier a read is only accepted if it parses fully, is confident enough (confidence
+    mode) and, with settings.dpi_ladder_sequence, its apartment is in sequence with the neighbouring
+    pages (known_apartments: page -> apartment already read elsewhere, e.g. from the text layer),
+    see _apartments_in_sequence.
+    header_regions carries the roi mode regions of the job across calls (see ocr_pdf_header_regions).
+    Returns (invoices by page, non-invoice pages skipped per settings.non_invoice_pages).
+    """
+    pdf_path = document.path
+    ladder = settings.dpi_ladder or (settings.dpi,)
+    invoices_by_page: dict[int, InvoiceItem] = {}
+    non_invoice_pages = []
+    pending = list(page_numbers)
+    tier_counts = []
+    known = dict(known_apartments or {})
+
+    for tier, dpi in enumerate(ladder):
+        is_last_tier = tier == len(ladder) - 1
+        page_results = _ocr_pages(document, pending, replace(settings, dpi=dpi), on_progress, cancel_flag, header_regions)
+
+        if len(page_results) != len(pending) and not cancel_flag:
+            raise ValidationError(
+                f"PDF faili '{pdf_path}' OCR-tulemus on ebajärjekindel (lehtede arv ei klapi)."
+            )
+
+        accepted = list(zip(pending, page_results))
+        failed = []
+        if not is_last_tier:
+            candidates = {}
+            for idx, (text, confidence) in accepted:
+                try:
+                    client_data = require_invoice_fields(text)
+                except ValidationError:
+                    continue
+                if not client_data["period"] or not client_data["year"]:
+                    continue
+                if confidence is not None and confidence < settings.min_confidence:
+                    continue
+                candidates[idx] = client_data["apartment"]
+            in_sequence = set(candidates)
+            if settings.dpi_ladder_sequence:
+                in_sequence = _apartments_in_sequence(candidates, known)
+                out_of_sequence = [idx for idx in candidates if idx not in in_sequence]
+                if out_of_sequence:
+                    log_line(
+                        f"{len(out_of_sequence)} pages of '{pdf_path}' read at {dpi} dpi have no apartment in sequence "
+                        f"with the pages around them (first: page {out_of_sequence[0]}), reading them at the next DPI; "
+                        "DPI_LADDER_SEQUENCE=0 if the PDF is not sorted by apartment"
+                    )
+            failed = [idx for idx, _result in accepted if idx not in in_sequence]
+            accepted = [(idx, result) for idx, result in accepted if idx in in_sequence]
 
-    if len(page_texts) != len(reader.pages) and not cancel_flag:
+        for idx, (text, confidence) in accepted:
+            if is_last_tier and settings.non_invoice_pages == POLICY_SKIP and "aadress" not in text.lower():
+                non_invoice_pages.append(idx)
+                continue
+            invoice = _parse_invoice_page(document.page(idx), text, idx, pdf_path)
+            invoice.source = SOURCE_OCR
+            invoice.ocr_dpi = dpi
+            invoice.ocr_confidence = confidence
+            invoices_by_page[idx] = invoice
+            known[idx] = invoice.apartment
+        tier_counts.append(f"{dpi} dpi: {len(pending) - len(failed)}")
+
+        if not failed or (cancel_flag and cancel_flag.is_set()):
+            break
+        logging.info(f"{len(failed)} pages not accepted at {dpi} dpi, retrying at next DPI tier")
+        pending = failed
+
+    if len(ladder) > 1:
+        log_line(f"DPI ladder for '{pdf_path}': " + ", ".join(tier_counts))
+    return invoices_by_page, non_invoice_pages
+
+
+def _classify_pages(classifier: PageClassifier, page_numbers: list[int], settings: OcrSettings, pdf_path: str) -> list[int]:
+    """Apply the blank/duplicate page policies before any text is read; returns the pages to read."""
+    policies = {PAGE_BLANK: settings.blank_pages, PAGE_DUPLICATE: settings.duplicate_pages}
+    if all(policy == POLICY_PROCESS for policy in policies.values()):
+        return page_numbers
+
+    keep = []
+    for idx in page_numbers:
+        page_class, original = classifier.classify(idx)
+        policy = policies.get(page_class, POLICY_PROCESS)
+        if policy == POLICY_PROCESS:
+            keep.append(idx)
+            continue
+        if policy == POLICY_ERROR:
+            if page_class == PAGE_BLANK:
+                raise ValidationError(f"PDF faili '{pdf_path}' lehekülg {idx} on tühi.")
+            raise ValidationError(f"PDF faili '{pdf_path}' lehekülg {idx} kordab lehekülge {original}.")
+        same_as = f" (same as page {original})" if original is not None else ""
+        logging.info(f"Skipping {page_class} page {idx} of '{pdf_path}'{same_as}")
+        classifier.count(page_class)
+    return keep
+
+
+def _leading_non_invoice_page(classifier: PageClassifier, idx: int, settings: OcrSettings, pdf_path: str):
+    """A page with no invoice start before it cannot be a continuation page: apply the non-invoice policy."""
+    if settings.non_invoice_pages != POLICY_SKIP:
         raise ValidationError(
-            f"PDF faili '{pdf_path}' OCR-tulemus on ebajärjekindel (lehtede arv ei klapi)."
+            f"PDF faili '{pdf_path}' leheküljel {idx} puudub aadress ja sellele ei eelne ühtegi arvet."
+        )
+    logging.info(f"Skipping {PAGE_NON_INVOICE} page {idx} of '{pdf_path}' (before the first invoice)")
+    classifier.mark_non_invoice(idx)
+    classifier.count(PAGE_NON_INVOICE)
+
+
+def apartment_from_title(title: str) -> str | None:
+    """Apartment number named in a bookmark title or page label, None if it names none."""
+    for pattern in STRUCTURE_APARTMENT_RES:
+        match = pattern.search(title or "")
+        if match:
+            return match.group(1)
+    return None
+
+
+def _groups_from_outline(document: SourceDocument) -> list[tuple[str, list[int]]] | None:
+    """(apartment, pages) per bookmark naming an apartment; None unless they cover every page."""
+    starts: dict[int, str] = {}
+    for _level, title, page in document.outline():
+        apartment = apartment_from_title(title)
+        if apartment is None or page < 1:
+            continue
+        if starts.setdefault(page, apartment) != apartment:
+            return None  # two apartments on one page
+    if not starts or min(starts) != 1:
+        return None
+    first_pages = sorted(starts)
+    ends = first_pages[1:] + [document.page_count + 1]
+    return [(starts[first], list(range(first, end))) for first, end in zip(first_pages, ends)]
+
+
+def _groups_from_page_labels(document: SourceDocument) -> list[tuple[str, list[int]]] | None:
+    """(apartment, pages) per run of pages labelled with the same apartment; None unless every page is."""
+    groups = []
+    for page in range(1, document.page_count + 1):
+        apartment = apartment_from_title(document.page_label(page))
+        if apartment is None:
+            return None
+        if groups and groups[-1][0] == apartment:
+            groups[-1][1].append(page)
+        else:
+            groups.append((apartment, [page]))
+    return groups
+
+
+def _invoices_from_document_structure(document: SourceDocument, settings: OcrSettings, on_progress, cancel_flag, header_regions=None):
+    """
+    Build the invoices from bookmarks or page labels when they name an apartment for every page.
+    The first page of every invoice is still read (text layer, else OCR) and must name the
+    apartment of its bookmark or label: one wrong entry would send an invoice to another owner.
+    A page without its own bookmark would be added to the apartment before it, so such an
+    outline is only used with settings.multi_page_invoices.
+    Returns (strategy, invoices), or None to split page by page.
+    """
+    for strategy, find_groups in ((SPLIT_OUTLINE, _groups_from_outline), (SPLIT_PAGE_LABELS, _groups_from_page_labels)):
+        groups = find_groups(document)
+        if not groups:
+            continue
+        if len({apartment for apartment, _pages in groups}) != len(groups):
+            logging.info(f"{strategy} of '{document.path}' names an apartment twice, not used for splitting")
+            continue
+
+        if strategy == SPLIT_OUTLINE and not settings.multi_page_invoices and any(len(pages) > 1 for _apartment, pages in groups):
+            logging.info(
+                f"{strategy} of '{document.path}' has pages without an apartment bookmark and invoices are "
+                "one page each (MULTI_PAGE_INVOICES=0), not used for splitting"
+            )
+            continue
+        check_pages = [pages[0] for _apartment, pages in groups]
+
+        try:
+            read = _read_pages(document, check_pages, settings, on_progress, cancel_flag, header_regions)
+        except ValidationError as e:
+            if len(check_pages) == 1:
+                raise
+            logging.warning(f"{strategy} of '{document.path}' could not be checked ({e}); not used for splitting")
+            continue
+        if cancel_flag and cancel_flag.is_set():
+            return None
+        unread = [page for page in check_pages if page not in read]
+        if unread:
+            logging.warning(f"{strategy} of '{document.path}': page {unread[0]} is not an invoice; not used for splitting")
+            continue
+        mismatches = [(apartment, pages[0]) for apartment, pages in groups if pages[0] in read and read[pages[0]].apartment != apartment]
+        if mismatches:
+            apartment, page = mismatches[0]
+            logging.warning(
+                f"{strategy} of '{document.path}' names apartment {apartment} for page {page}, "
+                f"the page says {read[page].apartment}; not used for splitting"
+            )
+            continue
+
+        invoices = []
+        for apartment, pages in groups:
+            checked = read[pages[0]]
+            invoice = InvoiceItem(
+                pdf_page=replace(document.page(pages[0]), continuation=tuple(pages[1:])),
+                address=checked.address,
+                period=checked.period,
+                apartment=apartment,
+                year=checked.year,
+                source=strategy,
+            )
+            invoice.ocr_dpi = checked.ocr_dpi
+            invoice.ocr_confidence = checked.ocr_confidence
+            invoices.append(invoice)
+        return strategy, invoices
+    return None
+
+
+def _read_pages(document: SourceDocument, pages: list[int], settings: OcrSettings, on_progress, cancel_flag, header_regions=None):
+    """Parse pages from their text layer, OCR the rest in one go; returns invoices by page (fewer if cancelled)."""
+    read = {}
+    if settings.use_text_layer:
+        for page in pages:
+            invoice = _parse_text_layer_page(document.page(page), document.page_text(page), page)
+            if invoice is not None:
+                read[page] = invoice
+    ocr_pages = [page for page in pages if page not in read]
+    if ocr_pages:
+        known = {page: invoice.apartment for page, invoice in read.items()}
+        invoices_by_page, _non_invoice = _ocr_and_parse_pages(
+            document, ocr_pages, settings, on_progress, cancel_flag, header_regions, known
         )
+        read.update(invoices_by_page)
+    return read
+
 
-    invoices = []
-    for idx, (page, text) in enumerate(zip(reader.pages, page_texts), start=1):
-        invoices.append(_parse_invoice_page(page, text, idx, pdf_path))
-    return invoices
+def _stream_window_size(settings: OcrSettings, page_count: int) -> int:
+    """Pages per streaming window: enough to keep every OCR worker busy, small enough to yield early."""
+    workers = resolve_worker_count(settings.workers, page_count)
+    if workers > 1:
+        return workers * STREAM_PAGES_PER_WORKER
+    if settings.non_invoice_pages == POLICY_SKIP and settings.duplicate_pages != POLICY_PROCESS:
+        return 1  # each page is checked against the non-invoice pages OCR'd before it
+    return STREAM_PAGES_SEQUENTIAL
 
 
-def build_address_block(rows: list[str]) -> str:
+def iter_invoices(
+    pdf_path,
+    on_progress=None,
+    cancel_flag=None,
+    settings: OcrSettings = None,
+    document: SourceDocument = None,
+    skip_pages: set[int] = frozenset(),
+):
     """
-    Build a text block containing "Aadress" line and (optionally) the next line if it looks like part of the address.
+    Yield the invoices of a multi-invoice PDF in page order as soon as their pages are done.
+    Pages are processed in small windows (text layer first, then OCR for the rest), so memory
+    does not grow with the page count and the first invoice is available almost immediately.
+    The PDF is parsed once; invoices point into it via SourcePage until they are written.
+    cancel_flag also kills the Tesseract runs in flight, and with settings.job_deadline_sec the
+    per-page timeout shrinks so the remaining pages share the time that is left.
+    Blank and repeated pages are found from a low-resolution render before any text is read
+    and handled per settings.blank_pages / duplicate_pages / non_invoice_pages.
+    With settings.multi_page_invoices, pages that do not start an invoice (see
+    InvoiceBoundaryDetector) are attached to the invoice before them without being OCR'd,
+    and an invoice is yielded once its next invoice starts.
+    Before all that, bookmarks and page labels naming the apartments are tried (settings.use_outline):
+    if they cover every page, the invoices come from them and only the first page is read.
+    skip_pages (done in an earlier run of the job, see JobManifest) are neither read nor yielded.
     """
+    if settings is None:
+        settings = load_ocr_settings(read_config())
+    check_ocr_mode(settings.ocr_mode)
+    check_page_policy("BLANK_PAGES", settings.blank_pages)
+    check_page_policy("DUPLICATE_PAGES", settings.duplicate_pages)
+    check_page_policy("NON_INVOICE_PAGES", settings.non_invoice_pages)
 
-    for i, row in enumerate(rows):
-        if "aadress" in row.lower():
-            address_block = row.strip()
+    if document is None:
+        # Not closed here: the yielded invoices keep it alive until they are saved
+        document = SourceDocument(pdf_path)
+    total_pages = document.page_count
+    window = _stream_window_size(settings, total_pages)
+    text_layer_count = 0
+    low_confidence_pages = []
+    classifier = PageClassifier(
+        document, settings.blank_ink_ratio, settings.duplicate_distance, settings.duplicate_pages != POLICY_PROCESS
+    )
+    boundaries = None
+    if settings.multi_page_invoices:
+        boundaries = InvoiceBoundaryDetector(document, settings, TEXT_LAYER_MIN_CHARS)
+    current = None  # multi-page mode: the invoice still collecting continuation pages
+    header_regions = HeaderRegions(regions_from_config(settings.header_crop))  # roi mode, learned once per job
+    last_apartment: dict[int, str] = {}  # page -> apartment of the last invoice read, for the DPI ladder check
 
-            # Check next row for possible continuation
-            if i + 1 < len(rows):
-                next_row = rows[i + 1].strip()
-                if re.search(r"\d", next_row) and "reg. kood" not in next_row:
-                    address_block += " " + next_row
-            return address_block
-    raise ValidationError("Keyword 'aadress' not found in rows")
+    configure_ocr_engine(settings.engine)
+    configure_ocr_cancel(cancel_flag)
+    deadline = OcrDeadline(
+        settings.job_deadline_sec, settings.timeout_sec, resolve_worker_count(settings.workers, total_pages)
+    )
+    cache = configure_ocr_cache(
+        settings.cache_enabled, settings.cache_dir or get_cache_dir(), settings.cache_max_mb
+    )
 
+    structured = None
+    if settings.use_outline:
+        structured = _invoices_from_document_structure(document, settings, on_progress, cancel_flag, header_regions)
+    if structured is not None:
+        strategy, invoices = structured
+        invoices = [invoice for invoice in invoices if invoice.pdf_page.number not in skip_pages]
+        log_line(f"Split strategy for '{pdf_path}': {strategy}, {len(invoices)} invoices from {total_pages} pages")
+        yield from invoices
+        if cache is not None:
+            cache.log_stats(pdf_path)
+        return
+    log_line(f"Split strategy for '{pdf_path}': page by page (text layer, then OCR)")
 
-def _extract_apartment_from_address(address_block: str) -> tuple[str, str]:
-    APARTMENT_RE = re.compile(r"\b(\d{1,3})-(\d+)\b")
+    with shared_ocr_pool(pdf_path, settings.workers, total_pages):
+        for start in range(1, total_pages + 1, window):
+            if cancel_flag and cancel_flag.is_set():
+                logging.info("OCR process cancelled by user.")
+                break
+
+            page_numbers = [idx for idx in range(start, min(start + window, total_pages + 1)) if idx not in skip_pages]
+            page_numbers = _classify_pages(classifier, page_numbers, settings, pdf_path)
+            invoices_by_page: dict[int, InvoiceItem] = {}
+            continuation_pages = set()
+
+            if settings.use_text_layer:
+                text_layers = extract_text_layer(pdf_path, page_numbers, document)
+            else:
+                text_layers = [""] * len(page_numbers)
+            for idx, text in zip(page_numbers, text_layers):
+                invoice = _parse_text_layer_page(document.page(idx), text, idx) if text else None
+                if invoice is not None:
+                    invoices_by_page[idx] = invoice
+                elif boundaries is not None and not boundaries.is_invoice_start(idx, text):
+                    continuation_pages.add(idx)
+            text_layer_count += len(invoices_by_page)
+
+            ocr_pages = [idx for idx in page_numbers if idx not in invoices_by_page and idx not in continuation_pages]
+            if ocr_pages:
+                def window_progress(done, _total, offset=start - 1):
+                    if on_progress:
+                        on_progress(min(offset + done, total_pages), total_pages)
 
-    # Find apartment matches like '113-64' in that block
-    matches = list(APARTMENT_RE.finditer(address_block))
+                window_settings = replace(settings, timeout_sec=deadline.page_timeout(total_pages - start + 1))
+                known_apartments = {**last_apartment, **{idx: invoice.apartment for idx, invoice in invoices_by_page.items()}}
+                ocr_invoices, non_invoice_pages = _ocr_and_parse_pages(
+                    document, ocr_pages, window_settings, window_progress, cancel_flag, header_regions, known_apartments
+                )
+                invoices_by_page.update(ocr_invoices)
+                for idx in non_invoice_pages:
+                    logging.info(f"Skipping {PAGE_NON_INVOICE} page {idx} of '{pdf_path}' (no 'Aadress' after OCR)")
+                    classifier.mark_non_invoice(idx)
+                    classifier.count(PAGE_NON_INVOICE)
 
-    if matches:
-        last_match = matches[-1]
-        house_number, apt_number = last_match.groups()
-        apartment = apt_number
+            for idx in page_numbers:
+                if idx in continuation_pages:
+                    if current is None:
+                        _leading_non_invoice_page(classifier, idx, settings, pdf_path)
+                        continue
+                    current.pdf_page = replace(current.pdf_page, continuation=(*current.pdf_page.continuation, idx))
+                    classifier.count(PAGE_CONTINUATION)
+                    continue
+                if idx not in invoices_by_page:
+                    continue
 
-        # Everything before the apartment number is the address
-        before_apt = address_block[: last_match.start()].strip()
-        address = f"{before_apt} {house_number}".strip()
-    else:
-        # No apartment match found, fallback to last part after splitting
-        apartment = ""
-        address = address_block
-        logging.info(
-            f"No apartment match found. Extracted address='{address}', apartment='{apartment}'"
+                invoice = invoices_by_page[idx]
+                last_apartment = {idx: invoice.apartment}
+                if invoice.ocr_confidence is not None and invoice.ocr_confidence < settings.min_confidence:
+                    low_confidence_pages.append(idx)
+                classifier.count(PAGE_INVOICE)
+                if boundaries is None:
+                    yield invoice
+                    continue
+                if current is not None:
+                    yield current  # its next invoice has started, no more pages for it
+                current = invoice
+
+        if current is not None and not (cancel_flag and cancel_flag.is_set()):
+            yield current
+
+    logging.info(f"SEPARATE_INVOICES: {text_layer_count}/{total_pages} pages read from text layer")
+    log_line(f"Page classes for '{pdf_path}': {classifier.summary()}")
+    if low_confidence_pages:
+        log_line(
+            f"{len(low_confidence_pages)} pages of '{pdf_path}' below OCR confidence "
+            f"{settings.min_confidence}, check pages: {low_confidence_pages}"
+        )
+    if deadline.expires_at is not None:
+        log_line(
+            f"OCR job deadline {settings.job_deadline_sec}s, "
+            f"{deadline.remaining():.0f}s left at the end of '{pdf_path}'"
         )
-    return apartment, address
+    if cache is not None:
+        cache.log_stats(pdf_path)
+
+
+# Only splity the files here, extract information in another function
+def separate_invoices(pdf_path, on_progress=None, cancel_flag=None, settings: OcrSettings = None):
+    """
+    Separate a multi-invoice PDF into individual invoices and extract relevant data.
+    Pages with a usable embedded text layer are parsed directly, only the rest are OCR'd.
+    Returns a list of Invoice objects. See iter_invoices for the streaming variant.
+    """
+    return list(iter_invoices(pdf_path, on_progress=on_progress, cancel_flag=cancel_flag, settings=settings))
+
+
+def stream_invoices_to_dir(
+    pdf_path,
+    dest_root: Path,
+    on_progress=None,
+    cancel_flag=None,
+    settings: OcrSettings = None,
+    output_settings: OutputSettings = None,
+    manifest: JobManifest = None,
+):
+    """
+    Write each invoice's PDF as soon as its page is parsed (handed to the writer pool, so
+    writing overlaps with OCR of the next pages).
+    The invoice folder is created under dest_root from the first invoice (see create_invoice_dir).
+    With a manifest, every written invoice is recorded in it, and invoices an earlier run of the
+    same job already wrote are taken from it without reading their pages again.
+    Returns (invoices, invoice_dir); the returned invoices no longer hold their PDF page.
+    """
+    if output_settings is None:
+        output_settings = load_output_settings(read_config())
+
+    invoices_by_page: dict[int, InvoiceItem] = {}
+    done_pages = set()
+    if manifest is not None:
+        for unit, entry in list(manifest.units.items()):
+            restored = manifest.done_invoices(unit) if unit.startswith(PAGE_UNIT_PREFIX) else None
+            if restored:
+                invoices_by_page[entry["pages"][0]] = restored[0]
+                done_pages.update(entry["pages"])
+        if done_pages:
+            log_line(f"{len(invoices_by_page)} invoices of '{pdf_path}' already written, skipping {len(done_pages)} pages")
+
+    invoice_dir = None
+    if invoices_by_page:
+        invoice_dir = next(iter(invoices_by_page.values())).output_path.parent
+    written = {}  # output path -> (invoice, its pages) until the file is complete
+
+    def record_written(out_path: Path):
+        invoice, pages = written.pop(out_path)
+        manifest.record(f"{PAGE_UNIT_PREFIX}{pages[0]}", [invoice], output=out_path, pages=pages)
+
+    on_written = record_written if manifest is not None else None
+    with SourceDocument(pdf_path) as document, InvoicePdfWriter(document, output_settings, on_written) as writer:
+        for invoice in iter_invoices(
+            pdf_path, on_progress=on_progress, cancel_flag=cancel_flag, settings=settings, document=document,
+            skip_pages=done_pages,
+        ):
+            if invoice_dir is None:
+                invoice_dir = create_invoice_dir(dest_root, invoice)
+            pages = invoice.pdf_page.page_numbers
+            invoice.output_path = invoice_dir / f"{invoice.apartment}.pdf"
+            invoice.pdf_page = None  # queued for writing, let the page go
+            written[invoice.output_path] = (invoice, pages)
+            writer.submit(pages, invoice.output_path)
+            invoices_by_page[pages[0]] = invoice
+    return [invoices_by_page[page] for page in sorted(invoices_by_page)], invoice_dir
 
 
+@traced("parse")
 def extract_address_period_apartment(text):
-    rows = text.splitlines()
-
-    # --- Address & apartment ---
-    address_block = build_address_block(rows)
-
-    # Strip "Aadress" prefix
-    after_label = re.split(r"aadress\s*[:\- ]\s*", address_block, flags=re.IGNORECASE)[
-        -1
-    ].strip()
-
-    # Extract apartment number
-    apartment, address = _extract_apartment_from_address(after_label)
-
-    # Period
-    period_parts = extract_parts(rows, "periood")
-    period = period_parts[1] if len(period_parts) > 1 else ""
-
-    # Year
-    year_parts = extract_parts(rows, "kuupäev", pattern=r"[:\-\. ]+")
-    year = year_parts[-1] if len(year_parts) > 1 else ""
-
-    return {"address": address, "apartment": apartment, "period": period, "year": year}
-
-
-# Find row keyword, split it, return list of stripped parts
-def extract_parts(rows, keyword, pattern=r"[:\- ]+"):
-    for i, row in enumerate(rows):
-        if keyword in row.lower():
-            parts = [part.strip().lower() for part in re.split(pattern, row) if part]
-
-            if keyword == "aadress" and i + 1 < len(rows):
-                next_row = rows[i + 1].strip().lower()
-                if re.search(r"\d", next_row):
-                    extra_parts = [
-                        part.strip().lower()
-                        for part in re.split(pattern, next_row)
-                        if part
-                    ]
-                    parts.extend(extra_parts)
-            return parts
-    raise ValidationError(f"Keyword '{keyword}' not found in rows")
-
-
-def save_each_invoice_as_file(invoices, dest):
-    for invoice in invoices:
-        writer = PdfWriter()
-        writer.add_page(invoice.pdf_page)
-        with open(dest / f"{invoice.apartment}.pdf", "wb") as f:
-            writer.write(f)
+    """
+    Parse the invoice fields (address, apartment, period, year and any [invoice_fields]) from
+    page text in one pass, see field_parser. Raises ValidationError if a required label is missing.
+    """
+    return get_field_parser().parse(text)
+
+
+def save_each_invoice_as_file(invoices, dest, output_settings: OutputSettings = None):
+    """
+    Write one PDF per invoice into dest. invoices may be any iterable, e.g. iter_invoices(...).
+    Pages from a SourceDocument are copied within MuPDF through InvoicePdfWriter (parallel and
+    size-optimised per output_settings); other page objects are written with pypdf.
+    """
+    output_settings = output_settings or OutputSettings()
+    source_writer = None
+    try:
+        for invoice in invoices:
+            if isinstance(invoice.pdf_page, SourcePage):
+                if source_writer is None:
+                    source_writer = InvoicePdfWriter(invoice.pdf_page.document, output_settings)
+                source_writer.submit(invoice.pdf_page.page_numbers, dest / f"{invoice.apartment}.pdf")
+                continue
+            _write_pypdf_invoice(invoice, dest)
+    finally:
+        if source_writer is not None:
+            source_writer.close()
     return dest
+
+
+def _write_pypdf_invoice(invoice, dest):
+    writer = PdfWriter()
+    writer.add_page(invoice.pdf_page)
+    with open(dest / f"{invoice.apartment}.pdf", "wb") as f:
+        writer.write(f)
@@ -0,0 +1,124 @@
+"""In-memory stand-in for an Excel COM worksheet, counting the calls that would cross into Excel."""
+from collections import Counter
+
+from utils.sheet_snapshot import display_text, parse_range_address
+
+
+class FakeCell:
+    def __init__(self, sheet, row, col):
+        self._sheet, self.row, self.col = sheet, row, col
+
+    @property
+    def Value(self):
+        self._sheet.calls["Cell.Value"] += 1
+        return self._sheet.cells.get((self.row, self.col))
+
+    @property
+    def Text(self):
+        self._sheet.calls["Cell.Text"] += 1
+        return display_text(self._sheet.cells.get((self.row, self.col)))
+
+
+class FakeRange:
+    def __init__(self, sheet, address):
+        self._sheet = sheet
+        self.bounds = parse_range_address(address)
+
+    @property
+    def Value(self):
+        self._sheet.calls["Range.Value"] += 1
+        first_row, first_col, last_row, last_col = self.bounds
+        values = tuple(
+            tuple(self._sheet.cells.get((row, col)) for col in range(first_col, last_col + 1))
+            for row in range(first_row, last_row + 1)
+        )
+        return values[0][0] if (first_row, first_col) == (last_row, last_col) else values
+
+
+class FakeRows:
+    """worksheet.Rows(5) or worksheet.Rows("5:7")"""
+
+    def __init__(self, sheet, rows):
+        self._sheet = sheet
+        first, _, last = str(rows).partition(":")
+        self.first, self.last = int(first), int(last or first)
+
+    def Delete(self):
+        self._sheet.calls["Rows.Delete"] += 1
+        count = self.last - self.first + 1
+        self._sheet.deleted_rows.extend(range(self.first, self.last + 1))
+        self._sheet.cells = {
+            (row - count if row > self.last else row, col): value
+            for (row, col), value in self._sheet.cells.items()
+            if not self.first <= row <= self.last
+        }
+
+
+class FakeUsedRange(FakeRange):
+    def __init__(self, sheet):
+        rows = [row for row, _col in sheet.cells] or [1]
+        cols = [col for _row, col in sheet.cells] or [1]
+        self._sheet = sheet
+        self.bounds = (min(rows), min(cols), max(rows), max(cols))
+        self.Row, self.Column = min(rows), min(cols)
+        self.Rows = type("Rows", (), {"Count": max(rows) - min(rows) + 1})()
+
+
+class FakePageSetup:
+    PrintArea = ""
+
+
+class FakeWorksheet:
+    """
+    cells maps (row, col) to values; calls counts every Cells/Range/Rows access, i.e. what
+    would be a COM round trip against Excel.
+    """
+
+    def __init__(self, name="Korter 1", cells=None):
+        self.Name = name
+        self.cells = dict(cells or {})
+        self.calls = Counter()
+        self.deleted_rows = []
+        self.PageSetup = FakePageSetup()
+
+    @classmethod
+    def from_rows(cls, rows, name="Korter 1"):
+        """rows: list of row value lists starting at A1."""
+        return cls(name, {
+            (r, c): value for r, row in enumerate(rows, start=1) for c, value in enumerate(row, start=1) if value is not None
+        })
+
+    def Cells(self, row, col):
+        self.calls["Cells"] += 1
+        return FakeCell(self, row, col)
+
+    def Range(self, address):
+        self.calls["Range"] += 1
+        return FakeRange(self, address)
+
+    def Rows(self, rows):
+        self.calls["Rows"] += 1
+        return FakeRows(self, rows)
+
+    @property
+    def UsedRange(self):
+        self.calls["UsedRange"] += 1
+        return FakeUsedRange(self)
+
+
+class FakeSheets:
+    """workbook.Sheets: callable with a sheet name and iterable like the COM collection."""
+
+    def __init__(self, sheets):
+        self._sheets = {sheet.Name: sheet for sheet in sheets}
+
+    def __call__(self, name):
+        return self._sheets[name]
+
+    def __iter__(self):
+        return iter(self._sheets.values())
+
+
+class FakeWorkbook:
+    def __init__(self, sheets):
+        self.Sheets = FakeSheets(sheets)
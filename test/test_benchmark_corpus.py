@@ -0,0 +1,25 @@
+import fitz
+
+from benchmarks.corpus import Scenario, KIND_MIXED, make_invoice_pdf
+from src.data_classes import OcrSettings
+from src.pdf_extractor import separate_invoices
+
+
+def test_corpus_is_reproducible(tmp_path):
+    scenario = Scenario("mixed", 4, KIND_MIXED, noise=1.0)
+    first, second = tmp_path / "a.pdf", tmp_path / "b.pdf"
+
+    expected = make_invoice_pdf(str(first), scenario, seed=7)
+    assert make_invoice_pdf(str(second), scenario, seed=7) == expected
+
+    with fitz.open(str(first)) as doc:
+        assert [bool(page.get_text().strip()) for page in doc] == [True, False, True, False]
+
+
+def test_corpus_text_pages_parse_to_expected_fields(tmp_path):
+    pdf_path = tmp_path / "text.pdf"
+    expected = make_invoice_pdf(str(pdf_path), Scenario("text", 3), seed=7)
+
+    invoices = separate_invoices(str(pdf_path), settings=OcrSettings(cache_enabled=False))
+
+    assert [{"address": i.address, "apartment": i.apartment, "period": i.period, "year": i.year} for i in invoices] == expected
@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from src.data_classes import Cancelled
+from utils.excel_session import ExcelSession
+
+
+class FakeExcelBackend:
+    """Records the COM lifecycle calls the session makes instead of driving Excel."""
+
+    def __init__(self):
+        self.events = []
+        self.started = 0
+
+    def initialize(self):
+        self.events.append("init")
+
+    def uninitialize(self):
+        self.events.append("uninit")
+
+    def start(self):
+        self.started += 1
+        return f"excel{self.started}"
+
+    def pid(self, excel):
+        return 1000 + self.started
+
+    def open_workbook(self, excel, path):
+        self.events.append(("open", excel))
+        return f"workbook of {excel}"
+
+    def close_workbook(self, workbook):
+        self.events.append(("close", workbook))
+
+    def quit(self, excel):
+        self.events.append(("quit", excel))
+
+    def kill(self, pid):
+        self.events.append(("kill", pid))
+
+    def collect(self):
+        pass
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "kyte.xlsx"
+    path.write_bytes(b"xlsx")
+    return str(path)
+
+
+def test_extract_and_export_share_one_excel_until_closed(workbook):
+    backend = FakeExcelBackend()
+    session = ExcelSession(backend)
+
+    assert session.run(workbook, lambda excel, wb: (excel, wb)) == ("excel1", "workbook of excel1")
+    assert session.run(workbook, lambda excel, wb: excel) == "excel1"  # export, and a re-run
+    assert backend.started == 1 and backend.events.count(("open", "excel1")) == 1
+
+    session.close()
+    assert backend.events[-3:] == [("close", "workbook of excel1"), ("quit", "excel1"), "uninit"]
+    assert not session.running
+
+
+def test_error_shuts_excel_down_and_a_changed_file_is_reopened(workbook):
+    backend = FakeExcelBackend()
+    session = ExcelSession(backend)
+
+    def fail(excel, wb):
+        raise RuntimeError("COM error")
+
+    with pytest.raises(RuntimeError):
+        session.run(workbook, fail)
+    assert ("quit", "excel1") in backend.events
+
+    session.run(workbook, lambda excel, wb: None)
+    with open(workbook, "ab") as f:
+        f.write(b" saved again")
+    session.run(workbook, lambda excel, wb: None)
+    assert backend.started == 2
+    assert backend.events[-3:] == [("open", "excel2"), ("close", "workbook of excel2"), ("open", "excel2")]
+    session.close()
+
+
+def test_cancel_kills_excel_even_while_a_call_hangs(workbook):
+    backend = FakeExcelBackend()
+    session = ExcelSession(backend, shutdown_timeout=1.0)
+    cancel = threading.Event()
+    released = threading.Event()
+
+    def hanging_export(excel, wb):
+        cancel.set()
+        released.wait(5)  # a real COM call returns with an error once Excel is killed
+
+    backend.kill = lambda pid: (backend.events.append(("kill", pid)), released.set())
+    started = time.monotonic()
+    with pytest.raises(Cancelled):
+        session.run(workbook, hanging_export, cancel_event=cancel)
+
+    assert time.monotonic() - started < 3
+    assert ("kill", 1001) in backend.events and ("quit", "excel1") not in backend.events
+    assert not session.running
+
+    cancel.clear()
+    assert session.run(workbook, lambda excel, wb: excel) == "excel2"  # the next job starts a fresh Excel
+    session.close()
+
+
+def test_idle_session_quits_excel(workbook):
+    backend = FakeExcelBackend()
+    session = ExcelSession(backend, idle_timeout=0.1)
+    session.run(workbook, lambda excel, wb: None)
+
+    deadline = time.monotonic() + 3
+    while "uninit" not in backend.events and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert ("quit", "excel1") in backend.events and not session.running
+    assert session.run(workbook, lambda excel, wb: excel) == "excel2"
+    session.close()
@@ -0,0 +1,43 @@
+import configparser
+import pytest
+
+from src.data_classes import FieldSpec, ValidationError
+from src.field_parser import FieldParser, DEFAULT_FIELD_SPECS
+from utils.file_utils import load_field_specs
+
+
+def test_address_continues_on_next_row_unless_it_is_the_registry_code():
+    parser = FieldParser(DEFAULT_FIELD_SPECS)
+    wrapped = "AADRESS: Tamme tn\n113-64\nPERIOOD - September\nKuupäev 30-09-2025\n"
+    assert parser.parse(wrapped) == {"address": "Tamme tn 113", "apartment": "64", "period": "september", "year": "2025"}
+
+    with_reg_code = "Aadress: Tamme tn 113\nreg. kood 80012345\nPeriood: mai\nKuupäev: 01.06.2025"
+    assert parser.parse(with_reg_code)["address"] == "Tamme tn 113"
+
+
+def test_missing_required_label_raises():
+    with pytest.raises(ValidationError, match="periood"):
+        FieldParser(DEFAULT_FIELD_SPECS).parse("Aadress: Tamme tn 113-64\nKuupäev: 30.09.2025")
+
+
+def test_extra_field_is_optional():
+    parser = FieldParser(DEFAULT_FIELD_SPECS + (FieldSpec("summa", "tasuda", split=r"[:\s]+", part=-1, required=False),))
+    text = "Aadress: Tamme tn 113-64\nPeriood: mai\nKuupäev: 01.06.2025\nTasuda kokku: 42,17"
+    assert parser.parse(text)["summa"] == "42,17"
+    assert parser.parse(text.rsplit("\n", 1)[0])["summa"] == ""
+
+
+def test_load_field_specs_keeps_pipes_in_pattern():
+    config = configparser.ConfigParser()
+    config.read_string("[invoice_fields]\nviitenumber = Viitenumber | [:\\s]+|nr | -1\n")
+
+    (spec,) = load_field_specs(config)
+
+    assert (spec.name, spec.label, spec.split, spec.part, spec.required) == ("viitenumber", "viitenumber", "[:\\s]+|nr", -1, False)
+    text = "Aadress: Tamme tn 113-64\nPeriood: mai\nKuupäev: 01.06.2025\nViitenumber: 12345678"
+    assert FieldParser(DEFAULT_FIELD_SPECS + (spec,)).parse(text)["viitenumber"] == "12345678"
+
+
+def test_bad_pattern_is_a_validation_error():
+    with pytest.raises(ValidationError):
+        FieldParser([FieldSpec("summa", "summa", split="[")])
@@ -0,0 +1,63 @@
+import pytest
+import numpy as np
+import fitz
+from PIL import Image
+
+from utils.ocr_helper import preprocess_for_ocr, render_page_to_image, get_preprocessor
+from utils.image_preprocessing import preprocess_for_ocr_numpy, otsu_threshold
+
+
+INVOICE_TEXT = "Aadress: Tamme tn 113-{apartment}\nTartu 50101\nPeriood: september\nKuupäev: 30.09.2025"
+
+
+def _scanned_page(apartment: int, noise: float, seed: int, dpi: int = 150) -> Image.Image:
+    """Render an invoice header page and add scanner-like gaussian noise."""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((72, 72), INVOICE_TEXT.format(apartment=apartment), fontname="helv")
+    img = render_page_to_image(page, fitz.Matrix(dpi / 72, dpi / 72))
+    pixels = np.asarray(img, dtype=np.float64)
+    doc.close()
+
+    rng = np.random.default_rng(seed)
+    pixels = pixels + rng.normal(0, noise, pixels.shape) if noise else pixels
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+# Corpus of pages: the numpy engine must produce the exact bitmap Tesseract gets today,
+# so every parsed field stays the same
+@pytest.mark.parametrize("apartment, noise, seed", [
+    (1, 0, 0),
+    (64, 12, 1),
+    (113, 30, 2),
+    (7, 55, 3),
+])
+def test_numpy_engine_matches_pil_bitmap(apartment, noise, seed):
+    img = _scanned_page(apartment, noise, seed)
+
+    expected = preprocess_for_ocr(img)
+    actual = preprocess_for_ocr_numpy(img)
+
+    assert actual.mode == expected.mode == "1"
+    assert actual.tobytes() == expected.tobytes()
+
+
+def test_numpy_engine_matches_pil_on_rgb_and_tiny_images():
+    rng = np.random.default_rng(4)
+    for shape in [(1, 1, 3), (2, 5, 3), (31, 17, 3)]:
+        img = Image.fromarray(rng.integers(0, 256, shape, dtype=np.uint8), mode="RGB")
+        assert preprocess_for_ocr_numpy(img).tobytes() == preprocess_for_ocr(img).tobytes()
+
+
+def test_otsu_threshold_splits_bimodal_histogram():
+    hist = np.zeros(256)
+    hist[30] = 1000
+    hist[220] = 4000
+    assert 30 <= otsu_threshold(hist) < 220
+
+
+def test_get_preprocessor_otsu_same_for_both_engines():
+    img = _scanned_page(64, 25, 5)
+    pil = get_preprocessor("pil", "otsu")(img)
+    numpy_ = get_preprocessor("numpy", "otsu")(img)
+    assert pil.tobytes() == numpy_.tobytes()
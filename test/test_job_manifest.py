@@ -0,0 +1,70 @@
+import fitz
+
+from src import pdf_extractor
+from src.data_classes import InvoiceItem, OcrSettings, OutputSettings
+from src.pdf_extractor import stream_invoices_to_dir
+from utils.job_manifest import JobManifest, manifest_path
+
+INVOICE_TEXT = "Aadress: Tamme tn 113-{apartment}\nTartu 50101\nPeriood: september\nKuupäev: 30.09.2025"
+
+
+def _inputs(tmp_path, content=b"arved"):
+    invoice = tmp_path / "arved.pdf"
+    if not invoice.exists():
+        invoice.write_bytes(content)
+    return {"invoice": str(invoice)}
+
+
+def test_manifest_resumes_only_identical_inputs(tmp_path):
+    dest = tmp_path / "arved"
+    output = tmp_path / "64.pdf"
+    output.write_bytes(b"%PDF")
+    manifest = JobManifest.open(dest, "kommunaal", _inputs(tmp_path))
+    manifest.record("page:1", [InvoiceItem("Tamme tn 113", "mai", "64", "2025", fields={"summa": "1,00"})], output=output)
+    manifest.record("page:2", [InvoiceItem("Tamme tn 113", "mai", "65", "2025")], output=tmp_path / "65.pdf")
+    with open(manifest_path(dest), "a", encoding="utf-8") as f:
+        f.write('{"unit": "page:3", "invo')  # crash in the middle of a write
+
+    resumed = JobManifest.open(dest, "kommunaal", _inputs(tmp_path))
+    (invoice,) = resumed.done_invoices("page:1")
+    assert (invoice.apartment, invoice.fields, invoice.output_path) == ("64", {"summa": "1,00"}, output)
+    assert resumed.done("page:2") is None  # its file was never written
+    assert resumed.done("page:3") is None
+
+    (tmp_path / "arved.pdf").write_bytes(b"other arved")
+    assert JobManifest.open(dest, "kommunaal", _inputs(tmp_path)).units == {}
+
+
+def test_stream_resumes_after_written_invoices(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "arved.pdf"
+    doc = fitz.open()
+    for apartment in (1, 2, 3):
+        doc.new_page().insert_text((72, 72), INVOICE_TEXT.format(apartment=apartment), fontname="helv")
+    doc.save(str(pdf_path))
+    doc.close()
+    dest = tmp_path / "arved"
+    inputs = {"invoice": str(pdf_path)}
+
+    first_run = JobManifest.open(dest, "kommunaal", inputs)
+    invoices, invoice_dir = stream_invoices_to_dir(
+        str(pdf_path), dest, settings=OcrSettings(), output_settings=OutputSettings(), manifest=first_run
+    )
+    assert sorted(first_run.units) == ["page:1", "page:2", "page:3"]
+
+    (invoice_dir / "2.pdf").unlink()  # e.g. the run was killed before this file was finished
+    parsed = []
+    parse_text_layer_page = pdf_extractor._parse_text_layer_page
+    monkeypatch.setattr(
+        pdf_extractor, "_parse_text_layer_page",
+        lambda page, text, idx: parsed.append(idx) or parse_text_layer_page(page, text, idx),
+    )
+
+    resumed, resumed_dir = stream_invoices_to_dir(
+        str(pdf_path), dest, settings=OcrSettings(), output_settings=OutputSettings(),
+        manifest=JobManifest.open(dest, "kommunaal", inputs),
+    )
+
+    assert parsed == [2]
+    assert resumed_dir == invoice_dir
+    assert [invoice.apartment for invoice in resumed] == ["1", "2", "3"]
+    assert all(invoice.output_path.is_file() for invoice in resumed)
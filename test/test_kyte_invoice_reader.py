@@ -0,0 +1,73 @@
+import zipfile
+from datetime import datetime
+
+import openpyxl
+import pytest
+
+from src.data_classes import ValidationError
+from src.kyte_invoice_reader import read_kyte_invoices
+from utils.native_workbook import open_native_workbook, NativeWorkbookError
+
+
+def _kyte_workbook(path, period):
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Kokkuvõte"
+    for apartment in (1, 12):
+        sheet = workbook.create_sheet(f"Korter {apartment}")
+        sheet["A2"], sheet["B2"] = "Aadress", f"Tamme tn 113, korter {apartment}"
+        sheet["A3"], sheet["B3"] = " Periood ", period
+        sheet["A4"], sheet["B4"] = "Küte", 42.0
+    workbook.create_sheet("Korter A")
+    workbook.save(path)
+
+
+@pytest.mark.parametrize("period", ["01.09.2025 - 30.09.2025", datetime(2025, 9, 30)])
+def test_reads_kyte_invoices_without_excel(tmp_path, period):
+    path = tmp_path / "kyte.xlsx"
+    _kyte_workbook(path, period)
+
+    progress = []
+    with open_native_workbook(str(path)) as workbook:
+        invoices = read_kyte_invoices(workbook, on_progress=lambda done, total: progress.append((done, total)))
+        assert workbook.Sheets("Korter 1").Cells(4, 2).Text == "42"
+
+    assert [(i.excel_sheet_name, i.apartment) for i in invoices] == [("Korter 1", "1"), ("Korter 12", "12")]
+    assert {(i.address, i.period, i.year) for i in invoices} == {("Tamme tn 113", "september", "2025")}
+    assert progress == [(0, 2), (1, 2), (2, 2)]
+
+
+def test_workbook_without_korter_sheets_and_unsupported_files(tmp_path):
+    path = tmp_path / "muu.xlsx"
+    openpyxl.Workbook().save(path)
+    with open_native_workbook(str(path)) as workbook, pytest.raises(ValidationError):
+        read_kyte_invoices(workbook)
+
+    for name, content in (("kyte.xlsb", b"binary"), ("katki.xlsx", b"not a zip")):
+        (tmp_path / name).write_bytes(content)
+        with pytest.raises(NativeWorkbookError):
+            with open_native_workbook(str(tmp_path / name)):
+                pass
+
+
+def test_damaged_sheet_data_raises_native_workbook_error(tmp_path):
+    path = tmp_path / "kyte.xlsx"
+    _kyte_workbook(path, "01.09.2025 - 30.09.2025")
+    damaged = tmp_path / "katki.xlsx"
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(damaged, "w") as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if item.filename == "xl/worksheets/sheet2.xml":  # "Korter 1"
+                data = data[: len(data) // 2]
+            target.writestr(item, data)
+
+    # Opening works, the sheet XML only fails when the cells are read: the caller must still get the error to fall back on
+    with open_native_workbook(str(damaged)) as workbook, pytest.raises(NativeWorkbookError):
+        read_kyte_invoices(workbook)
+
+
+def test_com_only_worksheet_api_fails_clearly(tmp_path):
+    path = tmp_path / "kyte.xlsx"
+    _kyte_workbook(path, "01.09.2025 - 30.09.2025")
+
+    with open_native_workbook(str(path)) as workbook, pytest.raises(AttributeError, match="UsedRange needs Excel"):
+        workbook.Sheets("Korter 1").UsedRange
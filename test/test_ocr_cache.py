@@ -0,0 +1,86 @@
+import os
+from PIL import Image
+
+import utils.ocr_cache as ocr_cache
+import utils.ocr_engines as ocr_engines
+import utils.ocr_runner as ocr_runner
+from utils.ocr_cache import OcrCache, KIND_DATA
+
+
+def _cache(tmp_path, max_bytes=10_000):
+    cache = OcrCache(tmp_path, max_bytes)
+    cache._tesseract_version = "5.3.0"  # avoid spawning tesseract
+    return cache
+
+
+def test_cache_hit_after_put(tmp_path):
+    cache = _cache(tmp_path)
+    img = Image.new("L", (40, 20), 255)
+    key = cache.make_key(img, "est", "--oem 1 --psm 6")
+
+    assert cache.get(key) is None
+    cache.put(key, "Aadress: Tamme 113-64")
+    assert cache.get(key) == "Aadress: Tamme 113-64"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_key_depends_on_pixels_and_params(tmp_path):
+    cache = _cache(tmp_path)
+    white = Image.new("L", (40, 20), 255)
+    black = Image.new("L", (40, 20), 0)
+
+    assert cache.make_key(white, "est", "--psm 6") != cache.make_key(black, "est", "--psm 6")
+    assert cache.make_key(white, "est", "--psm 6") != cache.make_key(white, "est", "--psm 7")
+    assert cache.make_key(white, "est", "--psm 6") != cache.make_key(white.resize((80, 40)), "est", "--psm 6")
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = _cache(tmp_path, max_bytes=350)
+    keys = [f"{i:02d}" + "0" * 62 for i in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, "x" * 100)
+        os.utime(cache._path(key), (1000 + age, 1000 + age))
+
+    # Touch the oldest entry so the middle one becomes least recently used
+    cache.get(keys[0])
+    cache.put("ff" + "0" * 62, "x" * 100)
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+
+
+def test_overwriting_an_entry_keeps_the_size_count(tmp_path):
+    cache = _cache(tmp_path)
+    key = "ab" + "0" * 62
+    cache.put(key, "x" * 100)
+    cache.put(key, "x" * 100)
+
+    assert cache.current_size() == 100
+
+
+def test_key_depends_on_output_kind_and_engine(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    img = Image.new("L", (40, 20), 255)
+    text_key = cache.make_key(img, "est", "--psm 6")
+
+    assert cache.make_key(img, "est", "--psm 6", kind=KIND_DATA) != text_key
+    monkeypatch.setattr(ocr_engines, "_engine_name", ocr_engines.ENGINE_TESSEROCR)
+    assert cache.make_key(img, "est", "--psm 6") != text_key
+
+
+def test_image_to_data_second_run_does_no_ocr(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    monkeypatch.setattr(ocr_cache, "_cache", cache)
+    runs = []
+
+    def fake_run_tesseract(img, lang, config, timeout_sec, extension="txt"):
+        runs.append(config)
+        return "level\tconf\ttext\n5\t91\tAadress:\n"
+
+    monkeypatch.setattr(ocr_runner, "run_tesseract", fake_run_tesseract)
+    img = Image.new("L", (40, 20), 255)
+    first = ocr_runner.ocr_image_to_data(img, "est", "--psm 6", 5)
+    second = ocr_runner.ocr_image_to_data(img, "est", "--psm 6", 5)
+
+    assert first == second == {"level": [5], "conf": [91], "text": ["Aadress:"]}
+    assert len(runs) == 1
@@ -0,0 +1,116 @@
+import types
+from PIL import Image
+
+import utils.ocr_engines as ocr_engines
+from utils.ocr_engines import parse_ocr_config
+
+
+class FakeApi:
+    instances = 0
+
+    def __init__(self, lang, oem, path=None):
+        FakeApi.instances += 1
+        self.variables = {}
+        self.recognize_ok = True
+
+    def SetPageSegMode(self, psm):
+        self.psm = psm
+
+    def SetVariable(self, key, value):
+        self.variables[key] = value
+
+    def SetImage(self, img):
+        self.img = img
+
+    def Recognize(self, timeout=0):
+        return self.recognize_ok
+
+    def GetUTF8Text(self):
+        return f"psm={self.psm} whitelist={self.variables.get('tessedit_char_whitelist', '')}"
+
+    def Clear(self):
+        pass
+
+
+def _fake_tesserocr(monkeypatch):
+    FakeApi.instances = 0
+    fake = types.SimpleNamespace(PyTessBaseAPI=FakeApi, OEM=int, PSM=int)
+    monkeypatch.setattr(ocr_engines, "tesserocr", fake)
+    monkeypatch.setattr(ocr_engines, "_apis", {})
+
+
+def test_parse_ocr_config():
+    assert parse_ocr_config("--oem 1 --psm 7 -c tessedit_char_whitelist=0123.") == (
+        1, 7, {"tessedit_char_whitelist": "0123."}
+    )
+
+
+def test_tesserocr_engine_is_loaded_once_and_reused(monkeypatch):
+    _fake_tesserocr(monkeypatch)
+    img = Image.new("L", (10, 10), 255)
+
+    first = ocr_engines.get_tesserocr_engine("est", 1, None)
+    second = ocr_engines.get_tesserocr_engine("est", 1, None)
+
+    assert first is second
+    assert FakeApi.instances == 1
+    assert first.ocr(img, 7, {"tessedit_char_whitelist": "0123"}, 5) == "psm=7 whitelist=0123"
+    # Whitelist from the previous call must not stick
+    assert first.ocr(img, 6, {}, 5) == "psm=6 whitelist="
+
+
+def test_tesserocr_engine_failure_raises_timeout(monkeypatch):
+    _fake_tesserocr(monkeypatch)
+    engine = ocr_engines.get_tesserocr_engine("est", 1, None)
+    engine.api.recognize_ok = False
+    try:
+        engine.ocr(Image.new("L", (10, 10), 255), 6, {}, 1)
+    except RuntimeError as e:
+        assert "Timeout" in str(e)
+    else:
+        raise AssertionError("expected RuntimeError")
+
+
+def test_configure_falls_back_without_tesserocr(monkeypatch):
+    monkeypatch.setattr(ocr_engines, "tesserocr", None)
+    assert ocr_engines.configure_ocr_engine("tesserocr") == ocr_engines.ENGINE_PYTESSERACT
+
+
+class FakeWord:
+    """One word of a fake result iterator: (text, conf, box, levels it starts)."""
+
+    def __init__(self, text, conf, box, starts):
+        self.text, self.conf, self.box, self.starts = text, conf, box, starts
+
+    def IsAtBeginningOf(self, level):
+        return level in self.starts
+
+    def BoundingBox(self, level):
+        return self.box
+
+    def Confidence(self, level):
+        return self.conf
+
+    def GetUTF8Text(self, level):
+        return self.text
+
+
+def test_tesserocr_engine_data_matches_image_to_data_shape(monkeypatch):
+    _fake_tesserocr(monkeypatch)
+    ril = types.SimpleNamespace(BLOCK=0, PARA=1, TEXTLINE=2, WORD=3)
+    words = [
+        FakeWord("Aadress:", 95.5, (10, 20, 90, 40), {ril.BLOCK, ril.PARA, ril.TEXTLINE}),
+        FakeWord("Tamme", 62.0, (100, 20, 160, 40), set()),
+        FakeWord("64", 88.0, (10, 50, 30, 70), {ril.TEXTLINE}),
+    ]
+    monkeypatch.setattr(ocr_engines.tesserocr, "RIL", ril, raising=False)
+    monkeypatch.setattr(ocr_engines.tesserocr, "iterate_level", lambda iterator, level: iter(iterator), raising=False)
+    monkeypatch.setattr(FakeApi, "GetIterator", lambda self: words, raising=False)
+
+    data = ocr_engines.get_tesserocr_engine("est", 1, None).data(Image.new("L", (10, 10), 255), 6, {}, 5)
+
+    assert data["text"] == ["Aadress:", "Tamme", "64"]
+    assert data["conf"] == [95.5, 62.0, 88.0]
+    assert data["line_num"] == [1, 1, 2]
+    assert data["word_num"] == [1, 2, 1]
+    assert (data["left"][1], data["top"][1], data["width"][1], data["height"][1]) == (100, 20, 60, 20)
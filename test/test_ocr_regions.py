@@ -0,0 +1,87 @@
+import pytest
+from PIL import Image
+
+import utils.ocr_regions as ocr_regions
+from src.data_classes import ValidationError
+from utils.ocr_regions import learn_header_regions, regions_from_config, ocr_page_with_confidence, CONFIG_REGION_NAME
+
+
+def _word_data(words):
+    """Build an image_to_data style dict from (text, line_num, left, top, width, height) tuples."""
+    data = {key: [] for key in ("text", "page_num", "block_num", "par_num", "line_num", "left", "top", "width", "height")}
+    for text, line_num, left, top, width, height in words:
+        data["text"].append(text)
+        data["page_num"].append(1)
+        data["block_num"].append(1)
+        data["par_num"].append(1)
+        data["line_num"].append(line_num)
+        data["left"].append(left)
+        data["top"].append(top)
+        data["width"].append(width)
+        data["height"].append(height)
+    return data
+
+
+def test_learn_header_regions_returns_one_crop_per_field():
+    data = _word_data([
+        ("Aadress:", 1, 100, 200, 150, 40),
+        ("Tamme", 1, 260, 200, 120, 40),
+        ("113-64", 1, 390, 200, 120, 40),
+        ("Periood:", 2, 100, 400, 150, 40),
+        ("september", 2, 260, 400, 200, 40),
+        ("Kuupäev:", 3, 100, 600, 150, 40),
+        ("30.09.2025", 3, 260, 600, 200, 40),
+    ])
+
+    regions = learn_header_regions(data, width=2480, height=3508)
+
+    assert [region.name for region in regions] == ["aadress", "periood", "kuupäev"]
+    address = regions[0].pixel_box(2480, 3508)
+    assert address[1] <= 200 and address[3] >= 240 + 40  # label line plus continuation line
+    assert all(region.box[2] == 1.0 for region in regions)
+
+
+def test_learn_header_regions_needs_every_label():
+    data = _word_data([("Aadress:", 1, 100, 200, 150, 40)])
+    assert learn_header_regions(data, width=2480, height=3508) is None
+
+
+def test_regions_from_config():
+    assert regions_from_config("") is None
+    regions = regions_from_config("0, 0.05, 1, 0.3")
+    assert regions[0].name == CONFIG_REGION_NAME
+    assert regions[0].box == (0.0, 0.05, 1.0, 0.3)
+
+    with pytest.raises(ValidationError):
+        regions_from_config("0.5,0.5,0.2,0.9")
+
+
+def test_confidence_mode_rereads_only_weak_tokens(monkeypatch):
+    page_data = _word_data([
+        ("Aadress:", 1, 100, 200, 150, 40),
+        ("Tamme", 1, 260, 200, 120, 40),
+        ("113-6A", 1, 390, 200, 120, 40),
+        ("Periood:", 2, 100, 400, 150, 40),
+        ("september", 2, 260, 400, 200, 40),
+    ])
+    page_data["conf"] = [96, 95, 31, 96, 91]
+    crop_data = _word_data([("113-64", 1, 4, 4, 240, 80)])
+    crop_data["conf"] = [93]
+
+    calls = []
+
+    def fake_image_to_data(img, lang, config, timeout_sec):
+        calls.append((img.size, config))
+        return page_data if len(calls) == 1 else crop_data
+
+    monkeypatch.setattr(ocr_regions, "ocr_image_to_data", fake_image_to_data)
+    text, confidence = ocr_page_with_confidence(
+        Image.new("1", (2480, 3508), 1), "est", 1, 6, 70, 1, "arved.pdf", 30
+    )
+
+    assert text == "Aadress: Tamme 113-64\nPeriood: september"
+    # One retry, for the weak apartment token only, on an enlarged single-word crop
+    assert len(calls) == 2
+    assert calls[1][1] == "--oem 1 --psm 8"
+    assert calls[1][0] == (2 * (120 + 2 * 12), 2 * (40 + 2 * 12))
+    assert confidence == 91.0  # period is now the weakest field
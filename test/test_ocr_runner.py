@@ -0,0 +1,53 @@
+import sys, time, threading
+import pytest
+from PIL import Image
+from pytesseract import pytesseract as tesseract_api
+
+import utils.ocr_runner as ocr_runner
+from src.data_classes import Cancelled
+from utils.ocr_runner import OcrDeadline, ocr_image_to_string, configure_ocr_cancel
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="fake tesseract is a shell script")
+
+
+def _fake_tesseract(tmp_path, monkeypatch, script):
+    """Point pytesseract at a shell script; $2 is the output base name."""
+    path = tmp_path / "tesseract"
+    path.write_text("#!/bin/sh\n" + script)
+    path.chmod(0o755)
+    monkeypatch.setattr(tesseract_api, "tesseract_cmd", str(path))
+    configure_ocr_cancel(None)
+
+
+def test_ocr_image_to_string_reads_output(tmp_path, monkeypatch):
+    _fake_tesseract(tmp_path, monkeypatch, 'echo "Aadress: Tamme tn 113-64" > "$2.txt"\n')
+    assert ocr_image_to_string(Image.new("L", (10, 10)), "est", "--psm 6", 5) == "Aadress: Tamme tn 113-64\n"
+
+
+def test_cancel_kills_running_tesseract(tmp_path, monkeypatch):
+    _fake_tesseract(tmp_path, monkeypatch, "exec sleep 30\n")
+    cancel_event = threading.Event()
+    configure_ocr_cancel(cancel_event)
+    threading.Timer(0.3, cancel_event.set).start()
+
+    started = time.monotonic()
+    with pytest.raises(Cancelled):
+        ocr_image_to_string(Image.new("L", (10, 10)), "est", "", 120)
+
+    assert time.monotonic() - started < 2
+    assert not ocr_runner._processes
+    configure_ocr_cancel(None)
+
+
+def test_timeout_kills_tesseract(tmp_path, monkeypatch):
+    _fake_tesseract(tmp_path, monkeypatch, "exec sleep 30\n")
+    with pytest.raises(RuntimeError, match="Timeout"):
+        ocr_image_to_string(Image.new("L", (10, 10)), "est", "", 0.5)
+    assert not ocr_runner._processes
+
+
+def test_deadline_shares_remaining_time_over_pages():
+    assert OcrDeadline(0, 120).page_timeout(10) == 120  # no budget: per-page cap only
+    assert OcrDeadline(100, 120, workers=2).page_timeout(10) in (19, 20)
+    assert OcrDeadline(100, 15).page_timeout(1) == 15  # never above TIMEOUT_SEC
+    assert OcrDeadline(10, 120).page_timeout(1000) == ocr_runner.MIN_PAGE_TIMEOUT_SEC
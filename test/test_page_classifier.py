@@ -0,0 +1,106 @@
+import pytest
+import fitz
+
+from src import pdf_extractor
+from utils import page_classifier
+from src.data_classes import OcrSettings, ValidationError
+from src.pdf_extractor import separate_invoices
+from utils.page_classifier import PageClassifier, PAGE_BLANK, PAGE_DUPLICATE, PAGE_INVOICE
+from utils.pdf_document import SourceDocument
+
+
+INVOICE_TEXT = "Aadress: Tamme tn 113-{apartment}\nTartu 50101\nPeriood: september\nKuupäev: 30.09.2025"
+TERMS_TEXT = "Üldtingimused\nArve tasumisel palume märkida viitenumbri.\nViivis 0,05% päevas."
+
+
+def _write_pdf(path, pages):
+    """pages: invoice apartment numbers, None for a blank page, or a free text string."""
+    doc = fitz.open()
+    for page_content in pages:
+        page = doc.new_page()
+        if page_content is None:
+            continue
+        text = INVOICE_TEXT.format(apartment=page_content) if isinstance(page_content, int) else page_content
+        page.insert_text((72, 72), text, fontname="helv", fontsize=14)
+    doc.save(str(path))
+    doc.close()
+
+
+def test_classifier_finds_blank_and_exact_duplicate_pages(tmp_path):
+    pdf_path = tmp_path / "arved.pdf"
+    _write_pdf(pdf_path, [1, None, 2, 1])
+
+    with SourceDocument(pdf_path) as document:
+        classifier = PageClassifier(document, blank_ink_ratio=0.001, duplicate_distance=10)
+        classes = [classifier.classify(page) for page in range(1, 5)]
+
+    # Page 3 differs from page 1 only in the apartment number and must stay an invoice
+    assert classes == [(PAGE_INVOICE, None), (PAGE_BLANK, None), (PAGE_INVOICE, None), (PAGE_DUPLICATE, 1)]
+
+
+def test_blank_and_duplicate_pages_are_skipped(tmp_path):
+    pdf_path = tmp_path / "arved.pdf"
+    _write_pdf(pdf_path, [1, None, 2, 1])
+
+    invoices = separate_invoices(str(pdf_path), settings=OcrSettings(blank_pages="skip", duplicate_pages="skip"))
+
+    assert [invoice.apartment for invoice in invoices] == ["1", "2"]
+
+
+def test_pages_are_not_hashed_when_duplicates_are_processed(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "arved.pdf"
+    _write_pdf(pdf_path, [1, None, 2, 1])
+
+    def fail_hash(*_):
+        pytest.fail("duplicate pages are processed, nothing needs the page hash")
+
+    monkeypatch.setattr(page_classifier, "content_hash", fail_hash)
+    invoices = separate_invoices(str(pdf_path), settings=OcrSettings(blank_pages="skip"))
+
+    assert [invoice.apartment for invoice in invoices] == ["1", "2", "1"]
+
+
+def test_blank_page_policy_error_names_the_page(tmp_path):
+    pdf_path = tmp_path / "arved.pdf"
+    _write_pdf(pdf_path, [1, None])
+
+    with pytest.raises(ValidationError, match="lehekülg 2"):
+        separate_invoices(str(pdf_path), settings=OcrSettings(blank_pages="error"))
+
+
+def test_non_invoice_pages_skipped_and_repeats_caught_before_ocr(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "arved.pdf"
+    # Terms pages repeat with a different page footer, so they are not exact duplicates
+    _write_pdf(pdf_path, [1, TERMS_TEXT + "\n\nlk 2", 2, TERMS_TEXT + "\n\nlk 4"])
+    ocr_calls = []
+
+    def fake_ocr_pages(_document, page_numbers, _settings, _on_progress, _cancel_flag, _header_regions=None):
+        ocr_calls.extend(page_numbers)
+        return [(TERMS_TEXT, None) for _ in page_numbers]
+
+    monkeypatch.setattr(pdf_extractor, "_ocr_pages", fake_ocr_pages)
+
+    invoices = separate_invoices(str(pdf_path), settings=OcrSettings(non_invoice_pages="skip", duplicate_pages="skip"))
+
+    assert [invoice.apartment for invoice in invoices] == ["1", "2"]
+    assert ocr_calls == [2]  # page 4 is a near repeat of page 2
+
+
+def test_pages_drawn_through_form_xobjects_are_not_duplicates(tmp_path):
+    source = fitz.open()
+    for apartment in (1, 2, 3):
+        source.new_page().insert_text((72, 72), INVOICE_TEXT.format(apartment=apartment), fontname="helv", fontsize=14)
+    merged = fitz.open()
+    for source_page in (0, 1, 2, 0):
+        page = merged.new_page()
+        page.show_pdf_page(page.rect, source, source_page)  # every page's content is "/fzFrm0 Do"
+    pdf_path = tmp_path / "merged.pdf"
+    merged.save(str(pdf_path))
+
+    with SourceDocument(pdf_path) as document:
+        classifier = PageClassifier(document, blank_ink_ratio=0.001, duplicate_distance=10)
+        classes = [classifier.classify(page) for page in range(1, 5)]
+
+    assert classes == [(PAGE_INVOICE, None), (PAGE_INVOICE, None), (PAGE_INVOICE, None), (PAGE_DUPLICATE, 1)]
+    invoices = separate_invoices(str(pdf_path), settings=OcrSettings(duplicate_pages="skip"))
+    assert [invoice.apartment for invoice in invoices] == ["1", "2", "3"]
@@ -0,0 +1,378 @@
+import configparser
+
+import pytest
+import fitz
+
+from src.data_classes import OcrSettings, OutputSettings, ValidationError
+from src import pdf_extractor
+from utils.ocr_regions import Region
+from utils import invoice_boundaries
+from utils.invoice_boundaries import InvoiceBoundaryDetector
+from utils.file_utils import load_ocr_settings
+from utils.pdf_document import SourceDocument
+from src.pdf_extractor import (
+    extract_address_period_apartment,
+    separate_invoices,
+    iter_invoices,
+    save_each_invoice_as_file,
+    stream_invoices_to_dir,
+    SOURCE_TEXT_LAYER,
+)
+
+
+INVOICE_TEXT = (
+    "Arve nr 1024\n"
+    "Aadress: Tamme tn 113-{apartment}\n"
+    "Tartu 50101\n"
+    "Periood: september\n"
+    "Kuupäev: 30.09.2025\n"
+)
+
+
+def _write_text_pdf(path, apartments):
+    doc = fitz.open()
+    for apartment in apartments:
+        page = doc.new_page()
+        page.insert_text((72, 72), INVOICE_TEXT.format(apartment=apartment), fontname="helv")
+    doc.save(str(path))
+    doc.close()
+
+
+def test_extract_address_period_apartment():
+    data = extract_address_period_apartment(INVOICE_TEXT.format(apartment=64))
+    assert data == {"address": "Tamme tn 113", "apartment": "64", "period": "september", "year": "2025"}
+
+
+def test_separate_invoices_uses_text_layer_without_ocr(tmp_path):
+    pdf_path = tmp_path / "arved.pdf"
+    _write_text_pdf(pdf_path, [1, 2, 64])
+
+    def fail_progress(*_):
+        pytest.fail("OCR should not run for pages with a text layer")
+
+    invoices = separate_invoices(str(pdf_path), on_progress=fail_progress, settings=OcrSettings())
+
+    assert [invoice.apartment for invoice in invoices] == ["1", "2", "64"]
+    assert all(invoice.source == SOURCE_TEXT_LAYER for invoice in invoices)
+
+
+def test_dpi_ladder_escalates_only_failed_pages(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "scan.pdf"
+    doc = fitz.open()
+    for _ in range(3):
+        doc.new_page()  # image-only pages: no text layer
+    doc.save(str(pdf_path))
+    doc.close()
+
+    calls = []
+
+    def fake_ocr_pages(_document, page_numbers, settings, _on_progress, _cancel_flag, _header_regions=None):
+        calls.append((settings.dpi, list(page_numbers)))
+        # Page 2 only reads correctly at the highest resolution
+        return [
+            (INVOICE_TEXT.format(apartment=page) if page != 2 or settings.dpi == 300 else "Aadress: Tamme tn", None)
+            for page in page_numbers
+        ]
+
+    monkeypatch.setattr(pdf_extractor, "_ocr_pages", fake_ocr_pages)
+    # The empty pages stand in for scans, keep them out of the blank/duplicate checks
+    settings = OcrSettings(
+        dpi_ladder=(150, 200, 300), cache_enabled=False, blank_pages="process", duplicate_pages="process"
+    )
+
+    invoices = separate_invoices(str(pdf_path), settings=settings)
+
+    assert calls == [(150, [1, 2, 3]), (200, [2]), (300, [2])]
+    assert [(invoice.apartment, invoice.ocr_dpi) for invoice in invoices] == [("1", 150), ("2", 300), ("3", 150)]
+
+
+def test_iter_invoices_yields_before_last_page_is_read(tmp_path):
+    pdf_path = tmp_path / "arved.pdf"
+    _write_text_pdf(pdf_path, [1, 2, 3])
+
+    stream = iter_invoices(str(pdf_path), settings=OcrSettings())
+    first = next(stream)
+
+    assert first.apartment == "1"
+    assert [invoice.apartment for invoice in stream] == ["2", "3"]
+
+
+def test_save_each_invoice_as_file_copies_pages_from_source(tmp_path):
+    pdf_path = tmp_path / "arved.pdf"
+    _write_text_pdf(pdf_path, [1, 2])
+    dest = tmp_path / "out"
+    dest.mkdir()
+
+    save_each_invoice_as_file(separate_invoices(str(pdf_path), settings=OcrSettings()), dest)
+
+    for apartment in ("1", "2"):
+        with fitz.open(str(dest / f"{apartment}.pdf")) as doc:
+            assert doc.page_count == 1
+            assert f"113-{apartment}" in doc[0].get_text()
+
+
+@pytest.mark.parametrize("output_settings", [
+    OutputSettings(),
+    OutputSettings(writers=2, optimize=True, subset_fonts=True),
+])
+def test_stream_invoices_to_dir_writes_each_apartment(tmp_path, output_settings):
+    pdf_path = tmp_path / "arved.pdf"
+    _write_text_pdf(pdf_path, [1, 2, 3])
+
+    invoices, invoice_dir = stream_invoices_to_dir(
+        str(pdf_path), tmp_path, settings=OcrSettings(), output_settings=output_settings
+    )
+
+    assert [invoice.output_path.name for invoice in invoices] == ["1.pdf", "2.pdf", "3.pdf"]
+    for invoice in invoices:
+        assert invoice.output_path.parent == invoice_dir
+        with fitz.open(str(invoice.output_path)) as doc:
+            assert doc.page_count == 1
+            assert f"113-{invoice.apartment}" in doc[0].get_text()
+
+
+CONTINUATION_TEXT = "Tarbimise lisa\n" + "\n".join(f"Arvesti {n}   {n * 7}.{n}0 kWh   {n * 3},15 EUR" for n in range(1, 30))
+
+
+def _write_multi_page_pdf(path, pages):
+    """pages: apartment numbers for invoice first pages, None for a continuation page."""
+    doc = fitz.open()
+    for number, apartment in enumerate(pages, start=1):
+        page = doc.new_page()
+        # Page footer keeps continuation pages from being exact duplicates of each other
+        text = f"{CONTINUATION_TEXT}\nlk {number}" if apartment is None else INVOICE_TEXT.format(apartment=apartment)
+        page.insert_text((72, 72), text, fontname="helv")
+    doc.save(str(path))
+    doc.close()
+
+
+def test_multi_page_invoices_are_written_whole(tmp_path):
+    pdf_path = tmp_path / "arved.pdf"
+    _write_multi_page_pdf(pdf_path, [1, None, 2, None, None])
+    settings = OcrSettings(multi_page_invoices=True)
+
+    invoices, _invoice_dir = stream_invoices_to_dir(
+        str(pdf_path), tmp_path, settings=settings, output_settings=OutputSettings()
+    )
+
+    assert [invoice.apartment for invoice in invoices] == ["1", "2"]
+    page_counts = []
+    for invoice in invoices:
+        with fitz.open(str(invoice.output_path)) as doc:
+            page_counts.append(doc.page_count)
+            assert f"113-{invoice.apartment}" in doc[0].get_text()
+            assert all("Tarbimise lisa" in page.get_text() for page in doc.pages(1))
+    assert page_counts == [2, 3]
+
+
+def test_boundary_detector_probes_header_only_for_unknown_layouts(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "scan.pdf"
+    _write_multi_page_pdf(pdf_path, [1, None, 2])
+    probed = []
+
+    def fake_ocr(_img, _lang, _config, page_index, _pdf_path, _timeout_sec):
+        probed.append(page_index)
+        return "Aadress: Tamme tn 113-1" if page_index == 1 else "Tarbimise lisa"
+
+    monkeypatch.setattr(invoice_boundaries, "run_ocr_on_image", fake_ocr)
+    with SourceDocument(pdf_path) as document:
+        detector = InvoiceBoundaryDetector(document, OcrSettings(), pdf_extractor.TEXT_LAYER_MIN_CHARS)
+        starts = [detector.is_invoice_start(page) for page in (1, 2, 3)]
+
+    assert starts == [True, False, True]
+    assert probed == [1, 2]  # page 3 matches page 1's header layout
+
+
+def _bookmarked_pdf(path, apartments, titles):
+    _write_text_pdf(path, apartments)
+    doc = fitz.open(str(path))
+    doc.set_toc([[1, "Arved", 1]] + [[2, title, page] for page, title in enumerate(titles, start=1)])
+    doc.saveIncr()
+    doc.close()
+
+
+def test_outline_split_checks_every_bookmarked_page(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "arved.pdf"
+    _bookmarked_pdf(pdf_path, [1, 2, 3, 64], ["Korter 1", "Korter 2", "Korter 3", "Korter 64"])
+
+    def fail_ocr(*_):
+        pytest.fail("pages with a text layer are checked without OCR")
+
+    monkeypatch.setattr(pdf_extractor, "_ocr_pages", fail_ocr)
+    invoices = separate_invoices(str(pdf_path), settings=OcrSettings())
+
+    assert [(invoice.apartment, invoice.pdf_page.page_numbers) for invoice in invoices] == [
+        ("1", [1]), ("2", [2]), ("3", [3]), ("64", [4])
+    ]
+    assert {invoice.source for invoice in invoices} == {pdf_extractor.SPLIT_OUTLINE}
+    assert all(invoice.address == "Tamme tn 113" and invoice.year == "2025" for invoice in invoices)
+
+
+def test_outline_with_one_wrong_bookmark_in_the_middle_is_not_used(tmp_path):
+    pdf_path = tmp_path / "arved.pdf"
+    _bookmarked_pdf(pdf_path, [1, 2, 3, 4, 5], ["Korter 1", "Korter 2", "Korter 9", "Korter 4", "Korter 5"])
+
+    invoices = separate_invoices(str(pdf_path), settings=OcrSettings())
+
+    # Page 3's invoice must go to apartment 3, not to the owner named by its bookmark
+    assert [(invoice.apartment, invoice.pdf_page.page_numbers) for invoice in invoices] == [
+        ("1", [1]), ("2", [2]), ("3", [3]), ("4", [4]), ("5", [5])
+    ]
+    assert {invoice.source for invoice in invoices} == {SOURCE_TEXT_LAYER}
+
+
+def test_page_labels_split_and_outline_mismatch_fallback(tmp_path):
+    pdf_path = tmp_path / "arved.pdf"
+    _write_text_pdf(pdf_path, [7, 7, 8])
+    doc = fitz.open(str(pdf_path))
+    doc.set_page_labels([
+        {"startpage": 0, "prefix": "Korter 7-", "style": "D", "firstpagenum": 1},
+        {"startpage": 2, "prefix": "Korter 8-", "style": "D", "firstpagenum": 1},
+    ])
+    doc.set_toc([[1, "Korter 5", 1]])  # wrong apartment for page 1: the outline is not trusted
+    doc.saveIncr()
+    doc.close()
+
+    invoices = separate_invoices(str(pdf_path), settings=OcrSettings())
+
+    assert [(invoice.apartment, invoice.pdf_page.page_numbers) for invoice in invoices] == [("7", [1, 2]), ("8", [3])]
+    assert {invoice.source for invoice in invoices} == {pdf_extractor.SPLIT_PAGE_LABELS}
+
+
+def test_outline_with_unbookmarked_pages_needs_multi_page_invoices(tmp_path):
+    def write(path, page_texts):
+        doc = fitz.open()
+        for text in page_texts:
+            doc.new_page().insert_text((72, 72), text, fontname="helv")
+        doc.set_toc([[1, "Korter 1", 1], [1, "Korter 3", 3]])  # no bookmark for page 2
+        doc.save(str(path))
+        doc.close()
+
+    write(tmp_path / "arved.pdf", [INVOICE_TEXT.format(apartment=apartment) for apartment in (1, 2, 3)])
+    invoices = separate_invoices(str(tmp_path / "arved.pdf"), settings=OcrSettings())
+
+    # Apartment 2's invoice must not go into 1.pdf: the outline is not used, pages are read one by one
+    assert [(invoice.apartment, invoice.pdf_page.page_numbers) for invoice in invoices] == [
+        ("1", [1]), ("2", [2]), ("3", [3])
+    ]
+    assert {invoice.source for invoice in invoices} == {SOURCE_TEXT_LAYER}
+
+    # Multi-page invoices: the outline is used once every bookmarked first page names its apartment
+    write(tmp_path / "mitmeleheline.pdf", [INVOICE_TEXT.format(apartment=1), "Lisa: kuluaruanne", INVOICE_TEXT.format(apartment=3)])
+    invoices = separate_invoices(str(tmp_path / "mitmeleheline.pdf"), settings=OcrSettings(multi_page_invoices=True))
+
+    assert [(invoice.apartment, invoice.pdf_page.page_numbers) for invoice in invoices] == [("1", [1, 2]), ("3", [3])]
+    assert {invoice.source for invoice in invoices} == {pdf_extractor.SPLIT_OUTLINE}
+
+
+@pytest.mark.parametrize("title, apartment", [
+    ("Korter 64", "64"), ("krt. 12", "12"), ("Korter nr 3", "3"), ("Tamme tn 113-64", "64"), ("Lk 3", None), ("2", None),
+])
+def test_apartment_from_title(title, apartment):
+    assert pdf_extractor.apartment_from_title(title) == apartment
+
+
+def test_roi_regions_are_learned_once_per_job(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "scan.pdf"
+    doc = fitz.open()
+    for _ in range(6):
+        doc.new_page()  # image-only pages, more than one streaming window
+    doc.save(str(pdf_path))
+    doc.close()
+
+    learned, roi_pages = [], []
+
+    def fake_learn(_img, page_idx, _pdf_path, _settings, _full_config):
+        learned.append(page_idx)
+        return INVOICE_TEXT.format(apartment=page_idx), [Region("header", (0.0, 0.0, 1.0, 0.2), "--psm 6")]
+
+    def fake_roi(_img, regions, _parse_fn, _lang, _oem, _psm, page_idx, *_):
+        roi_pages.append(page_idx)
+        return INVOICE_TEXT.format(apartment=page_idx)
+
+    monkeypatch.setattr(pdf_extractor, "_ocr_page_and_learn_regions", fake_learn)
+    monkeypatch.setattr(pdf_extractor, "ocr_page_roi", fake_roi)
+    settings = OcrSettings(
+        ocr_mode="roi", dpi_ladder=(150, 300), cache_enabled=False, blank_pages="process", duplicate_pages="process"
+    )
+
+    invoices = separate_invoices(str(pdf_path), settings=settings)
+
+    assert [invoice.apartment for invoice in invoices] == ["1", "2", "3", "4", "5", "6"]
+    assert learned == [1]
+    assert roi_pages == [2, 3, 4, 5, 6]
+
+
+def test_dpi_ladder_escalates_apartment_out_of_sequence(tmp_path, monkeypatch):
+    pdf_path = tmp_path / "scan.pdf"
+    doc = fitz.open()
+    for _ in range(5):
+        doc.new_page()
+    doc.save(str(pdf_path))
+    doc.close()
+
+    calls = []
+
+    def fake_ocr_pages(_document, page_numbers, settings, _on_progress, _cancel_flag, _header_regions=None):
+        calls.append((settings.dpi, list(page_numbers)))
+        # At 150 dpi page 3's apartment "3" is misread as "8": parses fine, but breaks the sequence
+        return [
+            (INVOICE_TEXT.format(apartment=8 if page == 3 and settings.dpi == 150 else page), None)
+            for page in page_numbers
+        ]
+
+    monkeypatch.setattr(pdf_extractor, "_ocr_pages", fake_ocr_pages)
+    settings = OcrSettings(
+        dpi_ladder=(150, 300), cache_enabled=False, blank_pages="process", duplicate_pages="process"
+    )
+
+    invoices = separate_invoices(str(pdf_path), settings=settings)
+
+    # Pages 2 and 4 go up with page 3: each has "8" as a neighbour
+    assert calls == [(150, [1, 2, 3, 4]), (300, [2, 3, 4]), (150, [5])]
+    assert [(invoice.apartment, invoice.ocr_dpi) for invoice in invoices] == [
+        ("1", 150), ("2", 300), ("3", 300), ("4", 300), ("5", 150)
+    ]
+
+
+@pytest.mark.parametrize("sequence_check, expected_calls", [
+    (True, [(150, [1, 2, 3]), (300, [1, 2, 3])]),
+    (False, [(150, [1, 2, 3])]),
+])
+def test_dpi_ladder_sequence_check_on_unsorted_pdf(tmp_path, monkeypatch, sequence_check, expected_calls):
+    pdf_path = tmp_path / "scan.pdf"
+    doc = fitz.open()
+    for _ in range(3):
+        doc.new_page()
+    doc.save(str(pdf_path))
+    doc.close()
+    apartments = {1: 12, 2: 3, 3: 40}  # not sorted by apartment
+    calls, logged = [], []
+
+    def fake_ocr_pages(_document, page_numbers, settings, _on_progress, _cancel_flag, _header_regions=None):
+        calls.append((settings.dpi, list(page_numbers)))
+        return [(INVOICE_TEXT.format(apartment=apartments[page]), None) for page in page_numbers]
+
+    monkeypatch.setattr(pdf_extractor, "_ocr_pages", fake_ocr_pages)
+    monkeypatch.setattr(pdf_extractor, "log_line", logged.append)
+    settings = OcrSettings(dpi_ladder=(150, 300), dpi_ladder_sequence=sequence_check, cache_enabled=False)
+
+    invoices = separate_invoices(str(pdf_path), settings=settings)
+
+    assert [invoice.apartment for invoice in invoices] == ["12", "3", "40"]
+    assert calls == expected_calls
+    assert any("not sorted by apartment" in line for line in logged) == sequence_check
+
+
+def test_unknown_ocr_mode_is_rejected(tmp_path):
+    config = configparser.ConfigParser()
+    config.read_string("[ocr]\nMODE = confidance\n")
+    with pytest.raises(ValidationError, match="confidance"):
+        load_ocr_settings(config)
+    config.read_string("[ocr]\nMODE = ROI \n")
+    assert load_ocr_settings(config).ocr_mode == "roi"
+
+    pdf_path = tmp_path / "arved.pdf"
+    _write_text_pdf(pdf_path, [1])
+    with pytest.raises(ValidationError, match="MODE"):
+        separate_invoices(str(pdf_path), settings=OcrSettings(ocr_mode="fulll"))
@@ -0,0 +1,63 @@
+import fitz
+import pytest
+
+from src.data_classes import OutputSettings
+from utils.pdf_page_map import build_page_map, split_pdf_by_page_map
+
+
+def _combined_pdf(path, page_counts):
+    doc = fitz.open()
+    for name, count in page_counts:
+        for page in range(1, count + 1):
+            doc.new_page().insert_text((72, 72), f"{name} leht {page}", fontname="helv")
+    doc.save(str(path))
+    doc.close()
+
+
+def test_page_map_follows_print_order():
+    assert build_page_map([("Korter 1", 1), ("Korter 2", 3), ("Korter 10", 1)]) == [
+        ("Korter 1", [1]), ("Korter 2", [2, 3, 4]), ("Korter 10", [5]),
+    ]
+    with pytest.raises(ValueError):
+        build_page_map([("Korter 1", 1), ("Korter 2", 0)])
+
+
+@pytest.mark.parametrize("writers", [1, 2])
+def test_split_writes_each_sheets_pages(tmp_path, writers):
+    page_counts = [("Korter 1", 1), ("Korter 2", 2), ("Korter 3", 1)]
+    combined = tmp_path / "koik.pdf"
+    _combined_pdf(combined, page_counts)
+    out_paths = {name: tmp_path / f"{name.split()[-1]}.pdf" for name, _count in page_counts}
+    written = []
+
+    sizes = split_pdf_by_page_map(
+        combined, build_page_map(page_counts), out_paths, OutputSettings(writers=writers), on_written=written.append
+    )
+
+    assert sorted(written) == sorted(out_paths.values()) == sorted(sizes)
+    with fitz.open(str(out_paths["Korter 2"])) as doc:
+        assert [page.get_text().strip() for page in doc] == ["Korter 2 leht 1", "Korter 2 leht 2"]
+
+
+def test_split_refuses_a_pdf_that_does_not_match_the_page_map(tmp_path):
+    combined = tmp_path / "koik.pdf"
+    _combined_pdf(combined, [("Korter 1", 2), ("Korter 2", 1)])  # Excel printed more than it reported
+    out_paths = {"Korter 1": tmp_path / "1.pdf", "Korter 2": tmp_path / "2.pdf"}
+
+    with pytest.raises(ValueError):
+        split_pdf_by_page_map(combined, build_page_map([("Korter 1", 1), ("Korter 2", 1)]), out_paths)
+    assert not any(path.exists() for path in out_paths.values())
+
+
+def test_split_refuses_pages_shifted_between_sheets(tmp_path):
+    combined = tmp_path / "koik.pdf"
+    _combined_pdf(combined, [("Korter 1", 2), ("Korter 2", 1)])
+    out_paths = {"Korter 1": tmp_path / "1.pdf", "Korter 2": tmp_path / "2.pdf"}
+    # The total matches, but Korter 2's first page in the map is Korter 1's second page
+    page_map = build_page_map([("Korter 1", 1), ("Korter 2", 2)])
+
+    with pytest.raises(ValueError, match="Korter 2"):
+        split_pdf_by_page_map(
+            combined, page_map, out_paths, first_page_texts={"Korter 1": "Korter 1 leht 1", "Korter 2": "Korter  2 LEHT 1"}
+        )
+    assert not any(path.exists() for path in out_paths.values())
@@ -0,0 +1,60 @@
+import configparser
+
+from src.data_classes import SheetNormalisation
+from test.fake_worksheet import FakeWorksheet
+from utils.file_utils import load_invoice_types
+from utils.sheet_normalisation import normalise_sheet, plan_sheet_normalisation
+from utils.sheet_snapshot import SheetSnapshot
+
+FORBIDDEN = ["Radiaator 13", "Radiaator 14"]
+
+
+def _sheet():
+    return FakeWorksheet.from_rows([
+        ["Aadress", "Tamme tn 113"],
+        ["Küte", 10.0, None, 2.5],
+        ["Radiaator 13", 1.0],  # not at the end: stays
+        ["Kokku", 13.5],
+        ["", None],  # blank but formatted, inside the used range
+        ["radiaator 13 ", None, "x"],
+        ["Radiaator 14", 2.0],
+    ])
+
+
+def test_plan_drops_trailing_forbidden_rows_and_fits_print_area():
+    plan = plan_sheet_normalisation(SheetSnapshot.read_used_range(_sheet()), FORBIDDEN)
+    assert plan == SheetNormalisation(delete_rows=(6, 7), print_area="$A$1:$D$4")
+
+    assert plan_sheet_normalisation(SheetSnapshot.read_used_range(_sheet()), []) == SheetNormalisation(None, "$A$1:$D$7")
+    only_forbidden = FakeWorksheet.from_rows([["Radiaator 14"]])
+    assert plan_sheet_normalisation(SheetSnapshot.read_used_range(only_forbidden), FORBIDDEN) == SheetNormalisation((1, 1), "$A$1:$A$1")
+
+
+def test_normalise_sheet_uses_one_read_one_delete_one_assignment():
+    sheet = _sheet()
+
+    normalise_sheet(sheet, FORBIDDEN)
+
+    assert sheet.calls["Range.Value"] == 1 and sheet.calls["Cells"] == 0
+    assert sheet.calls["Rows.Delete"] == 1 and sheet.deleted_rows == [6, 7]
+    assert sheet.PageSetup.PrintArea == "$A$1:$D$4"
+    assert max(row for row, _col in sheet.cells) == 5  # the blank row stays, outside the print area
+
+    normalise_sheet(sheet, FORBIDDEN)  # a workbook kept open for a re-run
+    assert sheet.calls["Rows.Delete"] == 1 and sheet.PageSetup.PrintArea == "$A$1:$D$4"
+
+
+def test_forbidden_labels_are_configured_per_invoice_type():
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    config.read_string(
+        "[ui]\nTYPE_HINT=x\n"
+        "[invoice_type_kommunaal]\nKEY=kommunaal\nLABEL=K\nSUBJECT=s\nBODY=b\n"
+        "[invoice_type_kyte]\nKEY=kyte\nLABEL=K\nSUBJECT=s\nBODY=b\n"
+    )
+    types, _hint = load_invoice_types(config)
+    assert types["kyte"].forbidden_labels == ("Radiaator 13", "Radiaator 14")  # older config.cfg
+    assert types["kommunaal"].forbidden_labels == ()
+
+    config["invoice_type_kyte"]["FORBIDDEN_LABELS"] = "Radiaator 15 ;; Tühi rida"
+    assert load_invoice_types(config)[0]["kyte"].forbidden_labels == ("Radiaator 15", "Tühi rida")
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from src.kyte_invoice_reader import read_invoice_meta_col_a, read_kyte_invoices
+from test.fake_worksheet import FakeWorksheet, FakeWorkbook
+from utils.sheet_snapshot import SheetSnapshot, normalize_label, parse_range_address
+
+
+def test_snapshot_answers_lookups_from_one_range_read():
+    sheet = FakeWorksheet.from_rows([
+        ["KÜTTEARVE"],
+        ["Aadress", "Tamme tn 113, Tartu"],
+        [" periood ", datetime(2025, 9, 30)],
+        ["Küte", 42.0],
+    ])
+
+    meta = read_invoice_meta_col_a(sheet)
+
+    assert meta == {"period": "september", "address": "Tamme tn 113", "year": "2025"}
+    assert sheet.calls["Range.Value"] == 1 and sheet.calls["Cells"] == 0
+
+    snapshot = SheetSnapshot.read(sheet, 50, 2)
+    assert snapshot.text(4, 2) == "42" and snapshot.value(60, 1) is None
+    assert snapshot.right_of("Puudub") == ""
+    assert parse_range_address("$A$1:AB12") == (1, 1, 12, 28)
+
+
+def test_kyte_invoices_from_fake_workbook():
+    first = FakeWorksheet.from_rows([["Aadress", "Pärnu mnt 5"], ["Periood", "01.03.2025 - 31.03.2025"]], "Korter 3")
+    workbook = FakeWorkbook([FakeWorksheet(name="Kokku"), first, FakeWorksheet(name="Korter 4")])
+
+    invoices = read_kyte_invoices(workbook)
+
+    assert [(i.apartment, i.address, i.period, i.year) for i in invoices] == [
+        ("3", "Pärnu mnt 5", "märts", "2025"), ("4", "Pärnu mnt 5", "märts", "2025"),
+    ]
+
+
+
+def test_labels_match_with_a_trailing_colon():
+    assert normalize_label(" Periood: ") == normalize_label("periood") == "periood"
+    assert normalize_label("Radiaator\xa0 13:") == "radiaator 13"
+    sheet = FakeWorksheet.from_rows([["Aadress:", "Tamme tn 113, Tartu"], ["Periood:", "01.09.2025 - 30.09.2025"]])
+
+    assert read_invoice_meta_col_a(sheet) == {"period": "september", "address": "Tamme tn 113", "year": "2025"}
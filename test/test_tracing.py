@@ -0,0 +1,47 @@
+import json
+
+import fitz
+
+from utils import tracing
+from utils.ocr_helper import render_page_to_image
+from utils.tracing import configure_tracing, span, drain_spans, add_spans, export_trace
+
+
+def test_disabled_tracing_records_nothing():
+    configure_tracing(False)
+    with span("render", page=1):
+        pass
+    assert span("ocr") is span("parse")  # the shared no-op
+    assert drain_spans() == []
+    assert export_trace("unused") is None
+
+
+def test_spans_export_as_jsonl_chrome_trace_and_summary(tmp_path):
+    tracer = configure_tracing(True)
+    try:
+        with fitz.open() as doc:
+            page = doc.new_page(width=100, height=100)
+            for _ in range(3):
+                render_page_to_image(page, fitz.Matrix(1, 1))
+        with span("ocr", page=7):
+            pass
+        add_spans([("ocr", tracer.spans[0][1], 40_000_000, 1234, 1, {"page": 8})])  # from a worker process
+
+        jsonl_path, chrome_path = export_trace(tmp_path)
+    finally:
+        configure_tracing(False)
+
+    records = [json.loads(line) for line in jsonl_path.read_text(encoding="utf-8").splitlines()]
+    assert [record["name"] for record in records] == ["render"] * 3 + ["ocr", "ocr"]
+    assert records[3]["args"] == {"page": 7}
+
+    events = json.loads(chrome_path.read_text(encoding="utf-8"))["traceEvents"]
+    assert {event["ph"] for event in events} == {"X"}
+    assert min(event["ts"] for event in events) == 0
+    assert events[-1]["pid"] == 1234 and events[-1]["dur"] == 40_000
+
+    rows = {row[0]: row for row in tracer.summary_rows()}
+    assert rows["render"][1] == 3 and rows["ocr"][1] == 2
+    assert rows["ocr"][4] == 40.0  # p95 ms is the slow worker page
+    assert "p95 ms" in tracer.format_summary()
+    assert tracing._tracer is None
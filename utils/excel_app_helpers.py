@@ -1,72 +1,52 @@
-import os, re, time
 import pythoncom
 import win32com.client as win32
 import ctypes
 from ctypes import wintypes
 import subprocess
 import gc
-import threading
 
-from src.data_classes import Cancelled
 
+class ComExcelBackend:
+    """The COM calls of utils.excel_session.ExcelSession; all of them run on the session thread."""
 
-def excel_open_workbook(path: str, fn, cancel_event=None, shutdown_timeout=5.0):
-    """
-    Open Excel + workbook, run function fn(workbook), close workbook and Excel.
-    """
-    absolute_path = os.path.abspath(path)
+    def initialize(self):
+        pythoncom.CoInitialize()
 
-    pythoncom.CoInitialize()
-    excel_app_instance = workbook = None
-    excel_pid = None
-    watchdog = None
-    try:
-        excel_app_instance = excel_app()
-        excel_pid = get_excel_pid(excel_app_instance)
+    def uninitialize(self):
+        gc.collect()
+        pythoncom.CoUninitialize()
 
+    def start(self):
+        excel = excel_app()
         try:
-            excel_app_instance.DisplayAlerts = False
-            excel_app_instance.AskToUpdateLinks = False
-            excel_app_instance.AutomationSecurity = 3 # disable macros
+            excel.AutomationSecurity = 3 # disable macros
         except Exception:
             pass
+        return excel
+
+    def pid(self, excel) -> int | None:
+        return get_excel_pid(excel)
 
-        workbook = excel_app_instance.Workbooks.Open(
-            absolute_path,
+    def open_workbook(self, excel, path: str):
+        return excel.Workbooks.Open(
+            path,
             ReadOnly=True,
             UpdateLinks=0,
             IgnoreReadOnlyRecommended=True,
             AddToMru=False,
         )
-        if cancel_event is not None and cancel_event.is_set():
-            raise Cancelled()
-
-        return fn(excel_app_instance, workbook)
-    finally:
-        cancelled = (cancel_event is not None and cancel_event.is_set())
-        
-        if cancelled and excel_pid:
-            kill_process(excel_pid)
-        
-        if excel_pid:
-            watchdog = threading.Timer(shutdown_timeout, lambda: kill_process(excel_pid))
-            watchdog.daemon = True
-            watchdog.start()
 
-        try:
-            close_workbook(workbook)
-            quit_excel(excel_app_instance)
-        finally:
-            if watchdog is not None:
-                try:
-                    watchdog.cancel()
-                except Exception:
-                    pass
-
-            workbook = None
-            excel_app_instance = None
-            gc.collect()
-            pythoncom.CoUninitialize()
+    def close_workbook(self, workbook):
+        close_workbook(workbook)
+
+    def quit(self, excel):
+        quit_excel(excel)
+
+    def kill(self, pid: int):
+        kill_process(pid)
+
+    def collect(self):
+        gc.collect()
 
 
 def excel_app():
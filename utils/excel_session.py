@@ -0,0 +1,204 @@
+"""
+One Excel instance and open workbook kept warm for a whole kyte job (reading the sheets when the
+native reader cannot, then exporting them), and for a re-run of the same workbook after it.
+
+COM objects belong to the thread that created them, so the session owns a thread that creates
+Excel, opens the workbook and runs every callable given to run(). On cancel Excel is killed,
+after an error it is shut down, and a shutdown that hangs is killed after shutdown_timeout. Excel is also shut down after idle_timeout
+without work. The COM calls go through a backend (ComExcelBackend in excel_app_helpers) so the
+lifecycle can be tested with a fake one.
+"""
+import os, queue, logging, threading
+import concurrent.futures
+
+from src.data_classes import Cancelled
+from utils.tracing import span
+
+# How often a caller waiting on the session thread checks its cancel event
+POLL_INTERVAL_SEC = 0.2
+
+# Excel left open by a finished job is shut down after this long without a new one
+IDLE_TIMEOUT_SEC = 300.0
+
+# Process-wide session, see get_excel_session
+_session = None
+_session_lock = threading.Lock()
+
+
+def workbook_key(path: str) -> tuple:
+    """An open workbook is reused only while its file is unchanged."""
+    absolute_path = os.path.abspath(path)
+    stat = os.stat(absolute_path)
+    return absolute_path, stat.st_mtime_ns, stat.st_size
+
+
+class ExcelSession:
+    def __init__(self, backend, shutdown_timeout: float = 5.0, idle_timeout: float = IDLE_TIMEOUT_SEC):
+        self.backend = backend
+        self.shutdown_timeout = shutdown_timeout
+        self.idle_timeout = idle_timeout
+        self._tasks = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        # Owned by the session thread; _pid is also read by callers to kill Excel on cancel
+        self._app = None
+        self._pid = None
+        self._workbook = None
+        self._workbook_key = None
+
+    @property
+    def running(self) -> bool:
+        return self._app is not None
+
+    def run(self, path: str, fn, cancel_event=None):
+        """
+        Run fn(excel, workbook) on the session thread with path open and return its result.
+        Raises Cancelled (with Excel killed) if cancel_event is set before fn finishes.
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="excel-session", daemon=True)
+                self._thread.start()
+            self._tasks.put((future, path, fn, cancel_event))
+
+        while True:
+            try:
+                return future.result(timeout=POLL_INTERVAL_SEC)
+            except concurrent.futures.TimeoutError:
+                pass
+            if cancel_event is not None and cancel_event.is_set():
+                if future.cancel():
+                    raise Cancelled()  # still queued, never started
+                # Excel may be stuck in a COM call: kill it from here, the session thread's call then fails
+                self._kill()
+                try:
+                    future.result(timeout=self.shutdown_timeout)
+                except Exception:
+                    pass
+                raise Cancelled()
+
+    def close(self):
+        """Shut Excel down and stop the session thread (e.g. when the app exits)."""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._tasks.put(None)
+        thread.join(self.shutdown_timeout + 1)
+
+    # --- Session thread ---
+
+    def _loop(self):
+        self.backend.initialize()
+        try:
+            while True:
+                try:
+                    task = self._tasks.get(timeout=self.idle_timeout if self.running else None)
+                except queue.Empty:
+                    with self._lock:
+                        if not self._tasks.empty():
+                            continue
+                        logging.info("Closing idle Excel session")
+                        self._shutdown()
+                        self._thread = None
+                        return
+                if task is None:
+                    self._shutdown()
+                    with self._lock:
+                        if not self._tasks.empty():
+                            continue  # run() queued more work after close()
+                        self._thread = None
+                    return
+                future, path, fn, cancel_event = task
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(self._run_task(path, fn, cancel_event))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            self.backend.uninitialize()
+
+    def _run_task(self, path: str, fn, cancel_event):
+        def cancelled():
+            return cancel_event is not None and cancel_event.is_set()
+
+        try:
+            workbook = self._open(path)
+            if cancelled():
+                raise Cancelled()
+            result = fn(self._app, workbook)
+            if cancelled():
+                raise Cancelled()
+            return result
+        except Cancelled:
+            self._kill()
+            self._forget()
+            raise
+        except Exception as e:
+            if cancelled():
+                self._kill()
+                self._forget()
+                raise Cancelled() from e
+            # Excel or the workbook may be left in any state: start clean next time
+            self._shutdown()
+            raise
+
+    def _open(self, path: str):
+        key = workbook_key(path)
+        if self._app is None:
+            self._app = self.backend.start()
+            self._pid = self.backend.pid(self._app)
+        if self._workbook is not None and self._workbook_key != key:
+            self.backend.close_workbook(self._workbook)
+            self._workbook = self._workbook_key = None
+        if self._workbook is None:
+            with span("excel_open"):
+                self._workbook = self.backend.open_workbook(self._app, key[0])
+            self._workbook_key = key
+        return self._workbook
+
+    def _shutdown(self):
+        """Close the workbook and quit Excel, killing it if that takes longer than shutdown_timeout."""
+        if self._app is None:
+            return
+        pid = self._pid
+        watchdog = None
+        if pid:
+            watchdog = threading.Timer(self.shutdown_timeout, lambda: self.backend.kill(pid))
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            self.backend.close_workbook(self._workbook)
+            self.backend.quit(self._app)
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+            self._forget()
+
+    def _kill(self):
+        if self._pid:
+            self.backend.kill(self._pid)
+
+    def _forget(self):
+        self._app = self._pid = None
+        self._workbook = self._workbook_key = None
+        self.backend.collect()
+
+
+def get_excel_session() -> ExcelSession:
+    """The process-wide session, created with the COM backend on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            from utils.excel_app_helpers import ComExcelBackend
+            _session = ExcelSession(ComExcelBackend())
+        return _session
+
+
+def close_excel_session():
+    with _session_lock:
+        session = _session
+    if session is not None:
+        session.close()
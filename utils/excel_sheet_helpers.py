@@ -1,36 +1,16 @@
 import os, re, time
-import pythoncom
-import win32com.client as win32
 
-from utils.logging_helper import log_exception
-from utils.excel_constants import XL_FORMULAS, XL_PART, XL_BY_ROWS, XL_BY_COLUMNS, XL_PREVIOUS
 
-
-# --- Trailing empty space trimming ---
-def set_printarea_to_last_content(sheet):
-    """ Set print area to used range, trimming trailing empty rows/columns. """
-    row, col = _last_content_row_col(sheet)
-    if not row or not col:
-        sheet.PageSetup.PrintArea = "$A$1:$A$1"
-        return
-    sheet.PageSetup.PrintArea = f"$A$1:${col_letter(col)}${row}"
-
-
-def _last_content_row_col(sheet):
-    """ Uses Excel FInd(*) to find last non-empty cell's row and column. """
+def sheet_page_count(sheet) -> int | None:
+    """
+    Number of pages the sheet prints with its current print area and page setup.
+    None if Excel cannot tell (PageSetup.Pages is missing in older Excel): counting page breaks
+    is only an estimate, and a wrong estimate would move pages into another apartment's PDF.
+    """
     try:
-        last_row_cell = sheet.Cells.Find("*", sheet.Cells(1, 1), 
-                                          LookIn=XL_FORMULAS, LookAt=XL_PART,
-                                          SearchOrder=XL_BY_ROWS, SearchDirection=XL_PREVIOUS, MatchCase=False)
-        last_col_cell = sheet.Cells.Find("*", sheet.Cells(1, 1), 
-                                          LookIn=XL_FORMULAS, LookAt=XL_PART, SearchOrder=XL_BY_COLUMNS,
-                                          SearchDirection=XL_PREVIOUS, MatchCase=False)
-        if not last_row_cell or not last_col_cell:
-            return None, None
-        return int(last_row_cell.Row), int(last_col_cell.Column)
-    except Exception as e:
-        log_exception(e)
-        return None, None
+        return int(sheet.PageSetup.Pages.Count)
+    except Exception:
+        return None
 
 
 def col_letter(col_idx: int) -> str:
@@ -4,7 +4,7 @@ import shutil, os, sys
 import configparser
 from dataclasses import dataclass
 
-from src.data_classes import InvoiceItem, InvoiceType
+from src.data_classes import InvoiceItem, InvoiceType, OcrSettings, OutputSettings, ExcelSettings, TraceSettings, FieldSpec, ValidationError
 
 
 def create_invoice_dir(base_dir: Path, invoice: InvoiceItem) -> Path:
@@ -21,16 +21,23 @@ def load_app_name(config):
     config.get("app", "NAME", fallback="Arvete Saatja")
     
 
+# FORBIDDEN_LABELS of an invoice type section that does not set it (config.cfg from older versions)
+DEFAULT_FORBIDDEN_LABELS = {"kyte": "Radiaator 13; Radiaator 14"}
+
+
 def load_invoice_types(config):
     """Loads two types from config.cfg"""
     hint = config.get("ui", "TYPE_HINT")
 
     def read_section(section: str) -> InvoiceType:
+        key = config.get(section, "KEY")
+        forbidden = config.get(section, "FORBIDDEN_LABELS", fallback=DEFAULT_FORBIDDEN_LABELS.get(key, ""))
         return InvoiceType(
-            key=config.get(section, "KEY"),
+            key=key,
             label=config.get(section, "LABEL"),
             subject=config.get(section, "SUBJECT"),
-            body=config.get(section, "BODY").replace("\\n", "\n")
+            body=config.get(section, "BODY").replace("\\n", "\n"),
+            forbidden_labels=tuple(label.strip() for label in forbidden.split(";") if label.strip()),
         )
     t1 = read_section("invoice_type_kommunaal")
     t2 = read_section("invoice_type_kyte")
@@ -39,6 +46,111 @@ def load_invoice_types(config):
     return types, hint
 
 
+# [ocr] MODE values: whole page, header regions only, whole page with word confidences
+OCR_MODE_FULL = "full"
+OCR_MODE_ROI = "roi"
+OCR_MODE_CONFIDENCE = "confidence"
+OCR_MODES = (OCR_MODE_FULL, OCR_MODE_ROI, OCR_MODE_CONFIDENCE)
+
+
+def check_ocr_mode(value: str) -> str:
+    if value not in OCR_MODES:
+        raise ValidationError(f"Vigane MODE väärtus: '{value}' (lubatud: {', '.join(OCR_MODES)})")
+    return value
+
+
+def load_ocr_settings(config) -> OcrSettings:
+    """Loads OCR settings from the [ocr] section of config.cfg, falling back to defaults."""
+    defaults = OcrSettings()
+    section = "ocr"
+    return OcrSettings(
+        lang=config.get(section, "LANG", fallback=defaults.lang),
+        dpi=config.getint(section, "DPI", fallback=defaults.dpi),
+        psm=config.getint(section, "PSM", fallback=defaults.psm),
+        oem=config.getint(section, "OEM", fallback=defaults.oem),
+        timeout_sec=config.getint(section, "TIMEOUT_SEC", fallback=defaults.timeout_sec),
+        workers=config.getint(section, "WORKERS", fallback=defaults.workers),
+        use_text_layer=config.getboolean(section, "USE_TEXT_LAYER", fallback=defaults.use_text_layer),
+        ocr_mode=check_ocr_mode(config.get(section, "MODE", fallback=defaults.ocr_mode).strip().lower()),
+        header_crop=config.get(section, "HEADER_CROP", fallback=defaults.header_crop),
+        cache_enabled=config.getboolean(section, "CACHE", fallback=defaults.cache_enabled),
+        cache_max_mb=config.getint(section, "CACHE_MAX_MB", fallback=defaults.cache_max_mb),
+        cache_dir=config.get(section, "CACHE_DIR", fallback=defaults.cache_dir),
+        preprocess=config.get(section, "PREPROCESS", fallback=defaults.preprocess).strip().lower(),
+        threshold=config.get(section, "THRESHOLD", fallback=defaults.threshold).strip().lower(),
+        engine=config.get(section, "ENGINE", fallback=defaults.engine).strip().lower(),
+        dpi_ladder=tuple(
+            int(dpi) for dpi in config.get(section, "DPI_LADDER", fallback="").split(",") if dpi.strip()
+        ),
+        dpi_ladder_sequence=config.getboolean(section, "DPI_LADDER_SEQUENCE", fallback=defaults.dpi_ladder_sequence),
+        job_deadline_sec=config.getint(section, "JOB_DEADLINE_SEC", fallback=defaults.job_deadline_sec),
+        min_confidence=config.getint(section, "MIN_CONFIDENCE", fallback=defaults.min_confidence),
+        blank_pages=config.get(section, "BLANK_PAGES", fallback=defaults.blank_pages).strip().lower(),
+        duplicate_pages=config.get(section, "DUPLICATE_PAGES", fallback=defaults.duplicate_pages).strip().lower(),
+        non_invoice_pages=config.get(section, "NON_INVOICE_PAGES", fallback=defaults.non_invoice_pages).strip().lower(),
+        blank_ink_ratio=config.getfloat(section, "BLANK_INK_RATIO", fallback=defaults.blank_ink_ratio),
+        duplicate_distance=config.getint(section, "DUPLICATE_DISTANCE", fallback=defaults.duplicate_distance),
+        multi_page_invoices=config.getboolean(section, "MULTI_PAGE_INVOICES", fallback=defaults.multi_page_invoices),
+        use_outline=config.getboolean(section, "USE_OUTLINE", fallback=defaults.use_outline),
+    )
+
+
+def load_output_settings(config) -> OutputSettings:
+    """Loads invoice PDF output settings from the [output] section of config.cfg."""
+    defaults = OutputSettings()
+    section = "output"
+    return OutputSettings(
+        writers=config.getint(section, "WRITERS", fallback=defaults.writers),
+        optimize=config.getboolean(section, "OPTIMIZE", fallback=defaults.optimize),
+        subset_fonts=config.getboolean(section, "SUBSET_FONTS", fallback=defaults.subset_fonts),
+    )
+
+
+def load_excel_settings(config) -> ExcelSettings:
+    """Loads kyte workbook export settings from the [excel] section of config.cfg."""
+    defaults = ExcelSettings()
+    section = "excel"
+    return ExcelSettings(
+        one_pdf_export=config.getboolean(section, "ONE_PDF_EXPORT", fallback=defaults.one_pdf_export),
+    )
+
+
+def load_trace_settings(config) -> TraceSettings:
+    """Loads tracing settings from the [trace] section of config.cfg."""
+    defaults = TraceSettings()
+    section = "trace"
+    return TraceSettings(
+        enabled=config.getboolean(section, "ENABLED", fallback=defaults.enabled),
+        directory=config.get(section, "DIR", fallback=defaults.directory).strip(),
+    )
+
+
+def get_trace_dir(settings: TraceSettings) -> Path:
+    return Path(settings.directory) if settings.directory else Path(get_log_path()).parent
+
+
+def load_field_specs(config) -> list[FieldSpec]:
+    """
+    Extra invoice fields from the [invoice_fields] section, one per line:
+        name = label | split pattern | part index
+    The pattern may itself contain "|". Extra fields are optional: a missing row gives "".
+    """
+    section = "invoice_fields"
+    if not config.has_section(section):
+        return []
+    specs = []
+    for name, value in config.items(section, raw=True):
+        try:
+            label, rest = value.split("|", 1)
+            split, part = rest.rsplit("|", 1)
+            specs.append(
+                FieldSpec(name, label.strip().lower(), split=split.strip(), part=int(part), required=False)
+            )
+        except ValueError:
+            raise ValidationError(f"Vigane [{section}] rida: {name} = {value}")
+    return specs
+
+
 def get_config_path() -> str:
     if getattr(sys, "frozen", False):
         base_dir = os.path.dirname(sys.executable)
@@ -99,6 +211,12 @@ def get_log_path():
 
 
 
+def get_cache_dir() -> Path:
+    # Per-user cache folder, survives reinstalling the exe
+    base = os.environ.get("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "ArveteSaatja" / "ocr_cache"
+
+
 def get_field(row, name, default="") -> str:
     if hasattr(row, name):
         val = getattr(row, name)
@@ -3,15 +3,17 @@ import tkinter as tk
 from ttkbootstrap.constants import *
 from tkinter import filedialog, messagebox
 from pathlib import Path
-import threading, os, re
+import threading, os, re, logging
 import pytesseract
 import traceback
 import pythoncom
 
 from utils.logging_helper import log_exception
-from utils.excel_app_helpers import excel_open_workbook
-from utils.file_utils import create_invoice_dir
-from src.pdf_extractor import separate_invoices, save_each_invoice_as_file
+from utils.excel_session import get_excel_session
+from utils.file_utils import create_invoice_dir, get_config_path, read_config, load_invoice_types, load_trace_settings, get_trace_dir
+from utils.tracing import configure_tracing, span, export_trace
+from utils.job_manifest import open_job_manifest
+from src.pdf_extractor import stream_invoices_to_dir, save_each_invoice_as_file
 from src.xls_extractor import extract_person_data
 from src.data_classes import InvoiceItem, InvoiceBatch, ValidationError, create_invoice_batch, Cancelled
 from src.email_sender import (
@@ -21,11 +23,10 @@ from src.email_sender import (
 )
 from src.excel_invoice_extractor import (
     save_excel_invoices_as_pdfs,
-    read_invoice_meta_col_a,
     create_excel_invoices,
-    get_korter_sheet_names,
-    extract_apartment,
 )
+from src.kyte_invoice_reader import read_kyte_invoices
+from utils.native_workbook import open_native_workbook, NativeWorkbookError
 
 HUNDRED_PERCENT = 100
 REFIT_REGEX = r"(\d+)x(\d+)\+(\d+)\+(\d+)"
@@ -155,52 +156,53 @@ def _create_dest_directory(invoice_path: str):
     return dest
 
 
-def _extract_invoices_from_excel(invoice_path: str, cancel_flag, on_progress):
+# Job manifest unit holding the invoices read from the workbook's sheets
+SHEETS_UNIT = "sheets"
+
+
+def _extract_invoices_from_excel(invoice_path: str, cancel_flag, on_progress, manifest=None):
     """Process the invoice Excel file and return extracted invoices."""
-    # Get all sheets with "Korter" in a list
-
-    def extract_all(_excel, workbook):
-        sheet_names = get_korter_sheet_names(workbook)
-        if not sheet_names:
-            raise ValidationError("Excelis pole lehti nimega 'Korter ...'")
-        
-        total = len(sheet_names)
-        if on_progress:
-            on_progress(0, total)
-
-        first_sheet = workbook.Sheets(sheet_names[0])
-        meta = read_invoice_meta_col_a(first_sheet)
-
-        invoices = []
-        for index, sheet_name in enumerate(sheet_names, start=1):
-            if cancel_flag.is_set():
-                raise Cancelled
-
-            invoices.append(
-                InvoiceItem(
-                    apartment=extract_apartment(sheet_name),
-                    excel_sheet_name=sheet_name,
-                    address=meta.get("address"),
-                    period=meta.get("period"),
-                    year=meta.get("year"),
-                )
-            )
-            if on_progress:
-                on_progress(
-                    index,
-                    total)
-        return invoices
-    return excel_open_workbook(invoice_path, extract_all, cancel_event=cancel_flag)
+    if manifest is not None:
+        invoices = manifest.done_invoices(SHEETS_UNIT)
+        if invoices:
+            return invoices  # read by an earlier run of the same job, no need to start Excel
 
+    # Sheet names and the shared metadata are read straight from the file; Excel is only
+    # started (here or later for the PDF export) when the file cannot be read that way
+    try:
+        with span("excel_read", backend="native"), open_native_workbook(invoice_path) as workbook:
+            invoices = read_kyte_invoices(workbook, cancel_flag, on_progress)
+        if not all(invoice.address and invoice.period for invoice in invoices):
+            raise NativeWorkbookError("Periood or Aadress not found, e.g. formulas without saved values")
+    except NativeWorkbookError as e:
+        logging.info(f"Reading '{invoice_path}' through Excel: {e}")
+
+        def extract_all(_excel, workbook):
+            with span("excel_read", backend="com"):
+                return read_kyte_invoices(workbook, cancel_flag, on_progress)
+
+        # Excel stays open in the session for the PDF export that follows
+        invoices = get_excel_session().run(invoice_path, extract_all, cancel_event=cancel_flag)
+
+    if manifest is not None:
+        manifest.record(SHEETS_UNIT, invoices)
+    return invoices
 
-def _extract_invoices_from_pdf(invoice_path: str, cancel_flag, on_progress):
-    """Process the invoice PDF with OCR and return extracted invoices."""
+
+def _extract_invoices_from_pdf(invoice_path: str, cancel_flag, on_progress, manifest=None):
+    """
+    Process the invoice PDF with OCR and return extracted invoices.
+    Each apartment's PDF is written to the destination folder as soon as its page is parsed,
+    and recorded in the job manifest so a rerun skips it.
+    """
     try:
 
-        invoices = separate_invoices(
+        invoices, _invoice_dir = stream_invoices_to_dir(
             invoice_path,
+            _create_dest_directory(invoice_path),
             on_progress=on_progress,
             cancel_flag=cancel_flag,
+            manifest=manifest,
         )
 
     except pytesseract.TesseractError as e:
@@ -252,6 +254,8 @@ def extract_person(clients_path: str, cancel_flag):
 def save_invoices_by_type(invoice_batch: InvoiceBatch, on_progress=None, cancel_flag=None) -> Path:
     """Save invoices based on their type and return the directory path."""
     if invoice_batch.invoice_type_key == "kommunaal":
+        if all(invoice.output_path is not None for invoice in invoice_batch.invoices):
+            return invoice_batch.dest_dir  # already written while streaming
         return save_each_invoice_as_file(
             invoice_batch.invoices, invoice_batch.dest_dir
         )  # returns the full folder path to all individual invoices
@@ -315,11 +319,12 @@ def _handle_worker_error(parent, err):
 
 
 def _worker_extract_and_process(
-    parent, invoice_type_key, invoice_path, clients_path, cancel_flag, fname
+    parent, invoice_type_key, invoice_path, clients_path, cancel_flag, fname, manifest=None
 ):
     """Extract invoices and persons data."""
     # Extract people
-    persons = extract_person(clients_path, parent.cancel_event)
+    with span("client_load"):
+        persons = extract_person(clients_path, parent.cancel_event)
     if parent.cancel_event.is_set():
         raise Cancelled()
 
@@ -335,9 +340,10 @@ def _worker_extract_and_process(
                 f"Loen PDF lehti {page_number}/{total_pages} - {fname}",
             )
 
-        invoices = _extract_invoices_from_pdf(
-            invoice_path, parent.cancel_event, on_progress
-        )
+        with span("extract", type=invoice_type_key):
+            invoices = _extract_invoices_from_pdf(
+                invoice_path, parent.cancel_event, on_progress, manifest
+            )
         return persons, invoices
 
     elif invoice_type_key == "kyte":
@@ -352,7 +358,8 @@ def _worker_extract_and_process(
                 f"Loen Exceli lehti {page_number}/{total_pages} - {fname}",
             )
 
-        invoices = _extract_invoices_from_excel(invoice_path, cancel_flag, on_progress)
+        with span("extract", type=invoice_type_key):
+            invoices = _extract_invoices_from_excel(invoice_path, cancel_flag, on_progress, manifest)
         return persons, invoices
     else:
         raise ValidationError(f"Tundmatu arve tüüp: {invoice_type_key}")
@@ -378,6 +385,10 @@ def worker(
     parent, invoice_type_key, invoice_path, clients_path, template_root, subject, body
 ):
     """Worker thread function to process invoices and open email editor."""
+    # Off unless [trace] ENABLED=1; the trace is exported when the job ends and again after the e-mails
+    config = read_config()
+    trace_settings = load_trace_settings(config)
+    configure_tracing(trace_settings.enabled)
     try:
         # OCR read-through (emits per-page progress)
         fname = os.path.basename(invoice_path)
@@ -388,6 +399,13 @@ def worker(
             0, lambda: parent.page_progress.configure(value=0, mode="determinate")
         )
 
+        # Work finished by a cancelled or crashed run of the same job is reused from its manifest
+        manifest = open_job_manifest(
+            _create_dest_directory(invoice_path),
+            invoice_type_key,
+            {"invoice": invoice_path, "clients": clients_path, "config": str(get_config_path())},
+        )
+
         persons, invoices = _worker_extract_and_process(
             parent,
             invoice_type_key,
@@ -395,6 +413,7 @@ def worker(
             clients_path,
             parent.cancel_event,
             fname,
+            manifest,
         )
 
         if parent.cancel_event.is_set():
@@ -424,9 +443,12 @@ def worker(
             subject=subject,
             body=body,
             cancel_event=parent.cancel_event,
+            manifest=manifest,
+            forbidden_labels=_forbidden_labels(config, invoice_type_key),
         )
 
-        save_invoices_by_type(invoice_batch, on_progress=on_progress, cancel_flag=parent.cancel_event)
+        with span("save", type=invoice_type_key):
+            save_invoices_by_type(invoice_batch, on_progress=on_progress, cancel_flag=parent.cancel_event)
 
         if parent.cancel_event.is_set():
             parent.after(0, lambda: on_cancel_ui(parent))
@@ -441,6 +463,7 @@ def worker(
     except Exception as e:
         _handle_worker_error(parent, e)
     finally:
+        _export_trace(trace_settings)
 
         def cleanup():
             parent.page_progress.configure(value=0, mode="determinate")
@@ -449,6 +472,20 @@ def worker(
         parent.after(0, cleanup)
 
 
+def _forbidden_labels(config, invoice_type_key) -> tuple[str, ...]:
+    invoice_type = load_invoice_types(config)[0].get(invoice_type_key)
+    return invoice_type.forbidden_labels if invoice_type is not None else ()
+
+
+def _export_trace(trace_settings):
+    if not trace_settings.enabled:
+        return
+    try:
+        export_trace(get_trace_dir(trace_settings))
+    except OSError as e:
+        log_exception(e)
+
+
 def start_processing_thread(target, *args):
     """Start a worker thread to process invoices."""
     threading.Thread(target=lambda: target(*args), daemon=True).start()
@@ -499,10 +536,12 @@ def open_outlook(persons, invoices_dir, subject, body):
     # Compose emails and send them
     ensure_outlook_ready()
     try:
-        validate_persons_vs_invoices(persons, invoices_dir)
+        with span("validation"):
+            validate_persons_vs_invoices(persons, invoices_dir)
     except ValidationError as e:
         messagebox.showerror("Viga", str(e))
-    save_emails_with_invoices(persons, invoices_dir, subject, body)
+    with span("outlook_drafts"):
+        save_emails_with_invoices(persons, invoices_dir, subject, body)
 
 
 def _create_email_subject_section(parent, subject):
@@ -629,6 +668,7 @@ def _run_outlook_job_async(parent, persons, invoices_dir, subject, body):
         pythoncom.CoInitialize()
         try:
             open_outlook(persons, invoices_dir, subject, body)
+            _export_trace(load_trace_settings(read_config()))
 
             parent.after(0, parent.on_emails_saved)
             parent.after(
@@ -0,0 +1,97 @@
+import numpy as np
+from PIL import Image
+
+from utils.tracing import traced
+
+# Rows processed per median-filter band, bounds the temporary arrays
+MEDIAN_BAND_ROWS = 512
+
+THRESHOLD_OTSU = "otsu"
+
+# Median-of-9 exchange network (Devillard, "Fast median search"): after these
+# compare-swaps the middle element holds the median
+_MEDIAN9_NETWORK = (
+    (1, 2), (4, 5), (7, 8), (0, 1), (3, 4), (6, 7), (1, 2), (4, 5), (7, 8),
+    (0, 3), (5, 8), (4, 7), (3, 6), (1, 4), (2, 5), (4, 7), (4, 2), (6, 4), (4, 2),
+)
+
+
+def median_filter_3x3(arr: np.ndarray) -> np.ndarray:
+    """3x3 median with edge replication, same result as PIL's MedianFilter(size=3)."""
+    height, width = arr.shape
+    padded = np.pad(arr, 1, mode="edge")
+    out = np.empty_like(arr)
+    for top in range(0, height, MEDIAN_BAND_ROWS):
+        bottom = min(top + MEDIAN_BAND_ROWS, height)
+        p = [
+            padded[top + dy : bottom + dy, dx : dx + width].copy()
+            for dy in range(3)
+            for dx in range(3)
+        ]
+        for a, b in _MEDIAN9_NETWORK:
+            low = np.minimum(p[a], p[b])
+            np.maximum(p[a], p[b], out=p[b])
+            p[a] = low
+        out[top:bottom] = p[4]
+    return out
+
+
+def autocontrast_lut(histogram: np.ndarray, cutoff: int = 1) -> np.ndarray:
+    """Lookup table matching PIL's ImageOps.autocontrast(cutoff=cutoff) for one 8-bit channel."""
+    h = histogram.astype(np.int64).copy()
+    n = int(h.sum())
+
+    # Remove cutoff% of the pixels from each end of the histogram
+    for indices in (range(256), range(255, -1, -1)):
+        cut = n * cutoff // 100
+        for ix in indices:
+            if cut <= 0:
+                break
+            removed = min(cut, h[ix])
+            h[ix] -= removed
+            cut -= removed
+
+    nonzero = np.flatnonzero(h)
+    lo, hi = (int(nonzero[0]), int(nonzero[-1])) if nonzero.size else (255, 0)
+    if hi <= lo:
+        return np.arange(256, dtype=np.uint8)
+
+    scale = 255.0 / (hi - lo)
+    offset = -lo * scale
+    return np.clip((np.arange(256) * scale + offset).astype(np.int64), 0, 255).astype(np.uint8)
+
+
+def otsu_threshold(histogram: np.ndarray) -> int:
+    """Otsu's threshold: pixels above the returned value are foreground (white)."""
+    hist = histogram.astype(np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 127
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * levels)
+    mean_bg = np.divide(cum_mean, weight_bg, out=np.zeros(256), where=weight_bg > 0)
+    mean_fg = np.divide(cum_mean[-1] - cum_mean, weight_fg, out=np.zeros(256), where=weight_fg > 0)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+@traced("preprocess")
+def preprocess_for_ocr_numpy(img: Image.Image, threshold=180) -> Image.Image:
+    """
+    NumPy version of preprocess_for_ocr: grayscale -> 3x3 median -> autocontrast -> binarize,
+    all on one working array. threshold is a 0-255 level or "otsu" for an adaptive one.
+    """
+    if img.mode != "L":
+        img = img.convert("L")
+    arr = median_filter_3x3(np.asarray(img))
+
+    lut = autocontrast_lut(np.bincount(arr.ravel(), minlength=256), cutoff=1)
+    np.take(lut, arr, out=arr)
+
+    if threshold == THRESHOLD_OTSU:
+        level = otsu_threshold(np.bincount(arr.ravel(), minlength=256))
+    else:
+        level = int(threshold)
+    return Image.fromarray(arr > level)
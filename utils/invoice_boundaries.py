@@ -0,0 +1,78 @@
+import logging
+import fitz
+
+from src.data_classes import OcrSettings
+from utils.ocr_helper import render_page_to_image, run_ocr_on_image, get_preprocessor
+from utils.page_classifier import difference_hash
+from utils.pdf_document import SourceDocument
+
+# The label every invoice's first page carries (see the address spec in field_parser)
+START_LABEL = "aadress"
+
+# Top share of the page checked for the label
+HEADER_SHARE = 0.4
+# The header band is OCR'd at this resolution to look for the label, well below OCR DPI
+PROBE_DPI = 150
+# Header layout fingerprints are taken from a render at this resolution
+LAYOUT_DPI = 36
+# Max differing bits (of 256) for a header that looks like a known first page
+LAYOUT_DISTANCE = 12
+
+
+def _header_band(page: fitz.Page) -> fitz.Rect:
+    rect = page.rect
+    return fitz.Rect(rect.x0, rect.y0, rect.x1, rect.y0 + rect.height * HEADER_SHARE)
+
+
+class InvoiceBoundaryDetector:
+    """
+    Decides whether a page starts an invoice or continues the one before it, cheapest signal first:
+    the page's text layer, then a header layout fingerprint of known first pages, then OCR of the
+    header band at low resolution. Continuation pages never get a full OCR.
+    """
+
+    def __init__(self, document: SourceDocument, settings: OcrSettings, text_layer_min_chars: int):
+        self.document = document
+        self.settings = settings
+        self.text_layer_min_chars = text_layer_min_chars
+        self._preprocess = get_preprocessor(settings.preprocess, settings.threshold)
+        self._start_layouts: list[int] = []
+
+    def header_fingerprint(self, page_number: int) -> int:
+        page = self.document.load_page(page_number)
+        scale = LAYOUT_DPI / 72
+        img = render_page_to_image(page, fitz.Matrix(scale, scale))
+        try:
+            height = int(img.height * HEADER_SHARE)
+            return difference_hash(img.crop((0, 0, img.width, height)))
+        finally:
+            img.close()
+
+    def is_invoice_start(self, page_number: int, text_layer: str = "") -> bool:
+        if len(text_layer.strip()) >= self.text_layer_min_chars:
+            return START_LABEL in text_layer.lower()
+
+        fingerprint = self.header_fingerprint(page_number)
+        if any(bin(fingerprint ^ known).count("1") <= LAYOUT_DISTANCE for known in self._start_layouts):
+            return True
+
+        text = self._probe_header(page_number)
+        if START_LABEL in text.lower():
+            self._start_layouts.append(fingerprint)
+            return True
+        logging.info(f"No '{START_LABEL}' in the header of page {page_number}, treating it as a continuation page")
+        return False
+
+    def _probe_header(self, page_number: int) -> str:
+        page = self.document.load_page(page_number)
+        scale = PROBE_DPI / 72
+        img = None
+        try:
+            img = self._preprocess(render_page_to_image(page, fitz.Matrix(scale, scale), clip=_header_band(page)))
+            ocr_config = f"--oem {self.settings.oem} --psm 6"
+            return run_ocr_on_image(
+                img, self.settings.lang, ocr_config, page_number, self.document.path, self.settings.timeout_sec
+            )
+        finally:
+            if img is not None:
+                img.close()
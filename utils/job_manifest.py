@@ -0,0 +1,153 @@
+import os, json, hashlib, logging, threading
+from dataclasses import fields
+from pathlib import Path
+
+from src.data_classes import InvoiceItem
+from utils.logging_helper import log_line
+
+MANIFEST_VERSION = 1
+# The manifest of destination dir "arved" is "arved.job.jsonl" beside it
+MANIFEST_SUFFIX = ".job.jsonl"
+# InvoiceItem fields that are runtime objects, not saved
+UNSAVED_FIELDS = ("pdf_page",)
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_path(dest: Path) -> Path:
+    dest = Path(dest)
+    return dest.with_name(dest.name + MANIFEST_SUFFIX)
+
+
+def invoice_to_dict(invoice: InvoiceItem) -> dict:
+    data = {field.name: getattr(invoice, field.name) for field in fields(InvoiceItem) if field.name not in UNSAVED_FIELDS}
+    if data["output_path"] is not None:
+        data["output_path"] = str(data["output_path"])
+    return data
+
+
+def invoice_from_dict(data: dict) -> InvoiceItem:
+    known = {field.name for field in fields(InvoiceItem)}
+    invoice = InvoiceItem(**{key: value for key, value in data.items() if key in known})
+    if invoice.output_path is not None:
+        invoice.output_path = Path(invoice.output_path)
+    return invoice
+
+
+class JobManifest:
+    """
+    Journal of one job's finished work, so a cancelled or crashed run can resume.
+    The first line holds the job type and the hashes of its input files; every finished unit
+    (a written invoice PDF, an exported sheet, the list of sheets read) appends one line.
+    A line is only appended once its output file is complete, and a torn last line from a crash
+    is ignored, so everything the manifest lists can be reused as is.
+    """
+
+    def __init__(self, path: Path, job_key: str, inputs: dict[str, str]):
+        self.path = Path(path)
+        self.job_key = job_key
+        self.inputs = inputs
+        self.units: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, dest: Path, job_key: str, input_paths: dict[str, str]) -> "JobManifest":
+        """
+        The manifest for dest: the earlier run's units if it was the same job with identical
+        input files, otherwise a new, empty one.
+        """
+        inputs = {name: file_sha256(path) for name, path in input_paths.items()}
+        manifest = cls(manifest_path(dest), job_key, inputs)
+        header, entries = manifest._read()
+        if header == manifest._header():
+            for entry in entries:
+                manifest.units[entry["unit"]] = entry
+            if manifest.units:
+                log_line(f"Resuming job from '{manifest.path}': {len(manifest.units)} units already done")
+        elif header is not None:
+            logging.info(f"Inputs of '{manifest.path}' changed, starting the job from the beginning")
+        manifest._rewrite()  # drops a torn last line, so new lines are not appended to it
+        return manifest
+
+    def _read(self) -> tuple[dict | None, list[dict]]:
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return None, []
+        except (OSError, UnicodeDecodeError):
+            logging.warning(f"Unreadable job manifest {self.path}, starting over", exc_info=True)
+            return None, []
+
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break  # torn write from a crash: nothing after it counts
+        if not records:
+            return None, []
+        return records[0], [record for record in records[1:] if "unit" in record]
+
+    def _header(self) -> dict:
+        return {"version": MANIFEST_VERSION, "job": self.job_key, "inputs": self.inputs}
+
+    def _rewrite(self):
+        lines = [json.dumps(self._header())]
+        lines += [json.dumps(entry, ensure_ascii=False) for entry in self.units.values()]
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def done(self, unit: str) -> dict | None:
+        """The entry of a finished unit, None if it is not done or its output file is gone."""
+        entry = self.units.get(unit)
+        if entry is None:
+            return None
+        output = entry.get("output")
+        if output and not Path(output).is_file():
+            return None
+        return entry
+
+    def done_invoices(self, unit: str) -> list[InvoiceItem] | None:
+        entry = self.done(unit)
+        if entry is None:
+            return None
+        invoices = [invoice_from_dict(data) for data in entry["invoices"]]
+        for invoice in invoices:
+            if invoice.output_path is None and entry["output"]:
+                invoice.output_path = Path(entry["output"])
+        return invoices
+
+    def record(self, unit: str, invoices: list[InvoiceItem], output: Path = None, pages: list[int] = None):
+        """Append a finished unit. Safe to call from writer callbacks on other threads."""
+        entry = {
+            "unit": unit,
+            "invoices": [invoice_to_dict(invoice) for invoice in invoices],
+            "output": str(output) if output is not None else None,
+            "pages": list(pages) if pages is not None else None,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.units[unit] = entry
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError:
+                logging.warning(f"Failed to update job manifest {self.path}", exc_info=True)
+
+
+def open_job_manifest(dest: Path, job_key: str, input_paths: dict[str, str]) -> JobManifest | None:
+    """JobManifest.open, or None (run without resume) if the manifest cannot be written."""
+    try:
+        return JobManifest.open(dest, job_key, input_paths)
+    except OSError:
+        logging.warning(f"Job manifest for '{dest}' not available, the job cannot be resumed", exc_info=True)
+        return None
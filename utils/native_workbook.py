@@ -0,0 +1,210 @@
+"""
+Read-only access to .xlsx/.xlsm (openpyxl) and .xls (xlrd) workbooks without starting Excel.
+NativeWorkbook mimics the small part of the Excel COM object model the kyte reader uses:
+wb.Sheets (iterable and callable by name), sheet.Name, sheet.Cells(row, col).Text/.Value
+and sheet.Range(address).Value. Anything else (UsedRange, Rows, PageSetup...) needs Excel.
+Errors while reading sheet data are raised as NativeWorkbookError, like errors opening the file.
+"""
+import os, logging, functools
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+import openpyxl
+import xlrd
+
+from utils.sheet_snapshot import display_text, parse_range_address
+
+# Same order as src.xls_extractor.read_xls_with_fallback
+XLS_ENCODINGS = ("cp1250", "cp1252", "latin1")
+
+OPENPYXL_EXTENSIONS = (".xlsx", ".xlsm")
+XLRD_EXTENSIONS = (".xls",)
+
+
+class NativeWorkbookError(Exception):
+    # The file cannot be read without Excel (format not supported, damaged, formulas without cached values...)
+    pass
+
+
+class NativeCell:
+    __slots__ = ("Value",)
+
+    def __init__(self, value):
+        self.Value = value
+
+    @property
+    def Text(self) -> str:
+        return display_text(self.Value)
+
+
+class NativeRange:
+    __slots__ = ("Value",)
+
+    def __init__(self, value):
+        self.Value = value
+
+
+def _wrap_read_errors(method):
+    """Errors parsing sheet data become NativeWorkbookError, so the caller falls back to Excel."""
+    @functools.wraps(method)
+    def wrapper(self, *args):
+        try:
+            return method(self, *args)
+        except NativeWorkbookError:
+            raise
+        except Exception as e:
+            logging.debug(f"Native workbook reader failed on sheet '{self.Name}'", exc_info=True)
+            raise NativeWorkbookError(f"Cannot read sheet '{self.Name}' without Excel: {e}") from e
+    return wrapper
+
+
+class _NativeSheet(ABC):
+    Name: str
+
+    @abstractmethod
+    def Cells(self, row: int, col: int) -> NativeCell:
+        """sheet.Cells(row, col), 1-based; raises NativeWorkbookError if the sheet data cannot be read."""
+
+    def Range(self, address: str) -> NativeRange:
+        """sheet.Range("A1:B50").Value as Excel returns it: rows of values, a bare value for one cell."""
+        first_row, first_col, last_row, last_col = parse_range_address(address)
+        values = tuple(
+            tuple(self.Cells(row, col).Value for col in range(first_col, last_col + 1))
+            for row in range(first_row, last_row + 1)
+        )
+        if first_row == last_row and first_col == last_col:
+            return NativeRange(values[0][0])
+        return NativeRange(values)
+
+    def __getattr__(self, name: str):
+        # Only called for attributes the sheet does not have, i.e. the rest of the COM worksheet API
+        raise AttributeError(f"Worksheet.{name} needs Excel, the native reader has only Name, Cells and Range")
+
+
+class _OpenpyxlSheet(_NativeSheet):
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+        self.Name = worksheet.title
+        self._rows: list[tuple] = []
+        self._exhausted = False
+
+    def _load_rows(self, row: int):
+        # Read-only worksheets parse the sheet XML per access: read rows once, in order, as far as needed
+        if self._exhausted or row <= len(self._rows):
+            return
+        fetched = list(self._worksheet.iter_rows(min_row=len(self._rows) + 1, max_row=row, values_only=True))
+        self._rows.extend(fetched)
+        if len(self._rows) < row:
+            self._exhausted = True
+
+    @_wrap_read_errors
+    def Cells(self, row: int, col: int) -> NativeCell:
+        self._load_rows(row)
+        if row > len(self._rows) or col > len(self._rows[row - 1]):
+            return NativeCell(None)
+        return NativeCell(self._rows[row - 1][col - 1])
+
+
+class _XlrdSheet(_NativeSheet):
+    def __init__(self, book, name: str):
+        self._book = book
+        self._sheet = None
+        self.Name = name
+
+    @_wrap_read_errors
+    def Cells(self, row: int, col: int) -> NativeCell:
+        if self._sheet is None:
+            # on_demand books parse a sheet only when it is first used, listing names is free
+            self._sheet = self._book.sheet_by_name(self.Name)
+        if row > self._sheet.nrows or col > self._sheet.ncols:
+            return NativeCell(None)
+        cell = self._sheet.cell(row - 1, col - 1)
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            return NativeCell(xlrd.xldate_as_datetime(cell.value, self._book.datemode))
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+            return NativeCell(None)
+        if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            return NativeCell(bool(cell.value))
+        return NativeCell(cell.value)
+
+
+class _Sheets:
+    """workbook.Sheets: iterate over all sheets or call with a sheet name."""
+
+    def __init__(self, names: list[str], load):
+        self._names = names
+        self._load = load
+        self._loaded = {}
+
+    def __call__(self, name: str):
+        if name not in self._loaded:
+            if name not in self._names:
+                raise KeyError(name)
+            try:
+                self._loaded[name] = self._load(name)
+            except Exception as e:
+                raise NativeWorkbookError(f"Cannot read sheet '{name}' without Excel: {e}") from e
+        return self._loaded[name]
+
+    def __iter__(self):
+        return (self(name) for name in self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+
+class NativeWorkbook:
+    def __init__(self, path: str, sheet_names: list[str], load_sheet, close):
+        self.path = path
+        self.sheet_names = sheet_names
+        self.Sheets = _Sheets(sheet_names, load_sheet)
+        self._close = close
+
+    def close(self):
+        self._close()
+
+
+def _open_openpyxl(path: str) -> NativeWorkbook:
+    # data_only: formula cells give the value Excel cached when the file was saved
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    return NativeWorkbook(path, list(workbook.sheetnames), lambda name: _OpenpyxlSheet(workbook[name]), workbook.close)
+
+
+def _open_xlrd(path: str) -> NativeWorkbook:
+    error = None
+    for encoding in XLS_ENCODINGS:
+        try:
+            book = xlrd.open_workbook(path, on_demand=True, encoding_override=encoding)
+            break
+        except UnicodeDecodeError as e:
+            error = e
+    else:
+        raise NativeWorkbookError(f"Cannot decode '{path}'") from error
+    return NativeWorkbook(
+        path, list(book.sheet_names()), lambda name: _XlrdSheet(book, name), book.release_resources
+    )
+
+
+@contextmanager
+def open_native_workbook(path: str):
+    """
+    Open path read-only without Excel. Raises NativeWorkbookError if the format is not
+    supported or the file cannot be parsed, so the caller can fall back to Excel.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension in OPENPYXL_EXTENSIONS:
+            workbook = _open_openpyxl(path)
+        elif extension in XLRD_EXTENSIONS:
+            workbook = _open_xlrd(path)
+        else:
+            raise NativeWorkbookError(f"Unsupported workbook format: {extension}")
+    except NativeWorkbookError:
+        raise
+    except Exception as e:
+        logging.debug(f"Native workbook reader failed on '{path}'", exc_info=True)
+        raise NativeWorkbookError(f"Cannot read '{path}' without Excel: {e}") from e
+    try:
+        yield workbook
+    finally:
+        workbook.close()
@@ -0,0 +1,145 @@
+import os, hashlib, logging
+from pathlib import Path
+import pytesseract
+from PIL import Image
+
+from utils.logging_helper import log_line
+from utils.ocr_engines import get_ocr_engine_name
+
+CACHE_FILE_SUFFIX = ".txt"
+# What an entry holds: image_to_string text, or image_to_data words/boxes/confidences as JSON
+KIND_TEXT = "text"
+KIND_DATA = "data"
+# After eviction the cache is trimmed to this share of its maximum size
+EVICT_TO_RATIO = 0.9
+
+_cache = None
+
+
+class OcrCache:
+    """
+    On-disk OCR result cache keyed by the page image bytes and OCR parameters.
+    Least recently used entries (by file mtime, refreshed on every hit) are evicted
+    once the total size exceeds max_bytes.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # lazily scanned total size in bytes
+        self._tesseract_version = None
+
+    def tesseract_version(self) -> str:
+        if self._tesseract_version is None:
+            try:
+                self._tesseract_version = str(pytesseract.get_tesseract_version())
+            except Exception:
+                logging.debug("Failed to query Tesseract version for OCR cache key.", exc_info=True)
+                self._tesseract_version = "unknown"
+        return self._tesseract_version
+
+    def make_key(self, img: Image.Image, lang: str, ocr_config: str, kind: str = KIND_TEXT) -> str:
+        """Hash the page pixels plus everything that changes Tesseract's output."""
+        digest = hashlib.sha256()
+        # Image size stands in for the render DPI; the engine matters as tesserocr may link another Tesseract
+        digest.update(
+            f"{kind}|{get_ocr_engine_name()}|{img.mode}|{img.size}|{lang}|{ocr_config}|{self.tesseract_version()}".encode("utf-8")
+        )
+        digest.update(img.tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{CACHE_FILE_SUFFIX}"
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except OSError:
+            logging.debug(f"Unreadable OCR cache entry {path}", exc_info=True)
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        self.hits += 1
+        return text
+
+    def put(self, key: str, text: str):
+        path = self._path(key)
+        size = self.current_size()  # before the write, a first scan would count the new file too
+        try:
+            size -= path.stat().st_size  # an overwritten entry must not be counted twice
+        except OSError:
+            pass
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp_path.write_text(text, encoding="utf-8")
+            os.replace(tmp_path, path)  # atomic, safe with parallel OCR workers
+        except OSError:
+            logging.debug(f"Failed to write OCR cache entry {path}", exc_info=True)
+            return
+
+        self._size = size + path.stat().st_size
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self) -> list[os.DirEntry]:
+        entries = []
+        if not self.directory.is_dir():
+            return entries
+        for sub in os.scandir(self.directory):
+            if sub.is_dir():
+                entries.extend(e for e in os.scandir(sub.path) if e.name.endswith(CACHE_FILE_SUFFIX))
+        return entries
+
+    def current_size(self) -> int:
+        if self._size is None:
+            self._size = sum(entry.stat().st_size for entry in self._entries())
+        return self._size
+
+    def evict(self):
+        """Delete least recently used entries until the cache is below its size limit."""
+        entries = sorted(self._entries(), key=lambda e: e.stat().st_mtime)
+        size = sum(entry.stat().st_size for entry in entries)
+        target = self.max_bytes * EVICT_TO_RATIO
+        removed = 0
+        for entry in entries:
+            if size <= target:
+                break
+            try:
+                entry_size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            size -= entry_size
+            removed += 1
+        self._size = size
+        logging.info(f"OCR cache evicted {removed} entries, {size} bytes left")
+
+    def add_stats(self, hits: int, misses: int):
+        """Merge counters reported by OCR worker processes."""
+        self.hits += hits
+        self.misses += misses
+
+    def log_stats(self, pdf_path: str):
+        log_line(f"OCR cache for '{pdf_path}': {self.hits} hits, {self.misses} misses")
+
+
+def configure_ocr_cache(enabled: bool, directory, max_mb: int) -> OcrCache | None:
+    """Set up (or disable) the process-wide OCR cache used by run_ocr_on_image."""
+    global _cache
+    _cache = OcrCache(Path(directory), max_mb * 1024 * 1024) if enabled else None
+    return _cache
+
+
+def get_ocr_cache() -> OcrCache | None:
+    return _cache
@@ -0,0 +1,145 @@
+import os, shlex, logging, threading
+from contextlib import contextmanager
+from PIL import Image
+
+try:
+    import tesserocr  # optional: in-process Tesseract API binding
+except ImportError:
+    tesserocr = None
+
+ENGINE_PYTESSERACT = "pytesseract"  # one tesseract subprocess per image
+ENGINE_TESSEROCR = "tesserocr"  # long-lived in-process Tesseract API
+
+# Columns of pytesseract.image_to_data(output_type=Output.DICT)
+DATA_COLUMNS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num", "left", "top", "width", "height", "conf", "text")
+WORD_LEVEL = 5  # the "level" image_to_data gives word rows
+
+_engine_name = ENGINE_PYTESSERACT
+_apis: dict[tuple, "TesserocrEngine"] = {}
+_apis_lock = threading.Lock()
+
+
+def parse_ocr_config(ocr_config: str) -> tuple[int, int, dict[str, str]]:
+    """Split a CLI style config ("--oem 1 --psm 6 -c key=value") into (oem, psm, variables)."""
+    oem, psm, variables = 1, 6, {}
+    args = shlex.split(ocr_config)
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == "--oem" and i + 1 < len(args):
+            oem = int(args[i + 1])
+            i += 1
+        elif arg == "--psm" and i + 1 < len(args):
+            psm = int(args[i + 1])
+            i += 1
+        elif arg == "-c" and i + 1 < len(args):
+            key, _, value = args[i + 1].partition("=")
+            variables[key] = value
+            i += 1
+        i += 1
+    return oem, psm, variables
+
+
+def get_tessdata_path(tesseract_cmd: str | None) -> str | None:
+    """tessdata folder next to the tesseract executable (bundled exe), else Tesseract's default."""
+    if os.environ.get("TESSDATA_PREFIX"):
+        return os.environ["TESSDATA_PREFIX"]
+    if tesseract_cmd:
+        candidate = os.path.join(os.path.dirname(tesseract_cmd), "tessdata")
+        if os.path.isdir(candidate):
+            return candidate
+    return None
+
+
+class TesserocrEngine:
+    """
+    One loaded Tesseract instance for a language/OEM pair.
+    The traineddata is loaded once and the instance is reused for every page of every run.
+    """
+
+    def __init__(self, lang: str, oem: int, tessdata_path: str | None):
+        kwargs = {"lang": lang, "oem": tesserocr.OEM(oem)}
+        if tessdata_path:
+            kwargs["path"] = tessdata_path
+        self.api = tesserocr.PyTessBaseAPI(**kwargs)
+        self.lock = threading.Lock()  # the C++ API is not thread-safe
+
+    @contextmanager
+    def _recognized(self, img: Image.Image, psm: int, variables: dict[str, str], timeout_sec: int):
+        """Recognize img with the lock held; raises RuntimeError("Timeout") if Tesseract does not finish in time."""
+        with self.lock:
+            self.api.SetPageSegMode(tesserocr.PSM(psm))
+            for key, value in variables.items():
+                self.api.SetVariable(key, value)
+            try:
+                self.api.SetImage(img)
+                if not self.api.Recognize(timeout=int(timeout_sec * 1000)):
+                    raise RuntimeError("Timeout or recognition failure in Tesseract")
+                yield self.api
+            finally:
+                # Per-call variables (e.g. whitelists) must not leak into the next page
+                for key in variables:
+                    self.api.SetVariable(key, "")
+                self.api.Clear()
+
+    def ocr(self, img: Image.Image, psm: int, variables: dict[str, str], timeout_sec: int) -> str:
+        """OCR an image; raises RuntimeError("Timeout") if Tesseract does not finish in time."""
+        with self._recognized(img, psm, variables, timeout_sec) as api:
+            return api.GetUTF8Text() or ""
+
+    def data(self, img: Image.Image, psm: int, variables: dict[str, str], timeout_sec: int) -> dict:
+        """Word boxes and confidences shaped like image_to_data(output_type=Output.DICT) (word rows only)."""
+        with self._recognized(img, psm, variables, timeout_sec) as api:
+            return _words_to_data(api.GetIterator())
+
+
+def _words_to_data(iterator) -> dict:
+    data = {column: [] for column in DATA_COLUMNS}
+    if iterator is None:
+        return data  # nothing recognized
+    ril = tesserocr.RIL
+    block = par = line = word = 0
+    for result in tesserocr.iterate_level(iterator, ril.WORD):
+        if result.IsAtBeginningOf(ril.BLOCK):
+            block, par = block + 1, 0
+        if result.IsAtBeginningOf(ril.PARA):
+            par, line = par + 1, 0
+        if result.IsAtBeginningOf(ril.TEXTLINE):
+            line, word = line + 1, 0
+        word += 1
+        box = result.BoundingBox(ril.WORD)
+        if box is None:
+            continue
+        left, top, right, bottom = box
+        row = (WORD_LEVEL, 1, block, par, line, word, left, top, right - left, bottom - top,
+               round(result.Confidence(ril.WORD), 6), result.GetUTF8Text(ril.WORD) or "")
+        for column, value in zip(DATA_COLUMNS, row):
+            data[column].append(value)
+    return data
+
+
+def configure_ocr_engine(name: str) -> str:
+    """Select the process-wide OCR backend used by run_ocr_on_image; returns the effective name."""
+    global _engine_name
+    if name == ENGINE_TESSEROCR and tesserocr is None:
+        logging.warning("OCR engine 'tesserocr' is not installed, falling back to pytesseract")
+        name = ENGINE_PYTESSERACT
+    if name not in (ENGINE_PYTESSERACT, ENGINE_TESSEROCR):
+        raise ValueError(f"Unknown OCR engine: {name}")
+    _engine_name = name
+    return name
+
+
+def get_ocr_engine_name() -> str:
+    return _engine_name
+
+
+def get_tesserocr_engine(lang: str, oem: int, tesseract_cmd: str | None) -> TesserocrEngine:
+    """Return the cached engine for lang/oem, loading the traineddata on first use."""
+    key = (lang, oem)
+    with _apis_lock:
+        engine = _apis.get(key)
+        if engine is None:
+            engine = TesserocrEngine(lang, oem, get_tessdata_path(tesseract_cmd))
+            _apis[key] = engine
+        return engine
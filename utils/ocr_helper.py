@@ -1,9 +1,26 @@
 import os, sys, shutil, logging, fitz, io
+import traceback
+from functools import partial
+import numpy as np
 import pytesseract
 from tkinter import messagebox
 from PIL import Image, ImageOps, ImageFilter
 
+from src.data_classes import Cancelled
 from utils.logging_helper import log_line
+from utils.tracing import traced
+from utils.ocr_cache import get_ocr_cache
+from utils.ocr_runner import ocr_image_to_string
+from utils.image_preprocessing import preprocess_for_ocr_numpy, otsu_threshold, THRESHOLD_OTSU
+from utils.ocr_engines import (
+    ENGINE_TESSEROCR,
+    get_ocr_engine_name,
+    get_tesserocr_engine,
+    parse_ocr_config,
+)
+
+PREPROCESS_PIL = "pil"
+PREPROCESS_NUMPY = "numpy"
 
 
 def get_tesseract_cmd():
@@ -79,7 +96,25 @@ def check_tesseract_lang(lang: str) -> None:
         logging.debug("Failed to query Tesseract languages.", exc_info=True)
 
 
-def render_page_to_image(page: fitz.Page, matrix: fitz.Matrix) -> Image.Image:
+@traced("render")
+def render_page_to_image(page: fitz.Page, matrix: fitz.Matrix, grayscale: bool = True, clip: fitz.Rect = None) -> Image.Image:
+    """
+    Render a page straight into a PIL image that shares the pixmap's sample buffer (no PNG round trip).
+    Renders in grayscale by default since preprocess_for_ocr works on "L" images anyway.
+    clip renders only that part of the page (in page coordinates).
+    """
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    pix = page.get_pixmap(matrix=matrix, colorspace=colorspace, alpha=False, clip=clip)
+    mode = "L" if pix.n == 1 else "RGB"
+
+    img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+    # The memoryview does not own the pixels: keep the pixmap alive as long as the image
+    img._pixmap = pix
+    return img
+
+
+def render_page_to_image_png(page: fitz.Page, matrix: fitz.Matrix) -> Image.Image:
+    """Previous rendering path (PNG encode + decode), kept for benchmarking."""
     pix = page.get_pixmap(matrix=matrix, alpha=False)
     png_bytes = pix.tobytes("png")
 
@@ -89,28 +124,64 @@ def render_page_to_image(page: fitz.Page, matrix: fitz.Matrix) -> Image.Image:
     return img
 
 
-def preprocess_for_ocr(img: Image.Image) -> Image.Image:
+@traced("preprocess")
+def preprocess_for_ocr(img: Image.Image, threshold=180) -> Image.Image:
     # Preprocess: grayscale -> slight denoise -> autocontrast -> binarize
     img = img.convert("L")  # Grayscale\
     img = img.filter(ImageFilter.MedianFilter(size=3))  # Denoise
     img = ImageOps.autocontrast(img, cutoff=1)  # Autocontrast
 
     # Binarize 
-    img = img.point(lambda x: 255 if x > 180 else 0, mode='1')
+    if threshold == THRESHOLD_OTSU:
+        threshold = otsu_threshold(np.array(img.histogram()))
+    img = img.point(lambda x: 255 if x > threshold else 0, mode='1')
     return img
 
 
+def get_preprocessor(engine: str = PREPROCESS_PIL, threshold="180"):
+    """
+    Return the preprocessing function for the given engine ("pil" or "numpy").
+    threshold is a 0-255 level or "otsu". The result is picklable for the OCR worker pool.
+    """
+    threshold = THRESHOLD_OTSU if str(threshold).strip().lower() == THRESHOLD_OTSU else int(threshold)
+    if engine == PREPROCESS_NUMPY:
+        return partial(preprocess_for_ocr_numpy, threshold=threshold)
+    if engine == PREPROCESS_PIL:
+        return partial(preprocess_for_ocr, threshold=threshold)
+    raise ValueError(f"Unknown OCR preprocessing engine: {engine}")
+
+
+@traced("ocr")
+def _run_tesserocr(img: Image.Image, lang: str, ocr_config: str, timeout_sec: int) -> str:
+    """OCR through the long-lived in-process Tesseract instance for this lang/oem."""
+    oem, psm, variables = parse_ocr_config(ocr_config)
+    engine = get_tesserocr_engine(lang, oem, pytesseract.pytesseract.tesseract_cmd)
+    return engine.ocr(img, psm, variables, timeout_sec)
+
+
 def run_ocr_on_image(img: Image.Image, lang: str, ocr_config: str, page_index: int, pdf_path: str, timeout_sec: int) -> str:
     # Run OCR on a preprocessed image and handle errors
+    cache = get_ocr_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(img, lang, ocr_config)
+        cached_text = cache.get(cache_key)
+        if cached_text is not None:
+            return cached_text
+
     try:
         # OCR with timeout so a single page can't block the whole process
-        text = pytesseract.image_to_string(
-            img, lang=lang, config=ocr_config, timeout=timeout_sec
-            ) or ""
+        if get_ocr_engine_name() == ENGINE_TESSEROCR:
+            text = _run_tesserocr(img, lang, ocr_config, timeout_sec)
+        else:
+            # Tracked tesseract process, killed right away when the job is cancelled
+            text = ocr_image_to_string(img, lang, ocr_config, timeout_sec) or ""
+        if cache_key is not None:
+            cache.put(cache_key, text)
         return text
     except pytesseract.TesseractError as e:
         # Show stderr from tesseract - helpful for missing lang and bad params
-        logging.error(f"Tesseract failed on page {i}: {e}\n{getattr(e, 'stderr', '')}")
+        logging.error(f"Tesseract failed on page {page_index}: {e}\n{getattr(e, 'stderr', '')}")
         stderr = getattr(e, "stderr", "")
         if stderr:
             logging.error("--- Tesseract stderr ---")
@@ -118,14 +189,17 @@ def run_ocr_on_image(img: Image.Image, lang: str, ocr_config: str, page_index: i
         return "" # Return empty text on error
         
     except RuntimeError as e:
-        # pytesseract timeout raises RuntimeError
+        # pytesseract and the tesserocr engine raise RuntimeError on timeout
         if "Timeout" in str(e):
-            logging.error(f"OCR timeout on page {i} of '{pdf_path}' after {timeout_sec} seconds")
+            logging.error(f"OCR timeout on page {page_index} of '{pdf_path}' after {timeout_sec} seconds")
             return ""
         # Reraise other runtime errors
         raise
 
+    except Cancelled:
+        raise
+
     except Exception as e:
-        logging.error(f"Unexpected error on page {i} of '{pdf_path}': {e}")
+        logging.error(f"Unexpected error on page {page_index} of '{pdf_path}': {e}")
         logging.error(traceback.format_exc())
         return ""
\ No newline at end of file
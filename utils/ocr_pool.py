@@ -0,0 +1,237 @@
+import os, logging, concurrent.futures
+import multiprocessing
+from contextlib import contextmanager
+import fitz
+import pytesseract
+
+from utils.ocr_helper import render_page_to_image, preprocess_for_ocr, run_ocr_on_image
+from utils.ocr_regions import ocr_page_roi, ocr_page_with_confidence
+from utils.ocr_cache import configure_ocr_cache, get_ocr_cache
+from utils.ocr_engines import configure_ocr_engine, get_ocr_engine_name
+from utils.ocr_runner import configure_ocr_cancel
+from utils.pdf_document import SourceDocument
+from utils.tracing import configure_tracing, tracing_enabled, drain_spans, add_spans
+from src.data_classes import Cancelled
+
+# Poll interval while waiting on workers, so cancellation is noticed quickly
+POLL_INTERVAL_SEC = 0.2
+
+# After a cancel, workers get this long to kill their Tesseract and return before they are terminated
+CANCEL_GRACE_SEC = 1.0
+
+# Per-process state, set up once by _init_worker
+_worker_doc = None
+
+# Parent-side pool kept open across calls by shared_ocr_pool: (pdf_path, executor, stop_event)
+_shared_pool = None
+
+
+def resolve_worker_count(workers: int, page_count: int) -> int:
+    """Resolve configured worker count (0 = auto) to an actual pool size."""
+    if workers <= 0:
+        workers = max(1, (os.cpu_count() or 1) - 1)
+    return max(1, min(workers, page_count))
+
+
+def _init_worker(pdf_path: str, tesseract_cmd: str, cache_config, engine_name: str, stop_event, tracing: bool = False):
+    """Open the PDF once per worker process and cap Tesseract's own threading."""
+    global _worker_doc
+
+    # Set by the parent on cancel: the worker kills its running tesseract and gives up the page
+    configure_ocr_cancel(stop_event)
+
+    # With tesserocr each worker keeps its own loaded Tesseract for all of its pages
+    configure_ocr_engine(engine_name)
+
+    if cache_config is not None:
+        configure_ocr_cache(True, *cache_config)
+
+    # Spans go back to the parent with each page, see _ocr_page_in_worker
+    configure_tracing(tracing)
+
+    # Tesseract uses OpenMP internally; with N processes we want 1 thread each
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    _worker_doc = SourceDocument(pdf_path)
+
+
+def _ocr_page_in_worker(page_idx, pdf_path, lang, ocr_config, dpi, timeout_sec, roi=None, preprocess=preprocess_for_ocr, confidence=None):
+    """
+    OCR one page (1-based index) inside a worker process.
+    Returns (text, cache_hits, cache_misses, spans) so the parent can report cache statistics
+    and merge the page's trace spans; with confidence, text is a (text, confidence) pair.
+    """
+    cache = get_ocr_cache()
+    hits, misses = (cache.hits, cache.misses) if cache else (0, 0)
+    text = _render_and_ocr(page_idx, pdf_path, lang, ocr_config, dpi, timeout_sec, roi, preprocess, confidence)
+    if cache is None:
+        return text, 0, 0, drain_spans()
+    return text, cache.hits - hits, cache.misses - misses, drain_spans()
+
+
+def _render_and_ocr(page_idx, pdf_path, lang, ocr_config, dpi, timeout_sec, roi, preprocess, confidence=None):
+    """
+    Render, preprocess and OCR one page of the worker's document.
+    roi is an optional (regions, parse_fn, oem, psm) tuple for header-region OCR,
+    confidence an optional (oem, psm, min_confidence) tuple for OCR with weak-field re-reads.
+    """
+    scale = dpi / 72
+    matrix = fitz.Matrix(scale, scale)
+    page = _worker_doc.load_page(page_idx)
+    img = None
+    try:
+        img = render_page_to_image(page, matrix)
+        img = preprocess(img)
+        if roi is not None:
+            regions, parse_fn, oem, psm = roi
+            return ocr_page_roi(img, regions, parse_fn, lang, oem, psm, page_idx, pdf_path, timeout_sec)
+        if confidence is not None:
+            oem, psm, min_confidence = confidence
+            return ocr_page_with_confidence(img, lang, oem, psm, min_confidence, page_idx, pdf_path, timeout_sec)
+        return run_ocr_on_image(img, lang, ocr_config, page_idx, pdf_path, timeout_sec)
+    finally:
+        if img is not None:
+            try:
+                img.close()
+            except Exception:
+                pass
+
+
+def _create_executor(pdf_path: str, max_workers: int):
+    """Returns (executor, stop_event); setting stop_event aborts the pages the workers are on."""
+    # "spawn" everywhere: forking a process that holds Tk/COM state is unsafe
+    context = multiprocessing.get_context("spawn")
+    stop_event = context.Event()
+    cache = get_ocr_cache()
+    cache_config = (cache.directory, cache.max_bytes // (1024 * 1024)) if cache else None
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(
+            pdf_path, pytesseract.pytesseract.tesseract_cmd, cache_config, get_ocr_engine_name(), stop_event, tracing_enabled()
+        ),
+    )
+    return executor, stop_event
+
+
+def _stop_executor(executor: concurrent.futures.ProcessPoolExecutor, stop_event):
+    """
+    Shut a pool down after a cancel without waiting for its pages: workers kill their tesseract
+    on stop_event, and any worker still busy after CANCEL_GRACE_SEC (e.g. in-process tesserocr)
+    is terminated.
+    """
+    stop_event.set()
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.join(CANCEL_GRACE_SEC)
+        if process.is_alive():
+            logging.info(f"Terminating OCR worker {process.pid} after cancel")
+            process.terminate()
+            process.join()
+
+
+@contextmanager
+def shared_ocr_pool(pdf_path: str, workers: int, page_count: int):
+    """
+    Keep one worker pool open for pdf_path while the block runs, so repeated
+    ocr_pages_parallel calls (e.g. streaming page windows) do not respawn workers.
+    Configure the OCR cache and engine before entering: workers copy them at startup.
+    """
+    global _shared_pool
+    max_workers = resolve_worker_count(workers, page_count)
+    if max_workers <= 1:
+        yield
+        return
+
+    executor, stop_event = _create_executor(pdf_path, max_workers)
+    _shared_pool = (pdf_path, executor, stop_event)
+    try:
+        yield
+    finally:
+        _shared_pool = None
+        if stop_event.is_set():
+            _stop_executor(executor, stop_event)
+        else:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def ocr_pages_parallel(
+    pdf_path: str,
+    page_numbers: list[int],
+    lang: str,
+    ocr_config: str,
+    dpi: int,
+    timeout_sec: int,
+    workers: int,
+    on_progress=None,
+    cancel_flag=None,
+    roi=None,
+    preprocess=preprocess_for_ocr,
+    confidence=None,
+) -> list:
+    """
+    OCR the given pages (1-based) in a pool of worker processes.
+    Returns texts in page order ((text, confidence) pairs with confidence, see _render_and_ocr). On cancel, the pages in flight are aborted (their tesseract
+    processes killed) and the texts of the leading pages that finished are returned.
+    """
+    total = len(page_numbers)
+    results: dict[int, str] = {}
+    cache = get_ocr_cache()
+
+    shared = _shared_pool is not None and _shared_pool[0] == pdf_path
+    if shared:
+        _, executor, stop_event = _shared_pool
+    else:
+        executor, stop_event = _create_executor(pdf_path, resolve_worker_count(workers, total))
+    futures = {}
+    try:
+        futures = {
+            executor.submit(
+                _ocr_page_in_worker, page_idx, pdf_path, lang, ocr_config, dpi, timeout_sec, roi, preprocess, confidence
+            ): page_idx
+            for page_idx in page_numbers
+        }
+        pending = set(futures)
+        while pending:
+            if cancel_flag and cancel_flag.is_set():
+                logging.info("OCR process cancelled by user.")
+                stop_event.set()
+                break
+
+            done, pending = concurrent.futures.wait(
+                pending, timeout=POLL_INTERVAL_SEC, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                page_idx = futures[future]
+                try:
+                    results[page_idx], cache_hits, cache_misses, spans = future.result()
+                except Cancelled:
+                    continue  # aborted by stop_event, the loop exits on the next check
+                add_spans(spans)
+                if cache is not None:
+                    cache.add_stats(cache_hits, cache_misses)
+                logging.info(f"OCR finished page {page_idx} of '{pdf_path}' ({len(results)}/{total})")
+                if on_progress:
+                    try:
+                        on_progress(len(results), total)
+                    except Exception:
+                        logging.debug("on_progress callback raised an exception:", exc_info=True)
+    finally:
+        if shared:
+            for future in futures:
+                future.cancel()  # drop queued pages, the pool itself stays up
+        elif stop_event.is_set():
+            _stop_executor(executor, stop_event)
+        else:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    # Keep page order; stop at the first page that did not finish
+    texts = []
+    for page_idx in page_numbers:
+        if page_idx not in results:
+            break
+        texts.append(results[page_idx])
+    return texts
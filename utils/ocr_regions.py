@@ -0,0 +1,266 @@
+import logging
+from dataclasses import dataclass
+from PIL import Image
+
+from src.data_classes import ValidationError, Cancelled
+from utils.ocr_helper import run_ocr_on_image
+from utils.ocr_runner import ocr_image_to_data
+
+# Header labels the invoice parser needs, with a Tesseract config tuned per field
+FIELD_OCR_CONFIGS = {
+    "aadress": "--psm 6",  # label line + possible continuation line
+    "periood": "--psm 7",  # single line
+    "kuupäev": "--psm 7 -c tessedit_char_whitelist=Kuupäev0123456789.:-",
+}
+CONFIG_REGION_NAME = "header"
+CONFIG_REGION_OCR = "--psm 6"
+
+# Vertical padding around a learned label line, in line heights
+LINE_PADDING = 1.0
+
+# Confidence mode: fields whose value tokens are checked, label -> value may continue on the next line
+CONFIDENCE_FIELDS = {"aadress": True, "periood": False}
+# Weak tokens are cropped with this much padding (in line heights) and enlarged before the second pass
+RETRY_PADDING = 0.3
+RETRY_SCALE = 2
+
+
+@dataclass(frozen=True)
+class Region:
+    name: str
+    box: tuple[float, float, float, float]  # x0, y0, x1, y1 as fractions of the page size
+    config: str
+
+    def pixel_box(self, width: int, height: int) -> tuple[int, int, int, int]:
+        x0, y0, x1, y1 = self.box
+        return (int(x0 * width), int(y0 * height), int(round(x1 * width)), int(round(y1 * height)))
+
+
+@dataclass
+class HeaderRegions:
+    """
+    The header regions of one OCR job, shared by all of its calls (streaming windows, DPI tiers):
+    set from HEADER_CROP, or learned once from the first page that parses. They are page
+    fractions, so they hold at every DPI.
+    """
+    regions: list[Region] | None = None
+
+
+def regions_from_config(value: str) -> list[Region] | None:
+    """
+    Parse a config crop "x0,y0,x1,y1" (fractions of the page) into a single header region.
+    Returns None if the value is empty.
+    """
+    if not value or not value.strip():
+        return None
+    try:
+        box = tuple(float(part) for part in value.split(","))
+    except ValueError:
+        raise ValidationError(f"Vigane HEADER_CROP väärtus: '{value}'")
+    if len(box) != 4 or not (0 <= box[0] < box[2] <= 1 and 0 <= box[1] < box[3] <= 1):
+        raise ValidationError(f"Vigane HEADER_CROP väärtus: '{value}'")
+    return [Region(CONFIG_REGION_NAME, box, CONFIG_REGION_OCR)]
+
+
+def _group_words_into_lines(data: dict) -> list[dict]:
+    """
+    Group image_to_data word entries into lines with text and bounding box.
+    Each line also keeps its words' confidences (-1 if unknown) and boxes.
+    """
+    lines: dict[tuple, dict] = {}
+    confs = data.get("conf")
+    for i, word in enumerate(data["text"]):
+        if not word or not word.strip():
+            continue
+        key = (data["page_num"][i], data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        left, top = data["left"][i], data["top"][i]
+        right, bottom = left + data["width"][i], top + data["height"][i]
+        conf = float(confs[i]) if confs is not None else -1.0
+        line = lines.get(key)
+        if line is None:
+            lines[key] = {
+                "words": [word], "confs": [conf], "boxes": [(left, top, right, bottom)],
+                "left": left, "top": top, "right": right, "bottom": bottom,
+            }
+        else:
+            line["words"].append(word)
+            line["confs"].append(conf)
+            line["boxes"].append((left, top, right, bottom))
+            line["left"] = min(line["left"], left)
+            line["top"] = min(line["top"], top)
+            line["right"] = max(line["right"], right)
+            line["bottom"] = max(line["bottom"], bottom)
+    return sorted(lines.values(), key=lambda line: (line["top"], line["left"]))
+
+
+def ocr_page_with_boxes(img: Image.Image, lang: str, ocr_config: str, timeout_sec: int):
+    """
+    Full-page OCR that also returns word boxes.
+    Returns (text, data) where text is rebuilt line by line like image_to_string.
+    """
+    data = ocr_image_to_data(img, lang, ocr_config, timeout_sec)
+    text = "\n".join(" ".join(line["words"]) for line in _group_words_into_lines(data))
+    return text, data
+
+
+def learn_header_regions(data: dict, width: int, height: int) -> list[Region] | None:
+    """
+    Derive one crop per header field from the word boxes of a page that parsed successfully.
+    Returns None if any label is missing from the boxes.
+    """
+    lines = _group_words_into_lines(data)
+    regions = []
+    for label, config in FIELD_OCR_CONFIGS.items():
+        line = next((l for l in lines if label in " ".join(l["words"]).lower()), None)
+        if line is None:
+            logging.info(f"Header label '{label}' not found in word boxes, cannot learn regions")
+            return None
+
+        line_height = max(1, line["bottom"] - line["top"])
+        top = line["top"] - LINE_PADDING * line_height
+        bottom = line["bottom"] + LINE_PADDING * line_height
+        if label == "aadress":
+            bottom += line_height * 1.5  # address may continue on the next line
+        regions.append(
+            Region(
+                label,
+                (
+                    max(0.0, (line["left"] - line_height) / width),
+                    max(0.0, top / height),
+                    1.0,  # values sit to the right of the label
+                    min(1.0, bottom / height),
+                ),
+                config,
+            )
+        )
+    return regions
+
+
+def ocr_regions(img: Image.Image, regions: list[Region], lang: str, oem: int, page_index: int, pdf_path: str, timeout_sec: int) -> str:
+    """OCR only the given regions of a page image and join their texts line-wise."""
+    texts = []
+    for region in regions:
+        crop = img.crop(region.pixel_box(*img.size))
+        try:
+            texts.append(
+                run_ocr_on_image(crop, lang, f"--oem {oem} {region.config}", page_index, pdf_path, timeout_sec)
+            )
+        finally:
+            crop.close()
+    return "\n".join(texts)
+
+
+def regions_pixel_share(regions: list[Region]) -> float:
+    """Fraction of the page area covered by the regions (for logging)."""
+    return sum((r.box[2] - r.box[0]) * (r.box[3] - r.box[1]) for r in regions)
+
+
+def ocr_page_roi(img: Image.Image, regions: list[Region], parse_fn, lang: str, oem: int, psm: int, page_index: int, pdf_path: str, timeout_sec: int) -> str:
+    """
+    OCR the header regions of a page; if parse_fn rejects the result, OCR the full page instead.
+    """
+    text = ocr_regions(img, regions, lang, oem, page_index, pdf_path, timeout_sec)
+    try:
+        parse_fn(text)
+        return text
+    except ValidationError as e:
+        logging.info(f"Header crop parse failed on page {page_index} ({e}), using full-page OCR")
+    return run_ocr_on_image(img, lang, f"--oem {oem} --psm {psm}", page_index, pdf_path, timeout_sec)
+
+
+def _field_spans(lines: list[dict], label: str, with_continuation: bool) -> list[tuple[int, list[int]]]:
+    """(line index, word indexes) of a header field's value tokens; empty if the label is missing."""
+    for line_idx, line in enumerate(lines):
+        label_at = next((i for i, word in enumerate(line["words"]) if word.lower().startswith(label)), None)
+        if label_at is None:
+            continue
+        spans = [(line_idx, list(range(label_at + 1, len(line["words"]))))]
+        if with_continuation and line_idx + 1 < len(lines):
+            next_line = lines[line_idx + 1]
+            # Same rule as the address field spec: a following line with digits belongs to the address
+            if any(ch.isdigit() for ch in " ".join(next_line["words"])):
+                spans.append((line_idx + 1, list(range(len(next_line["words"])))))
+        return spans
+    return []
+
+
+def _mean_confidence(confs: list[float]) -> float | None:
+    known = [conf for conf in confs if conf >= 0]
+    return sum(known) / len(known) if known else None
+
+
+def _retry_weak_tokens(img: Image.Image, line: dict, first: int, last: int, lang: str, oem: int, timeout_sec: int) -> bool:
+    """
+    OCR words first..last of a line again on a tight, enlarged crop (single word/line mode).
+    The line is updated in place if the new read is more confident; returns True if it was.
+    """
+    boxes = line["boxes"][first:last + 1]
+    pad = int(max(box[3] - box[1] for box in boxes) * RETRY_PADDING)
+    crop_box = (
+        max(0, min(box[0] for box in boxes) - pad),
+        max(0, min(box[1] for box in boxes) - pad),
+        min(img.width, max(box[2] for box in boxes) + pad),
+        min(img.height, max(box[3] for box in boxes) + pad),
+    )
+    crop = img.crop(crop_box).convert("L")
+    try:
+        crop = crop.resize((crop.width * RETRY_SCALE, crop.height * RETRY_SCALE), Image.LANCZOS)
+        psm = 8 if first == last else 7
+        data = ocr_image_to_data(crop, lang, f"--oem {oem} --psm {psm}", timeout_sec)
+    finally:
+        crop.close()
+
+    words = [(word, float(conf)) for word, conf in zip(data["text"], data["conf"]) if word and word.strip()]
+    old = _mean_confidence(line["confs"][first:last + 1])
+    new = _mean_confidence([conf for _, conf in words])
+    if not words or new is None or (old is not None and new <= old):
+        return False
+
+    line["words"][first:last + 1] = [word for word, _ in words]
+    line["confs"][first:last + 1] = [conf for _, conf in words]
+    # The retry crop has no page coordinates; every new word gets the span's box
+    line["boxes"][first:last + 1] = [crop_box] * len(words)
+    return True
+
+
+def ocr_page_with_confidence(img: Image.Image, lang: str, oem: int, psm: int, min_confidence: float, page_index: int, pdf_path: str, timeout_sec: int):
+    """
+    Full-page OCR with word confidences. Address (with apartment) and period tokens below
+    min_confidence are OCR'd again on a tight crop instead of redoing the page.
+    Returns (text, confidence): confidence is the mean word confidence of the weakest of these
+    fields after the retry, None if they were not found.
+    """
+    config = f"--oem {oem} --psm {psm}"
+    try:
+        data = ocr_image_to_data(img, lang, config, timeout_sec)
+    except Cancelled:
+        raise
+    except Exception as e:
+        logging.error(f"OCR with word boxes failed on page {page_index} of '{pdf_path}': {e}")
+        return run_ocr_on_image(img, lang, config, page_index, pdf_path, timeout_sec), None
+
+    lines = _group_words_into_lines(data)
+    field_confidences = []
+    for label, with_continuation in CONFIDENCE_FIELDS.items():
+        spans = _field_spans(lines, label, with_continuation)
+        for line_idx, indexes in spans:
+            line = lines[line_idx]
+            weak = [i for i in indexes if 0 <= line["confs"][i] < min_confidence]
+            if not weak:
+                continue
+            try:
+                if _retry_weak_tokens(img, line, weak[0], weak[-1], lang, oem, timeout_sec):
+                    logging.info(f"Re-read weak '{label}' tokens on page {page_index} of '{pdf_path}'")
+            except Cancelled:
+                raise
+            except Exception as e:
+                logging.error(f"Re-OCR of '{label}' failed on page {page_index} of '{pdf_path}': {e}")
+
+        # Spans again: a retry may have changed the number of words
+        confs = [lines[line_idx]["confs"][i] for line_idx, indexes in _field_spans(lines, label, with_continuation) for i in indexes]
+        confidence = _mean_confidence(confs)
+        if confidence is not None:
+            field_confidences.append(confidence)
+
+    text = "\n".join(" ".join(line["words"]) for line in lines)
+    return text, (round(min(field_confidences), 1) if field_confidences else None)
@@ -0,0 +1,169 @@
+import os, sys, json, time, shlex, logging, threading, subprocess
+from PIL import Image
+import pytesseract
+from pytesseract import pytesseract as tesseract_api
+
+from src.data_classes import Cancelled
+from utils.tracing import traced
+from utils.ocr_cache import get_ocr_cache, KIND_DATA
+from utils.ocr_engines import ENGINE_TESSEROCR, get_ocr_engine_name, get_tesserocr_engine, parse_ocr_config
+
+# How often a running Tesseract is checked for cancellation and its deadline
+POLL_INTERVAL_SEC = 0.1
+
+# A page always gets at least this long, even when the job deadline has run out
+MIN_PAGE_TIMEOUT_SEC = 5
+
+# Event that aborts running OCR (the GUI cancel_event, or the pool's stop event in workers)
+_cancel_event = None
+
+# Tesseract processes started by this process and not finished yet
+_processes: set[subprocess.Popen] = set()
+_processes_lock = threading.Lock()
+
+
+def configure_ocr_cancel(event) -> None:
+    """Set the process-wide event that kills in-flight Tesseract runs when it fires."""
+    global _cancel_event
+    _cancel_event = event
+
+
+def is_ocr_cancelled() -> bool:
+    return _cancel_event is not None and _cancel_event.is_set()
+
+
+def kill_running_ocr() -> int:
+    """Kill every Tesseract process this process is waiting on; returns how many were running."""
+    with _processes_lock:
+        running = list(_processes)
+    for proc in running:
+        _kill(proc)
+    return len(running)
+
+
+def _kill(proc: subprocess.Popen):
+    try:
+        proc.kill()
+        proc.wait()
+    except Exception:
+        logging.debug("Failed to kill Tesseract process", exc_info=True)
+
+
+def _wait_for_tesseract(proc: subprocess.Popen, timeout_sec: float) -> bytes:
+    """Wait for proc in short slices; kill it on cancel (raises Cancelled) or timeout (raises RuntimeError)."""
+    deadline = time.monotonic() + timeout_sec if timeout_sec else None
+    while True:
+        try:
+            _, error_string = proc.communicate(timeout=POLL_INTERVAL_SEC)
+            return error_string
+        except subprocess.TimeoutExpired:
+            pass
+        if is_ocr_cancelled():
+            _kill(proc)
+            raise Cancelled("OCR cancelled by user.")
+        if deadline is not None and time.monotonic() >= deadline:
+            _kill(proc)
+            raise RuntimeError(f"Timeout: Tesseract did not finish in {timeout_sec} seconds")
+
+
+@traced("ocr")
+def run_tesseract(img: Image.Image, lang: str, config: str, timeout_sec: float, extension: str = "txt") -> str:
+    """
+    Run the tesseract executable on img like pytesseract does, but as a tracked child process
+    that is killed as soon as the cancel event fires. Returns the decoded output file.
+    """
+    if is_ocr_cancelled():
+        raise Cancelled("OCR cancelled by user.")
+
+    not_windows = sys.platform != "win32"
+    with tesseract_api.save(img) as (temp_name, input_filename):
+        args = [tesseract_api.tesseract_cmd, input_filename, temp_name, "-l", lang]
+        args += shlex.split(config, posix=not_windows)
+        if extension != "tsv":  # tsv output is switched on with -c tessedit_create_tsv=1
+            args.append(extension)
+
+        try:
+            proc = subprocess.Popen(args, **tesseract_api.subprocess_args())
+        except FileNotFoundError:
+            raise pytesseract.TesseractNotFoundError()
+
+        with _processes_lock:
+            _processes.add(proc)
+        try:
+            error_string = _wait_for_tesseract(proc, timeout_sec)
+        finally:
+            with _processes_lock:
+                _processes.discard(proc)
+            for stream in (proc.stdin, proc.stdout, proc.stderr):
+                if stream is not None:
+                    stream.close()
+
+        if proc.returncode:
+            raise pytesseract.TesseractError(proc.returncode, tesseract_api.get_errors(error_string))
+        with open(f"{temp_name}{os.extsep}{extension}", "rb") as f:
+            return f.read().decode("utf-8")
+
+
+def ocr_image_to_string(img: Image.Image, lang: str, config: str, timeout_sec: float) -> str:
+    """Cancellable pytesseract.image_to_string."""
+    return run_tesseract(img, lang, config, timeout_sec)
+
+
+@traced("ocr")
+def _tesserocr_image_to_data(img: Image.Image, lang: str, config: str, timeout_sec: float) -> dict:
+    """image_to_data through the long-lived in-process Tesseract instance for this lang/oem."""
+    if is_ocr_cancelled():
+        raise Cancelled("OCR cancelled by user.")
+    oem, psm, variables = parse_ocr_config(config)
+    engine = get_tesserocr_engine(lang, oem, tesseract_api.tesseract_cmd)
+    return engine.data(img, psm, variables, timeout_sec)
+
+
+def ocr_image_to_data(img: Image.Image, lang: str, config: str, timeout_sec: float) -> dict:
+    """
+    pytesseract.image_to_data(output_type=Output.DICT) with the configured OCR engine
+    (cancellable when it is the tesseract executable), through the OCR cache.
+    """
+    cache = get_ocr_cache()
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.make_key(img, lang, config, kind=KIND_DATA)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)
+
+    if get_ocr_engine_name() == ENGINE_TESSEROCR:
+        data = _tesserocr_image_to_data(img, lang, config, timeout_sec)
+    else:
+        tsv = run_tesseract(img, lang, f"-c tessedit_create_tsv=1 {config.strip()}", timeout_sec, extension="tsv")
+        data = tesseract_api.file_to_dict(tsv, "\t", -1)
+    if cache_key is not None:
+        cache.put(cache_key, json.dumps(data))
+    return data
+
+
+class OcrDeadline:
+    """
+    Time budget for a whole OCR job. The time left is shared out over the pages left
+    (times the number of pages OCR'd at once), so one slow page cannot eat the whole batch.
+    """
+
+    def __init__(self, budget_sec: float, page_timeout_sec: int, workers: int = 1):
+        self.budget_sec = budget_sec
+        self.page_timeout_sec = page_timeout_sec
+        self.workers = max(1, workers)
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + budget_sec if budget_sec > 0 else None
+
+    def remaining(self) -> float | None:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def page_timeout(self, pages_left: int) -> int:
+        """Per-page Tesseract timeout for the next pages, never above the configured page timeout."""
+        remaining = self.remaining()
+        if remaining is None:
+            return self.page_timeout_sec
+        share = remaining * self.workers / max(1, pages_left)
+        return int(max(MIN_PAGE_TIMEOUT_SEC, min(self.page_timeout_sec, share)))
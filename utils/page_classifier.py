@@ -0,0 +1,123 @@
+import hashlib
+from collections import Counter
+import fitz
+import numpy as np
+from PIL import Image
+
+from src.data_classes import ValidationError
+from utils.ocr_helper import render_page_to_image
+from utils.pdf_document import SourceDocument
+from utils.tracing import traced
+
+# Page classes
+PAGE_INVOICE = "invoice"
+PAGE_BLANK = "blank"  # separator pages, nothing printed
+PAGE_DUPLICATE = "duplicate"  # exact repeat of an earlier page, or a near repeat of a non-invoice page
+PAGE_NON_INVOICE = "non_invoice"  # e.g. terms and conditions: no "Aadress" label after OCR
+PAGE_CONTINUATION = "continuation"  # later page of a multi-page invoice
+
+# What to do with a page of a class other than invoice
+POLICY_SKIP = "skip"  # leave the page out, count it in the summary
+POLICY_PROCESS = "process"  # treat it like any other page (no check)
+POLICY_ERROR = "error"  # stop the job with a message naming the page
+PAGE_POLICIES = (POLICY_SKIP, POLICY_PROCESS, POLICY_ERROR)
+
+# Pages are checked at this resolution, far below OCR DPI
+CLASSIFY_DPI = 36
+# Gray level below which a pixel counts as ink; small text is only light gray at CLASSIFY_DPI
+INK_LEVEL = 200
+# Perceptual hash grid: HASH_SIZE x HASH_SIZE bits
+HASH_SIZE = 16
+
+
+def check_page_policy(name: str, value: str) -> str:
+    if value not in PAGE_POLICIES:
+        raise ValidationError(f"Vigane {name} väärtus: '{value}' (lubatud: {', '.join(PAGE_POLICIES)})")
+    return value
+
+
+def ink_ratio(img: Image.Image) -> float:
+    """Share of pixels dark enough to be print."""
+    pixels = np.asarray(img.convert("L"))
+    return float(np.count_nonzero(pixels < INK_LEVEL)) / max(1, pixels.size)
+
+
+def difference_hash(img: Image.Image, size: int = HASH_SIZE) -> int:
+    """dHash: one bit per horizontally adjacent pixel pair of a (size+1) x size thumbnail."""
+    thumb = img.convert("L").resize((size + 1, size), Image.BILINEAR)
+    pixels = np.asarray(thumb, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+
+def content_hash(document: SourceDocument, page_number: int) -> str:
+    """
+    Hash of what the page draws: its content streams, the content of every Form XObject it
+    draws (nested ones too), and the raw data of its images. Merged or imposed PDFs (e.g. pages
+    built with show_pdf_page) draw everything through a form, their page content is the same
+    "/fzFrm0 Do" on every page.
+    """
+    page = document.load_page(page_number)
+    digest = hashlib.sha1(page.read_contents())
+    for xref, name, _invoker, _bbox in page.get_xobjects():
+        digest.update(name.encode("utf-8"))
+        digest.update(document.doc.xref_stream(xref) or b"")
+    for image in page.get_images(full=True):
+        digest.update(document.doc.xref_stream_raw(image[0]) or b"")
+    return digest.hexdigest()
+
+
+class PageClassifier:
+    """
+    Cheap per-page checks run before the text layer is read or a page is OCR'd.
+    Remembers the pages seen so far, so it must see the pages of one document in order.
+    """
+
+    def __init__(self, document: SourceDocument, blank_ink_ratio: float, duplicate_distance: int, find_duplicates: bool = True):
+        self.document = document
+        self.blank_ink_ratio = blank_ink_ratio
+        self.duplicate_distance = duplicate_distance
+        self.find_duplicates = find_duplicates  # False: only blank pages are looked for, no page is hashed
+        self.counts = Counter()
+        self._content_pages: dict[str, int] = {}
+        self._page_hashes: dict[int, int] = {}
+        self._non_invoice_hashes: list[tuple[int, int]] = []
+
+    @traced("classify")
+    def classify(self, page_number: int) -> tuple[str, int | None]:
+        """Returns (page class, earlier page it duplicates or None)."""
+        scale = CLASSIFY_DPI / 72
+        img = render_page_to_image(self.document.load_page(page_number), fitz.Matrix(scale, scale))
+        try:
+            if ink_ratio(img) < self.blank_ink_ratio:
+                return PAGE_BLANK, None
+            if not self.find_duplicates:
+                return PAGE_INVOICE, None
+
+            key = content_hash(self.document, page_number)
+            original = self._content_pages.setdefault(key, page_number)
+            if original != page_number:
+                return PAGE_DUPLICATE, original
+
+            # Near repeats only of known non-invoice pages: invoices from one template
+            # differ in a few digits and would look alike to any perceptual hash
+            page_hash = difference_hash(img)
+            self._page_hashes[page_number] = page_hash
+            for known_hash, known_page in self._non_invoice_hashes:
+                if bin(page_hash ^ known_hash).count("1") <= self.duplicate_distance:
+                    return PAGE_DUPLICATE, known_page
+            return PAGE_INVOICE, None
+        finally:
+            img.close()
+
+    def mark_non_invoice(self, page_number: int):
+        """Remember a page that turned out not to be an invoice, so its repeats are caught early."""
+        if page_number in self._page_hashes:
+            self._non_invoice_hashes.append((self._page_hashes[page_number], page_number))
+
+    def count(self, page_class: str):
+        self.counts[page_class] += 1
+
+    def summary(self) -> str:
+        classes = (PAGE_INVOICE, PAGE_CONTINUATION, PAGE_BLANK, PAGE_DUPLICATE, PAGE_NON_INVOICE)
+        return ", ".join(f"{page_class}={self.counts[page_class]}" for page_class in classes)
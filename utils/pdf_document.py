@@ -0,0 +1,121 @@
+import os, mmap, logging
+from dataclasses import dataclass
+from pathlib import Path
+import fitz
+
+from utils.tracing import traced
+
+
+class SourceDocument:
+    """
+    The input PDF, parsed once by PyMuPDF from a memory-mapped buffer.
+    Shared by text-layer reading, OCR rendering and splitting into per-apartment files.
+    """
+
+    def __init__(self, pdf_path: str):
+        self.path = str(pdf_path)
+        self._file = open(self.path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+            # MuPDF reads straight from the mapping, the file is never copied into memory
+            self.doc = fitz.open(stream=self._view, filetype="pdf")
+        except Exception:
+            self._file.close()
+            raise
+
+    @property
+    def page_count(self) -> int:
+        return self.doc.page_count
+
+    def load_page(self, page_number: int) -> fitz.Page:
+        """Page by 1-based number."""
+        return self.doc.load_page(page_number - 1)
+
+    def page(self, page_number: int) -> "SourcePage":
+        """Lightweight handle for InvoiceItem.pdf_page, resolved only when the invoice is written."""
+        return SourcePage(self, page_number)
+
+    def outline(self) -> list[tuple[int, str, int]]:
+        """Bookmarks as (level, title, 1-based page), page is -1 for entries without a target."""
+        return [(level, title, page) for level, title, page in self.doc.get_toc(simple=True)]
+
+    def page_label(self, page_number: int) -> str:
+        """The page's label from the PDF's page label ranges, empty if it has none."""
+        return self.load_page(page_number).get_label() or ""
+
+    def page_text(self, page_number: int) -> str:
+        # sort=True keeps "Aadress: ..." label and value on one line
+        return self.load_page(page_number).get_text("text", sort=True) or ""
+
+    @traced("pdf_write")
+    def write_pages(self, page_numbers: list[int], out_path: Path, optimize: bool = False, subset_fonts: bool = False) -> int:
+        """
+        Copy the given 1-based pages, as consecutive runs, into a new PDF at out_path.
+        optimize drops unused/duplicate objects and compresses streams, subset_fonts keeps
+        only the glyphs the pages use. Returns the number of bytes written.
+        """
+        out = fitz.open()
+        try:
+            for first, last in _page_runs(page_numbers):
+                out.insert_pdf(self.doc, from_page=first - 1, to_page=last - 1)
+            if subset_fonts:
+                try:
+                    out.subset_fonts()
+                except Exception:
+                    # Needs fontTools; the file is still valid without subsetting
+                    logging.debug(f"Font subsetting failed for {out_path}", exc_info=True)
+            if optimize:
+                out.save(str(out_path), garbage=3, deflate=True, deflate_images=True, deflate_fonts=True, clean=True)
+            else:
+                out.save(str(out_path))
+        finally:
+            out.close()
+        return os.path.getsize(out_path)
+
+    def close(self):
+        if self.doc is None:
+            return
+        self.doc.close()
+        self.doc = None
+        try:
+            self._view.release()
+            self._mmap.close()
+        except BufferError:
+            logging.debug("PDF mapping still in use, left to garbage collection", exc_info=True)
+        self._file.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@dataclass(frozen=True)
+class SourcePage:
+    document: SourceDocument
+    number: int  # 1-based
+    continuation: tuple[int, ...] = ()  # following pages of a multi-page invoice
+
+    @property
+    def page_numbers(self) -> list[int]:
+        """All pages of the invoice, first page first."""
+        return [self.number, *self.continuation]
+
+
+def _page_runs(page_numbers: list[int]) -> list[tuple[int, int]]:
+    """Collapse sorted page numbers into (first, last) runs: [1, 2, 3, 7] -> [(1, 3), (7, 7)]."""
+    runs = []
+    for number in page_numbers:
+        if runs and number == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], number)
+        else:
+            runs.append((number, number))
+    return runs
@@ -0,0 +1,61 @@
+"""
+Splitting one PDF printed from several sheets back into one file per sheet.
+Excel prints selected sheets one after another in tab order, so knowing how many pages each
+sheet prints is enough to tell which pages of the combined PDF belong to which sheet.
+"""
+from pathlib import Path
+
+from src.data_classes import OutputSettings
+from utils.pdf_document import SourceDocument
+from utils.pdf_writer import InvoicePdfWriter
+
+
+def build_page_map(page_counts: list[tuple[str, int]]) -> list[tuple[str, list[int]]]:
+    """
+    [(sheet name, pages printed)] in print order -> [(sheet name, its 1-based pages in the combined PDF)].
+    Raises ValueError for a sheet without pages: nothing in the combined PDF would mark where it is.
+    """
+    page_map = []
+    next_page = 1
+    for name, count in page_counts:
+        if count < 1:
+            raise ValueError(f"Sheet '{name}' prints no pages")
+        page_map.append((name, list(range(next_page, next_page + count))))
+        next_page += count
+    return page_map
+
+
+def page_map_total(page_map: list[tuple[str, list[int]]]) -> int:
+    return sum(len(pages) for _name, pages in page_map)
+
+
+def _comparable(text: str) -> str:
+    return " ".join(text.split()).casefold()
+
+
+def split_pdf_by_page_map(
+    pdf_path: Path,
+    page_map: list[tuple[str, list[int]]],
+    out_paths: dict[str, Path],
+    settings: OutputSettings = OutputSettings(),
+    on_written=None,
+    first_page_texts: dict[str, str] = None,
+) -> dict[Path, int]:
+    """
+    Write each sheet's pages of pdf_path to out_paths[sheet name]; returns bytes written per file.
+    Raises ValueError, before writing anything, if the PDF does not have exactly the mapped pages
+    (e.g. Excel's page count and the printed pages disagree), or if a sheet's first page does not
+    contain its first_page_texts entry (e.g. its address): then pages have moved between sheets.
+    """
+    with SourceDocument(pdf_path) as document:
+        expected = page_map_total(page_map)
+        if document.page_count != expected:
+            raise ValueError(f"'{pdf_path}' has {document.page_count} pages, the sheets print {expected}")
+        for name, pages in page_map:
+            text = (first_page_texts or {}).get(name)
+            if text and _comparable(text) not in _comparable(document.page_text(pages[0])):
+                raise ValueError(f"Page {pages[0]} of '{pdf_path}' is not the first page of sheet '{name}'")
+        with InvoicePdfWriter(document, settings, on_written=on_written) as writer:
+            for name, pages in page_map:
+                writer.submit(pages, out_paths[name])
+        return writer.sizes
@@ -0,0 +1,105 @@
+import logging, concurrent.futures
+import multiprocessing
+from pathlib import Path
+
+from src.data_classes import OutputSettings
+from utils.logging_helper import log_line
+from utils.pdf_document import SourceDocument
+from utils.tracing import configure_tracing, tracing_enabled, drain_spans, add_spans
+
+# Per-process source document, opened once by _init_writer
+_writer_doc = None
+
+
+def _init_writer(pdf_path: str, tracing: bool = False):
+    global _writer_doc
+    _writer_doc = SourceDocument(pdf_path)
+    configure_tracing(tracing)
+
+
+def _write_in_worker(page_numbers: list[int], out_path: str, optimize: bool, subset_fonts: bool) -> tuple[int, list]:
+    """Returns (bytes written, trace spans of the write)."""
+    size = _writer_doc.write_pages(page_numbers, Path(out_path), optimize=optimize, subset_fonts=subset_fonts)
+    return size, drain_spans()
+
+
+class InvoicePdfWriter:
+    """
+    Writes per-apartment PDFs cut from one source document.
+    With settings.writers > 1 files are written concurrently by a bounded pool of processes
+    (MuPDF documents cannot be shared between threads), otherwise in the calling thread. The pool
+    opens the source PDF again in every process and costs more than it saves on a few dozen
+    one-page invoices, so it is only used when WRITERS asks for it.
+    on_written(out_path) is called once a file is complete: in the calling thread with one writer,
+    from a thread of the executor otherwise, while the caller may still be submitting. It may
+    record in a JobManifest (locked) and set fields of an invoice no other thread is writing;
+    it must not touch Tk widgets (post to the GUI with parent.after) or other unlocked shared state.
+    """
+
+    def __init__(self, document: SourceDocument, settings: OutputSettings, on_written=None):
+        self.document = document
+        self.settings = settings
+        self.on_written = on_written
+        self.sizes: dict[Path, int] = {}
+        self._futures: dict[concurrent.futures.Future, Path] = {}
+        self._executor = None
+        if settings.writers > 1:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=settings.writers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_writer,
+                initargs=(document.path, tracing_enabled()),
+            )
+
+    def submit(self, page_numbers: list[int], out_path: Path):
+        """Queue (or write right away) the given 1-based source pages as out_path."""
+        out_path = Path(out_path)
+        if self._executor is None:
+            self.sizes[out_path] = self.document.write_pages(
+                page_numbers, out_path, optimize=self.settings.optimize, subset_fonts=self.settings.subset_fonts
+            )
+            if self.on_written is not None:
+                self.on_written(out_path)
+            return
+        future = self._executor.submit(
+            _write_in_worker, list(page_numbers), str(out_path), self.settings.optimize, self.settings.subset_fonts
+        )
+        self._futures[future] = out_path
+        if self.on_written is not None:
+            future.add_done_callback(self._notify_written)
+
+    def _notify_written(self, future: concurrent.futures.Future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        try:
+            self.on_written(self._futures[future])
+        except Exception:
+            logging.warning("on_written callback failed", exc_info=True)
+
+    def close(self, cancel: bool = False) -> dict[Path, int]:
+        """Wait for queued files (or drop them if cancel) and log bytes written per file and in total."""
+        if self._executor is not None:
+            try:
+                if not cancel:
+                    for future in concurrent.futures.as_completed(self._futures):
+                        self.sizes[self._futures[future]], spans = future.result()
+                        add_spans(spans)
+            finally:
+                self._executor.shutdown(wait=True, cancel_futures=cancel)
+                self._executor = None
+
+        for path, size in self.sizes.items():
+            logging.info(f"Wrote {path.name}: {size} bytes")
+        if self.sizes:
+            total = sum(self.sizes.values())
+            log_line(
+                f"Wrote {len(self.sizes)} invoice PDFs, {total} bytes total "
+                f"(optimize={self.settings.optimize}, subset_fonts={self.settings.subset_fonts})"
+            )
+        return self.sizes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(cancel=exc_type is not None)
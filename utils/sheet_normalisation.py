@@ -0,0 +1,51 @@
+"""
+Preparing a "Korter N" sheet for PDF export with as few COM calls as possible: one read of the
+used range, then at most one row-range delete and one print-area assignment. The helpers this
+replaced cost two Cells.Find calls twice and one Rows(n).Delete() per forbidden row.
+"""
+import logging
+
+from src.data_classes import SheetNormalisation
+from utils.excel_sheet_helpers import col_letter
+from utils.sheet_snapshot import SheetSnapshot, normalize_label
+
+
+def _has_content(value) -> bool:
+    return value is not None and (not isinstance(value, str) or value.strip() != "")
+
+
+def plan_sheet_normalisation(snapshot: SheetSnapshot, forbidden_labels: list[str], label_col: int = 1) -> SheetNormalisation:
+    """
+    From a snapshot of the used range: the forbidden rows at the end of the content (their label_col
+    holds one of forbidden_labels; bottom-up until the first other row) and the print area
+    A1 to the last remaining content row and column.
+    """
+    content_rows = {}  # row -> last column with content
+    for offset, row_values in enumerate(snapshot.values):
+        columns = [offset_col for offset_col, value in enumerate(row_values) if _has_content(value)]
+        if columns:
+            content_rows[snapshot.first_row + offset] = snapshot.first_col + columns[-1]
+
+    wanted = {normalize_label(label) for label in forbidden_labels}
+    last_row = max(content_rows, default=0)
+    first_deleted = last_row + 1
+    if wanted:
+        while first_deleted - 1 >= snapshot.first_row and normalize_label(snapshot.text(first_deleted - 1, label_col)) in wanted:
+            first_deleted -= 1
+    delete_rows = (first_deleted, last_row) if first_deleted <= last_row else None
+
+    kept = {row: col for row, col in content_rows.items() if row < first_deleted}
+    if not kept:
+        return SheetNormalisation(delete_rows=delete_rows, print_area="$A$1:$A$1")
+    return SheetNormalisation(delete_rows=delete_rows, print_area=f"$A$1:${col_letter(max(kept.values()))}${max(kept)}")
+
+
+def normalise_sheet(worksheet, forbidden_labels: list[str], label_col: int = 1) -> SheetNormalisation:
+    """Read the used range once, then drop the forbidden trailing rows and set the print area."""
+    plan = plan_sheet_normalisation(SheetSnapshot.read_used_range(worksheet), forbidden_labels, label_col)
+    if plan.delete_rows is not None:
+        first, last = plan.delete_rows
+        logging.info(f"Removing rows {first}-{last} because they contain a forbidden label.")
+        worksheet.Rows(f"{first}:{last}").Delete()
+    worksheet.PageSetup.PrintArea = plan.print_area
+    return plan
@@ -0,0 +1,117 @@
+"""
+Worksheet reads without a COM round trip per cell. Every sheet.Cells(row, col).Text on an Excel
+worksheet is a cross-process call; SheetSnapshot reads a whole block (e.g. A1:B50) with one
+Range.Value call and answers label lookups and trailing-row checks from memory.
+Works on anything with the COM worksheet shape (Excel, utils.native_workbook, test fakes).
+"""
+import re
+from datetime import datetime, date, time
+
+from utils.excel_sheet_helpers import col_letter
+
+_ADDRESS_RE = re.compile(r"^\$?([A-Z]+)\$?(\d+)(?::\$?([A-Z]+)\$?(\d+))?$")
+
+
+def column_number(letters: str) -> int:
+    col = 0
+    for letter in letters:
+        col = col * 26 + ord(letter) - ord("A") + 1
+    return col
+
+
+def range_address(first_row: int, first_col: int, last_row: int, last_col: int) -> str:
+    return f"{col_letter(first_col)}{first_row}:{col_letter(last_col)}{last_row}"
+
+
+def parse_range_address(address: str) -> tuple[int, int, int, int]:
+    """"A1:B50" -> (first_row, first_col, last_row, last_col)"""
+    match = _ADDRESS_RE.match(address.strip().upper())
+    if not match:
+        raise ValueError(f"Unsupported range address: {address!r}")
+    first_col, first_row, last_col, last_row = match.groups()
+    if last_col is None:
+        last_col, last_row = first_col, first_row
+    return int(first_row), column_number(first_col), int(last_row), column_number(last_col)
+
+
+def display_text(value) -> str:
+    """
+    Approximation of Excel's cell.Text for the General and date formats used in the invoices:
+    dates as dd.mm.yyyy, whole numbers without ".0".
+    """
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        if value.time() == time(0, 0):
+            return value.strftime("%d.%m.%Y")
+        return value.strftime("%d.%m.%Y %H:%M")
+    if isinstance(value, date):
+        return value.strftime("%d.%m.%Y")
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def normalize_label(label: str) -> str:
+    """ Normalize label for comparison: lowercase, strip whitespace and trailing colon. """
+    norm = "" if label is None else str(label).strip().lower()
+    norm = norm.replace("\xa0", " ") # non-breaking space
+    norm = norm[:-1] if norm.endswith(":") else norm
+    return " ".join(norm.split())
+
+
+class SheetSnapshot:
+    """Values of a rectangular block of a worksheet, addressed with the sheet's 1-based row/col."""
+
+    def __init__(self, values: list[tuple], first_row: int = 1, first_col: int = 1):
+        self.values = values
+        self.first_row = first_row
+        self.first_col = first_col
+
+    @classmethod
+    def read(cls, sheet, last_row: int, last_col: int, first_row: int = 1, first_col: int = 1) -> "SheetSnapshot":
+        """One Range.Value call for first_row..last_row x first_col..last_col."""
+        if last_row < first_row or last_col < first_col:
+            return cls([], first_row, first_col)
+        values = sheet.Range(range_address(first_row, first_col, last_row, last_col)).Value
+        if not isinstance(values, (tuple, list)):
+            values = ((values,),)  # a one-cell range gives the bare value
+        return cls([tuple(row) for row in values], first_row, first_col)
+
+    @classmethod
+    def read_used_range(cls, sheet) -> "SheetSnapshot":
+        """The whole UsedRange with one Range.Value call."""
+        used_range = sheet.UsedRange
+        values = used_range.Value
+        if not isinstance(values, (tuple, list)):
+            values = ((values,),)
+        return cls([tuple(row) for row in values], int(used_range.Row), int(used_range.Column))
+
+    @property
+    def last_row(self) -> int:
+        return self.first_row + len(self.values) - 1
+
+    def value(self, row: int, col: int):
+        """Raw cell value, None outside the block."""
+        r, c = row - self.first_row, col - self.first_col
+        if r < 0 or c < 0 or r >= len(self.values) or c >= len(self.values[r]):
+            return None
+        return self.values[r][c]
+
+    def text(self, row: int, col: int) -> str:
+        return display_text(self.value(row, col))
+
+    def find_label_row(self, label: str, col: int = 1) -> int | None:
+        """First row whose cell in col matches label (see normalize_label)."""
+        target = normalize_label(label)
+        for row in range(self.first_row, self.last_row + 1):
+            if normalize_label(self.text(row, col)) == target:
+                return row
+        return None
+
+    def right_of(self, label: str, col: int = 1) -> str:
+        """Text of the cell right of the label in col, empty if the label is not in the block."""
+        row = self.find_label_row(label, col)
+        return "" if row is None else self.text(row, col + 1).strip()
@@ -0,0 +1,139 @@
+import os, json, time, threading, statistics, functools
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+
+from utils.logging_helper import log_line
+
+# Returned by span() while tracing is off: entering it costs next to nothing
+_NULL_SPAN = nullcontext()
+
+# Spans of the current run, None while tracing is off
+_tracer = None
+
+
+class Tracer:
+    """
+    Collects timed spans of one run: (name, start ns, duration ns, pid, thread id, args).
+    Worker processes keep their own Tracer and hand their spans to the parent with each result.
+    """
+
+    def __init__(self):
+        self.run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.spans: list[tuple] = []
+
+    def add(self, name: str, start_ns: int, end_ns: int, args: dict):
+        self.spans.append((name, start_ns, end_ns - start_ns, os.getpid(), threading.get_ident(), args))
+
+    def drain(self) -> list[tuple]:
+        spans, self.spans = self.spans, []
+        return spans
+
+    def summary_rows(self) -> list[tuple[str, int, float, float, float]]:
+        """(name, count, total s, p50 ms, p95 ms) per span name, longest total first."""
+        durations: dict[str, list[int]] = {}
+        for name, _start, duration, *_ in self.spans:
+            durations.setdefault(name, []).append(duration)
+        rows = []
+        for name, values in durations.items():
+            values.sort()
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            rows.append((name, len(values), sum(values) / 1e9, statistics.median(values) / 1e6, p95 / 1e6))
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def format_summary(self) -> str:
+        lines = [f"{'stage':<16}{'count':>7}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}"]
+        for name, count, total, p50, p95 in self.summary_rows():
+            lines.append(f"{name:<16}{count:>7}{total:>10.2f}{p50:>10.1f}{p95:>10.1f}")
+        return "\n".join(lines)
+
+    def write_jsonl(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            for name, start, duration, pid, tid, args in self.spans:
+                record = {"name": name, "start_ns": start, "duration_ns": duration, "pid": pid, "tid": tid, "args": args}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def write_chrome_trace(self, path: Path):
+        """Trace Event Format ("X" complete events), opens in chrome://tracing and Perfetto."""
+        origin = min((span[1] for span in self.spans), default=0)
+        events = [
+            {"name": name, "ph": "X", "ts": (start - origin) / 1000, "dur": duration / 1000, "pid": pid, "tid": tid, "args": args}
+            for name, start, duration, pid, tid, args in self.spans
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start_ns")
+
+    def __init__(self, tracer: Tracer, name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.add(self.name, self.start_ns, time.perf_counter_ns(), self.args)
+
+
+def configure_tracing(enabled: bool) -> Tracer | None:
+    """Start a new trace run (or switch tracing off) for this process."""
+    global _tracer
+    _tracer = Tracer() if enabled else None
+    return _tracer
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, **args):
+    """Context manager timing one stage; args end up in the exported span (keep them small)."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, args)
+
+
+def traced(name: str):
+    """Decorator: run the function inside span(name)."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return fn(*args, **kwargs)
+            with _Span(_tracer, name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def drain_spans() -> list[tuple]:
+    """Worker side: the spans recorded since the last call, to send back with a result."""
+    return _tracer.drain() if _tracer is not None else []
+
+
+def add_spans(spans: list[tuple]):
+    """Parent side: merge spans a worker process sent back."""
+    if _tracer is not None and spans:
+        _tracer.spans.extend(spans)
+
+
+def export_trace(directory: Path) -> tuple[Path, Path] | None:
+    """
+    Write the current run as trace-<run>.jsonl and trace-<run>.json (Chrome trace) into directory
+    and log the summary table. Exporting again later in the run overwrites both with all spans so far.
+    """
+    if _tracer is None or not _tracer.spans:
+        return None
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    jsonl_path = directory / f"trace-{_tracer.run_id}.jsonl"
+    chrome_path = directory / f"trace-{_tracer.run_id}.json"
+    _tracer.write_jsonl(jsonl_path)
+    _tracer.write_chrome_trace(chrome_path)
+    log_line(f"Trace {_tracer.run_id} ({len(_tracer.spans)} spans) written to {chrome_path}\n{_tracer.format_summary()}")
+    return jsonl_path, chrome_path